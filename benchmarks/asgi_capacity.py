@@ -0,0 +1,191 @@
+"""Сравнение WSGI и ASGI по числу одновременных соединений.
+
+    python -m benchmarks.asgi_capacity --concurrency 16 64 256 --duration 10
+
+Один и тот же каталог (generate_catalog) обслуживают по очереди:
+  wsgi — gunicorn с потоковыми воркерами (gthread), как синхронный Django;
+  asgi — gunicorn с воркерами uvicorn (config/gunicorn.conf.py).
+Клиенты держат соединения keep-alive и опрашивают эндпоинты, для каждого
+уровня одновременности выводятся запросы в секунду, p50/p99 и ошибки.
+Параметр --hold задаёт задержку ответа эндпоинта /bench/hold (имитация
+долгого ожидания внутри запроса: опрос, медленный внешний сервис).
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.run import free_port
+
+ENDPOINTS = {
+    "health": "/api/health/",
+    "status": "/api/video/{video_id}/status/",
+    "highlights": "/api/highlights/?video_id={video_id}",
+    "hold": "/bench/hold/",
+}
+
+
+async def read_response(reader) -> int:
+    """Читает ответ HTTP/1.1 (Content-Length или chunked), возвращает код статуса."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {k.strip().lower(): v.strip() for k, v in (line.split(":", 1) for line in lines[1:] if ":" in line)}
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status
+
+
+async def client(host, port, paths, deadline, timings, errors):
+    reader = writer = None
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode())
+            await writer.drain()
+            status = await asyncio.wait_for(read_response(reader), timeout=30)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            errors.append(1)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+            continue
+        if status >= 400:
+            errors.append(status)
+        timings.append(time.perf_counter() - started)
+    if writer is not None:
+        writer.close()
+
+
+async def load(port, paths, concurrency, duration):
+    timings, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*[
+        client("127.0.0.1", port, paths[k:] + paths[:k], deadline, timings, errors)
+        for k in range(concurrency)
+    ])
+    timings = np.array(timings) * 1000
+    return {
+        "concurrency": concurrency,
+        "rps": round(len(timings) / duration, 1),
+        "p50_ms": round(float(np.percentile(timings, 50)), 2) if len(timings) else None,
+        "p99_ms": round(float(np.percentile(timings, 99)), 2) if len(timings) else None,
+        "errors": len(errors),
+    }
+
+
+def start_server(kind, args, env, port):
+    common = ["-b", f"127.0.0.1:{port}", "-w", str(args.workers), "--log-level", "warning"]
+    if kind == "wsgi":
+        cmd = ["gunicorn", "config.wsgi:application", "-k", "gthread", "--threads", str(args.threads), *common]
+    else:
+        cmd = ["gunicorn", "-c", "config/gunicorn.conf.py", "config.asgi:application", *common]
+    env = {**env, "BENCH_SERVER": kind, "GUNICORN_MAX_REQUESTS": "0", "GUNICORN_ACCESS_LOG": ""}
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{port}/api/health/", timeout=1)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{kind}: сервер не запустился")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=["wsgi", "asgi"], default=["wsgi", "asgi"])
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=["status", "highlights", "hold"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[16, 64, 256])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2, help="Процессов gunicorn")
+    parser.add_argument("--threads", type=int, default=8, help="Потоков на процесс WSGI (gthread)")
+    parser.add_argument("--hold", type=float, default=0.2, help="Задержка /bench/hold/, с")
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--output", help="JSON с результатами")
+    parser.add_argument("--bench-dir", default="/tmp/bench_asgi")
+    args = parser.parse_args()
+
+    shutil.rmtree(args.bench_dir, ignore_errors=True)
+    os.makedirs(args.bench_dir)
+
+    from moto.server import ThreadedMotoServer
+
+    s3_port = free_port()
+    s3 = ThreadedMotoServer(ip_address="127.0.0.1", port=s3_port, verbose=False)
+    s3.start()
+
+    os.environ.update({
+        "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+        "BENCH_DIR": args.bench_dir,
+        "BENCH_S3_ENDPOINT": f"http://127.0.0.1:{s3_port}",
+        "BENCH_URLCONF": "benchmarks.asgi_capacity_urls",
+        "BENCH_HOLD_SECONDS": str(args.hold),
+        "AWS_ACCESS_KEY_ID": "minioadmin",
+        "AWS_SECRET_ACCESS_KEY": "minioadmin",
+    })
+    import django
+
+    django.setup()
+    import boto3
+    from django.conf import settings
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    boto3.client(
+        "s3",
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name="us-east-1",
+    ).create_bucket(Bucket=settings.AWS_STORAGE_BUCKET_NAME)
+    with open(os.devnull, "w") as devnull:
+        call_command("generate_catalog", videos=args.videos, highlights=10, seed=1, stdout=devnull)
+    env = dict(os.environ)
+
+    video_ids = range(1, min(args.videos, 50) + 1)
+    results = []
+    for kind in args.servers:
+        port = free_port()
+        proc = start_server(kind, args, env, port)
+        try:
+            for endpoint in args.endpoints:
+                paths = [ENDPOINTS[endpoint].format(video_id=v) for v in video_ids]
+                for concurrency in args.concurrency:
+                    row = {"server": kind, "endpoint": endpoint, **asyncio.run(load(port, paths, concurrency, args.duration))}
+                    results.append(row)
+                    print(
+                        f"{kind:<5} {endpoint:<11} c={concurrency:<4} {row['rps']:>8} зап/с  "
+                        f"p50 {row['p50_ms']} мс  p99 {row['p99_ms']} мс  ошибок {row['errors']}",
+                        flush=True,
+                    )
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+    s3.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""URL проекта плюс /bench/hold/ для benchmarks.asgi_capacity.
+
+/bench/hold/ ждёт BENCH_HOLD_SECONDS, как запрос к медленному внешнему
+сервису: под WSGI занимает поток, под ASGI — только соединение.
+"""
+import asyncio
+import os
+import time
+
+from django.http import JsonResponse
+from django.urls import path
+
+from main.urls import urlpatterns as project_urlpatterns
+
+HOLD_SECONDS = float(os.environ.get("BENCH_HOLD_SECONDS", 0.2))
+
+if os.environ.get("BENCH_SERVER") == "asgi":
+    async def hold(request):
+        await asyncio.sleep(HOLD_SECONDS)
+        return JsonResponse({"held": HOLD_SECONDS})
+else:
+    def hold(request):
+        time.sleep(HOLD_SECONDS)
+        return JsonResponse({"held": HOLD_SECONDS})
+
+urlpatterns = [path("bench/hold/", hold), *project_urlpatterns]
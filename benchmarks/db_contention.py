@@ -0,0 +1,194 @@
+"""Конкурентная запись в базу: N одновременных обратных вызовов ML.
+
+    python -m benchmarks.db_contention --writers 1 4 16 --duration 5
+    python -m benchmarks.db_contention --profiles sqlite postgres --readers 8
+
+Каждый писатель — поток со своим соединением, который в цикле повторяет
+обратный вызов ML для своего задания: POST /api/highlights/bulk/ и PATCH
+статуса задания. Читатели параллельно опрашивают статус видео, как фронтенд.
+Профили базы (BENCH_DB в benchmarks.settings):
+  sqlite-default — SQLite с настройками Django по умолчанию;
+  sqlite         — профиль проекта: WAL, synchronous=NORMAL, BEGIN IMMEDIATE;
+  postgres       — config.settings_postgres, сервер из переменных POSTGRES_*.
+Каждый профиль замеряется в отдельном процессе на пустой базе.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+HIGHLIGHTS_PER_CALLBACK = 5
+
+
+def callback(client, task):
+    """Один обратный вызов ML; True, если обе записи прошли."""
+    items = [
+        {
+            "task_id": task.pk,
+            "event_type": "goal",
+            "time_start": n * 30,
+            "time_duration": 10,
+            "description": "Гол",
+            "confidence": 0.9,
+        }
+        for n in range(HIGHLIGHTS_PER_CALLBACK)
+    ]
+    created = client.post("/api/highlights/bulk/", items, content_type="application/json")
+    updated = client.patch(
+        f"/api/logistic/tasks/{task.pk}/status/", {"status": "running"}, content_type="application/json",
+    )
+    return created.status_code == 201 and updated.status_code == 200
+
+
+def run_level(tasks, videos, writers, readers, duration):
+    from django.db import OperationalError, connection
+    from django.test import Client
+
+    stop = threading.Event()
+    timings, reads, errors = [], [], []
+
+    def writer(task):
+        client = Client()
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    ok = callback(client, task)
+                except OperationalError:
+                    # SQLite: «database is locked» после истечения timeout.
+                    ok = False
+                if ok:
+                    timings.append(time.perf_counter() - started)
+                else:
+                    errors.append(1)
+        finally:
+            connection.close()
+
+    def reader(video):
+        client = Client()
+        try:
+            while not stop.is_set():
+                try:
+                    if client.get(f"/api/video/{video.pk}/status/").status_code == 200:
+                        reads.append(1)
+                        continue
+                except OperationalError:
+                    pass
+                errors.append(1)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=writer, args=(tasks[i],)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(videos[i % len(videos)],)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    timings = np.array(timings) * 1000
+    return {
+        "writers": writers,
+        "readers": readers,
+        "callbacks_per_s": round(len(timings) / duration, 1),
+        # Каждый обратный вызов — две пишущие транзакции.
+        "writes_per_s": round(2 * len(timings) / duration, 1),
+        "reads_per_s": round(len(reads) / duration, 1),
+        "p50_ms": round(float(np.percentile(timings, 50)), 2) if len(timings) else None,
+        "p99_ms": round(float(np.percentile(timings, 99)), 2) if len(timings) else None,
+        "errors": len(errors),
+    }
+
+
+def run_profile(args):
+    """Замер одного профиля; вызывается в дочернем процессе."""
+    os.environ.update({
+        "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+        "BENCH_DIR": args.bench_dir,
+        "BENCH_DB": args.profile,
+    })
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.core.management import call_command
+
+    from logistic.models import ConfigTask, TaskStatus
+    from main.models import Highlight, Video
+
+    # Опрос должен читать базу, а не кэш.
+    settings.VIDEO_STATUS_CACHE_SECONDS = 0
+    call_command("migrate", verbosity=0)
+    Highlight.objects.all().delete()
+    ConfigTask.objects.all().delete()
+    Video.objects.all().delete()
+    count = max(args.writers + [args.readers, 1])
+    videos = Video.objects.bulk_create([Video(title=f"Конкуренция {n}", duration=600) for n in range(count)])
+    tasks = ConfigTask.create_batch(videos, dispatch=False, status=TaskStatus.RUNNING)
+
+    results = []
+    for writers in args.writers:
+        row = {"profile": args.profile, **run_level(tasks, videos, writers, args.readers, args.duration)}
+        results.append(row)
+        print(json.dumps(row), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--profiles", nargs="+", choices=["sqlite-default", "sqlite", "postgres"], default=["sqlite-default", "sqlite"],
+    )
+    parser.add_argument("--writers", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--readers", type=int, default=0, help="Потоков, опрашивающих статус видео")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--output", help="JSON с результатами")
+    parser.add_argument("--bench-dir", default="/tmp/bench_contention")
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        run_profile(args)
+        return
+
+    results = []
+    for profile in args.profiles:
+        bench_dir = os.path.join(args.bench_dir, profile)
+        shutil.rmtree(bench_dir, ignore_errors=True)
+        os.makedirs(bench_dir)
+        cmd = [
+            sys.executable, "-m", "benchmarks.db_contention",
+            "--profile", profile,
+            "--bench-dir", bench_dir,
+            "--writers", *map(str, args.writers),
+            "--readers", str(args.readers),
+            "--duration", str(args.duration),
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+        for line in proc.stdout.splitlines():
+            if not line.startswith("{"):
+                continue
+            row = json.loads(line)
+            results.append(row)
+            print(
+                f"{profile:<15} писателей {row['writers']:<3} {row['writes_per_s']:>8} записей/с  "
+                f"p50 {row['p50_ms']} мс  p99 {row['p99_ms']} мс  "
+                f"чтений/с {row['reads_per_s']}  ошибок {row['errors']}",
+                flush=True,
+            )
+        if proc.returncode:
+            print(f"{profile}: процесс завершился с кодом {proc.returncode}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Заменитель ML-сервиса.
+
+Принимает /parse_video и /parse_video_custom, сразу отвечает, а через заданную
+задержку присылает в бэкенд хайлайты (/api/highlights/bulk/) и статус задания
+(/api/logistic/tasks/<id>/status/), как настоящий ML. По GET отдаёт образец
+видео для сценария загрузки по URL.
+"""
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+EVENT_TYPES = ("goal", "shot", "foul", "corner", "save", "card")
+
+
+class FakeML:
+    def __init__(
+        self,
+        backend_url: str,
+        latency: float = 0.2,
+        highlights: int = 5,
+        fail_rate: float = 0.0,
+        sample: bytes = b"",
+    ):
+        self.backend_url = backend_url.rstrip("/")
+        self.sample = sample
+        self.latency = latency
+        self.highlights = highlights
+        self.fail_rate = fail_rate
+        self.received = 0
+        self.callbacks_failed = 0
+        self.server = None
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                fake.received += 1
+                body = json.dumps({"status": "accepted", "task_id": payload.get("task_id")}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                threading.Timer(fake.latency, fake.reply, args=[payload]).start()
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(len(fake.sample)))
+                self.end_headers()
+                self.wfile.write(fake.sample)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self.server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+
+    def reply(self, payload: dict) -> None:
+        task_id = payload.get("task_id")
+        failed = random.random() < self.fail_rate
+        try:
+            if not failed:
+                length = (payload.get("window_end") or 600) - (payload.get("window_start") or 0)
+                items = [
+                    {
+                        "task_id": task_id,
+                        "event_type": random.choice(EVENT_TYPES),
+                        "time_start": random.randint(0, max(length - 10, 0)),
+                        "time_duration": random.randint(2, 10),
+                        "confidence": round(random.uniform(0.3, 1.0), 3),
+                        "description": "Тестовое событие",
+                    }
+                    for _ in range(self.highlights)
+                ]
+                requests.post(f"{self.backend_url}/api/highlights/bulk/", json=items, timeout=30).raise_for_status()
+            requests.patch(
+                f"{self.backend_url}/api/logistic/tasks/{task_id}/status/",
+                json={"status": "failed" if failed else "success"},
+                timeout=30,
+            ).raise_for_status()
+        except requests.RequestException:
+            self.callbacks_failed += 1
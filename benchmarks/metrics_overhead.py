@@ -0,0 +1,72 @@
+"""Накладные расходы метрик Prometheus на запрос.
+
+    python -m benchmarks.metrics_overhead --iterations 2000
+
+Прогоняет одни и те же запросы через тестовый клиент Django с
+MetricsMiddleware и без неё (METRICS_ENABLED) и выводит медиану и p99
+задержки, а также время сбора /metrics.
+"""
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+
+PATHS = ("/api/health/", "/api/video/")
+
+
+def measure(client, path: str, iterations: int) -> np.ndarray:
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        started = time.perf_counter()
+        response = client.get(path)
+        timings[i] = time.perf_counter() - started
+        assert response.status_code == 200, (path, response.status_code)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--videos", type=int, default=20, help="Видео в списке /api/video/")
+    parser.add_argument("--bench-dir", default="/tmp/bench_metrics")
+    args = parser.parse_args()
+
+    shutil.rmtree(args.bench_dir, ignore_errors=True)
+    os.makedirs(args.bench_dir)
+    os.environ.update({
+        "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+        "BENCH_DIR": args.bench_dir,
+    })
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from django.test import Client, override_settings
+
+    from main.models import Video
+
+    call_command("migrate", verbosity=0)
+    Video.objects.bulk_create([Video(title=f"Видео {i}") for i in range(args.videos)])
+
+    print(f"{'путь':<16}{'метрики':>10}{'p50, мс':>10}{'p99, мс':>10}")
+    for path in PATHS:
+        p50 = {}
+        for enabled in (False, True):
+            with override_settings(METRICS_ENABLED=enabled):
+                # Новый клиент — новый обработчик, MIDDLEWARE загружается заново.
+                client = Client()
+                measure(client, path, min(args.iterations, 100))
+                timings = measure(client, path, args.iterations) * 1000
+            p50[enabled] = float(np.percentile(timings, 50))
+            print(f"{path:<16}{'вкл' if enabled else 'выкл':>10}{p50[enabled]:>10.3f}{np.percentile(timings, 99):>10.3f}")
+        print(f"{'':<16}{'разница':>10}{p50[True] - p50[False]:>10.3f}")
+
+    client = Client()
+    timings = measure(client, "/metrics", min(args.iterations, 200)) * 1000
+    print(f"/metrics: p50 {np.percentile(timings, 50):.3f} мс, p99 {np.percentile(timings, 99):.3f} мс")
+
+
+if __name__ == "__main__":
+    main()
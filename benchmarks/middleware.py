@@ -0,0 +1,30 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from config.metrics import counting_queries, install_query_counter
+
+
+class QueryCountMiddleware:
+    """Число SQL-запросов на запрос в заголовке X-Query-Count."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        install_query_counter()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with counting_queries() as counter:
+            response = self.get_response(request)
+        response["X-Query-Count"] = str(counter.count)
+        return response
+
+    async def __acall__(self, request):
+        with counting_queries() as counter:
+            response = await self.get_response(request)
+        response["X-Query-Count"] = str(counter.count)
+        return response
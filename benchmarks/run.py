@@ -0,0 +1,400 @@
+"""Сквозной бенчмарк бэкенда на локальных заменителях MinIO, Redis и ML.
+
+    python -m benchmarks.run --iterations 50 --concurrency 4
+    python -m benchmarks.run --scenarios list_status zip_download --compare benchmarks/results/baseline.json
+
+Поднимает в одном процессе: S3 на moto, бэкенд на потоковом WSGI-сервере,
+воркер Celery на транспорте в памяти (вместо Redis) и заменитель ML
+(benchmarks.fake_ml). Для каждого сценария считает пропускную способность,
+задержки p50/p99, число SQL-запросов на запрос и пиковый RSS, результат пишет
+в JSON для сравнения между коммитами.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from wsgiref.simple_server import WSGIRequestHandler
+
+import numpy as np
+import psutil
+import requests
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SAMPLE_VIDEO = os.urandom(256 * 1024)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class RssSampler:
+    """Пиковый RSS процесса за время сценария."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Context:
+    def __init__(self, base_url: str, args):
+        self.base_url = base_url
+        self.args = args
+        self.local = threading.local()
+        self.fixtures = {}
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+
+# Сценарии: setup(ctx) готовит данные, op(ctx, i) выполняет одну операцию
+# и возвращает ответы, по которым считаются ошибки и SQL-запросы.
+
+def setup_upload(ctx):
+    pass
+
+
+def op_upload(ctx, i):
+    return [ctx.session.post(
+        ctx.url("/api/video/"),
+        files={"file": (f"bench_{i}.mp4", SAMPLE_VIDEO, "video/mp4")},
+        data={"title": f"bench {i}"},
+        timeout=60,
+    )]
+
+
+def op_url_ingest(ctx, i):
+    return [ctx.session.post(
+        ctx.url("/api/video/"),
+        data={"source_url": f"{ctx.fixtures['ml_base']}/media/sample_{i}.mp4"},
+        timeout=120,
+    )]
+
+
+def setup_highlights_bulk(ctx):
+    from logistic.models import ConfigTask, TaskStatus
+    from main.models import Video
+
+    video = Video.objects.bulk_create([Video(title="bulk", file="videos/bulk.mp4", duration=600)])[0]
+    task = ConfigTask.objects.bulk_create([ConfigTask(video=video, status=TaskStatus.RUNNING)])[0]
+    ctx.fixtures["task_id"] = task.pk
+
+
+def op_highlights_bulk(ctx, i):
+    items = [
+        {
+            "task_id": ctx.fixtures["task_id"],
+            "event_type": "goal" if n % 2 else "shot",
+            "time_start": (i * 37 + n * 11) % 590,
+            "time_duration": 5,
+            "confidence": 0.5 + (n % 5) / 10,
+            "description": "Бенчмарк",
+        }
+        for n in range(ctx.args.bulk_size)
+    ]
+    return [ctx.session.post(ctx.url("/api/highlights/bulk/"), json=items, timeout=60)]
+
+
+def setup_zip_download(ctx):
+    from django.core.files.base import ContentFile
+
+    from main.models import HighlightFile, Video
+
+    video = Video.objects.bulk_create([Video(title="zip", file="videos/zip.mp4", duration=600)])[0]
+    for n in range(ctx.args.zip_files):
+        HighlightFile.objects.create(video=video, file=ContentFile(os.urandom(64 * 1024), name=f"clip_{n}.mp4"))
+    ctx.fixtures["zip_video_id"] = video.pk
+
+
+def op_zip_download(ctx, i):
+    return [ctx.session.get(ctx.url("/api/highlight-files/"), params={"video_id": ctx.fixtures["zip_video_id"]}, timeout=120)]
+
+
+def setup_list_status(ctx):
+    from main.models import Highlight, Video
+
+    videos = Video.objects.bulk_create([
+        Video(title=f"list {n}", file=f"videos/list_{n}.mp4", duration=600, status="processed")
+        for n in range(ctx.args.catalog_videos)
+    ])
+    Highlight.objects.bulk_create([
+        Highlight(
+            video=video,
+            event_type=("goal", "shot", "foul")[n % 3],
+            start_time=n * 7 % 590,
+            end_time=n * 7 % 590 + 5,
+            confidence=(n % 10) / 10,
+        )
+        for video in videos
+        for n in range(ctx.args.catalog_highlights)
+    ], batch_size=1000)
+    ctx.fixtures["list_video_ids"] = [video.pk for video in videos]
+
+
+def op_list_status(ctx, i):
+    video_id = ctx.fixtures["list_video_ids"][i % len(ctx.fixtures["list_video_ids"])]
+    return [
+        ctx.session.get(ctx.url("/api/highlights/"), params={"video_id": video_id}, timeout=60),
+        ctx.session.get(ctx.url(f"/api/video/{video_id}/status/"), timeout=60),
+        ctx.session.get(ctx.url("/api/video/"), timeout=60),
+    ]
+
+
+def op_end_to_end(ctx, i):
+    """Загрузка и ожидание статуса processed: весь путь через Celery и ML."""
+    responses = op_upload(ctx, i)
+    if responses[0].status_code >= 400:
+        return responses
+    video_id = responses[0].json()["id"]
+    deadline = time.monotonic() + ctx.args.e2e_timeout
+    while time.monotonic() < deadline:
+        status = ctx.session.get(ctx.url(f"/api/video/{video_id}/status/"), timeout=60)
+        if status.json().get("status") == "processed":
+            return responses
+        time.sleep(0.05)
+    status.status_code = 504
+    return responses + [status]
+
+
+SCENARIOS = {
+    "upload": (setup_upload, op_upload),
+    "url_ingest": (setup_upload, op_url_ingest),
+    "highlights_bulk": (setup_highlights_bulk, op_highlights_bulk),
+    "zip_download": (setup_zip_download, op_zip_download),
+    "list_status": (setup_list_status, op_list_status),
+    "end_to_end": (setup_upload, op_end_to_end),
+}
+
+
+def run_scenario(ctx, name: str) -> dict:
+    setup, op = SCENARIOS[name]
+    setup(ctx)
+    latencies, queries, errors = [], [], 0
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            responses = op(ctx, i)
+        except requests.RequestException:
+            return time.perf_counter() - started, [], True
+        failed = any(r.status_code >= 400 for r in responses)
+        counts = [int(r.headers.get("X-Query-Count", 0)) for r in responses]
+        return time.perf_counter() - started, counts, failed
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=ctx.args.concurrency) as pool:
+            for latency, counts, failed in pool.map(timed, range(ctx.args.iterations)):
+                latencies.append(latency)
+                queries.extend(counts)
+                errors += failed
+        elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "iterations": ctx.args.iterations,
+        "concurrency": ctx.args.concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ops": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(ms, 50)), 2),
+            "p99": round(float(np.percentile(ms, 99)), 2),
+            "mean": round(float(ms.mean()), 2),
+            "max": round(float(ms.max()), 2),
+        },
+        "queries_per_request": {
+            "mean": round(float(np.mean(queries)), 2) if queries else None,
+            "max": max(queries) if queries else None,
+        },
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["scenarios"]
+    print(f"\nСравнение с {baseline_path}:")
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        throughput = (current["throughput_ops"] / old["throughput_ops"] - 1) * 100 if old["throughput_ops"] else 0
+        p99 = (current["latency_ms"]["p99"] / old["latency_ms"]["p99"] - 1) * 100 if old["latency_ms"]["p99"] else 0
+        print(f"  {name:16} throughput {throughput:+6.1f}%   p99 {p99:+6.1f}%")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=[*SCENARIOS, "all"], default=["all"])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=8, help="Потоков воркера Celery")
+    parser.add_argument("--ml-latency", type=float, default=0.2, help="Задержка ответа ML, с")
+    parser.add_argument("--ml-highlights", type=int, default=5, help="Хайлайтов в ответе ML")
+    parser.add_argument("--ml-fail-rate", type=float, default=0.0)
+    parser.add_argument("--bulk-size", type=int, default=20, help="Хайлайтов в одном bulk-запросе")
+    parser.add_argument("--zip-files", type=int, default=10)
+    parser.add_argument("--catalog-videos", type=int, default=50)
+    parser.add_argument("--catalog-highlights", type=int, default=20, help="Хайлайтов на видео")
+    parser.add_argument("--e2e-timeout", type=float, default=60)
+    parser.add_argument("--output", help="Файл результатов (по умолчанию benchmarks/results/<время>_<коммит>.json)")
+    parser.add_argument("--compare", help="JSON прошлого запуска для сравнения")
+    parser.add_argument("--bench-dir", default="/tmp/bench")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    scenarios = list(SCENARIOS) if "all" in args.scenarios else args.scenarios
+
+    shutil.rmtree(args.bench_dir, ignore_errors=True)
+    os.makedirs(args.bench_dir)
+
+    from moto.server import ThreadedMotoServer
+
+    s3_port = free_port()
+    s3 = ThreadedMotoServer(ip_address="127.0.0.1", port=s3_port, verbose=False)
+    s3.start()
+
+    from django.core.servers.basehttp import ThreadedWSGIServer
+
+    from benchmarks.fake_ml import FakeML
+
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    fake_ml = FakeML(
+        base_url,
+        latency=args.ml_latency,
+        highlights=args.ml_highlights,
+        fail_rate=args.ml_fail_rate,
+        sample=SAMPLE_VIDEO,
+    )
+    ml_base = fake_ml.start()
+
+    os.environ.update({
+        "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+        "BENCH_DIR": args.bench_dir,
+        "BENCH_S3_ENDPOINT": f"http://127.0.0.1:{s3_port}",
+        "BENCH_ML_URL": f"{ml_base}/ml",
+        "AWS_ACCESS_KEY_ID": "minioadmin",
+        "AWS_SECRET_ACCESS_KEY": "minioadmin",
+    })
+    import django
+
+    django.setup()
+    import boto3
+    from celery.contrib.testing.worker import start_worker
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+
+    from config.celery import app
+
+    call_command("migrate", verbosity=0)
+    boto3.client(
+        "s3",
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name="us-east-1",
+    ).create_bucket(Bucket=settings.AWS_STORAGE_BUCKET_NAME)
+
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ctx = Context(base_url, args)
+    ctx.fixtures["ml_base"] = ml_base
+    results = {}
+    with start_worker(
+        app,
+        pool="threads",
+        concurrency=args.workers,
+        perform_ping_check=False,
+        queues=["ml", "celery", "media"],
+        shutdown_timeout=30,
+    ):
+        for name in scenarios:
+            print(f"{name}...", end=" ", flush=True)
+            results[name] = run_scenario(ctx, name)
+            r = results[name]
+            print(
+                f"{r['throughput_ops']} оп/с, p50 {r['latency_ms']['p50']} мс, p99 {r['latency_ms']['p99']} мс, "
+                f"запросов {r['queries_per_request']['mean']}, RSS {r['peak_rss_mb']} МБ, ошибок {r['errors']}"
+            )
+
+    server.shutdown()
+    fake_ml.stop()
+    s3.stop()
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{commit or 'nogit'}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "commit": commit,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "params": vars(args),
+                "ml_requests": fake_ml.received,
+                "ml_callbacks_failed": fake_ml.callbacks_failed,
+            },
+            "scenarios": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Микробенчмарк списка хайлайтов: строк в секунду до и после быстрого пути.
+
+    python -m benchmarks.serialization --rows 5000 --repeat 5
+
+До: модели из queryset, HighlightSerializer(many=True) и JSONRenderer DRF.
+После: кортежи values_list, highlight_list_data и FastJSONRenderer (orjson).
+Этапы (выборка, сериализация, JSON) замеряются отдельно, лучший из --repeat
+прогонов; для готового JSON — размер и время сжатия gzip и brotli.
+"""
+import argparse
+import gzip
+import os
+import shutil
+import time
+
+import brotli
+
+
+def best(func, repeat):
+    """Лучшее время из repeat прогонов и результат последнего."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--thumbnails", type=float, default=0.5, help="Доля хайлайтов с миниатюрой")
+    parser.add_argument("--bench-dir", default="/tmp/bench_serialization")
+    args = parser.parse_args()
+
+    shutil.rmtree(args.bench_dir, ignore_errors=True)
+    os.makedirs(args.bench_dir)
+    os.environ.update({
+        "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+        "BENCH_DIR": args.bench_dir,
+        "AWS_ACCESS_KEY_ID": "minioadmin",
+        "AWS_SECRET_ACCESS_KEY": "minioadmin",
+    })
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.core.management import call_command
+    from rest_framework.renderers import JSONRenderer
+
+    from config.renderers import FastJSONRenderer
+    from main.models import Highlight, Video
+    from main.serializers import HIGHLIGHT_LIST_FIELDS, HighlightSerializer, highlight_list_data
+
+    # Ссылки на S3 строятся как в продакшене (свой домен, без подписи), а не через moto.
+    settings.AWS_S3_CUSTOM_DOMAIN = "minio:9000"
+    call_command("migrate", verbosity=0)
+    video = Video.objects.create(title="Сериализация", duration=args.rows * 10)
+    with_thumbnail = int(args.rows * args.thumbnails)
+    Highlight.objects.bulk_create([
+        Highlight(
+            video=video,
+            event_type=("goal", "shot", "foul")[n % 3],
+            start_time=n * 10,
+            end_time=n * 10 + 8,
+            confidence=(n % 100) / 100,
+            description=f"Событие {n}: удар по воротам",
+            is_custom=n % 7 == 0,
+            thumbnail=f"thumbnails/{video.pk}_{n}.jpg" if n < with_thumbnail else "",
+        )
+        for n in range(args.rows)
+    ], batch_size=1000)
+    queryset = Highlight.objects.filter(video_id=video.pk)
+
+    paths = {
+        "до": (
+            lambda: list(queryset.all()),
+            lambda rows: HighlightSerializer(rows, many=True).data,
+            JSONRenderer().render,
+        ),
+        "после": (
+            lambda: list(queryset.values_list(*HIGHLIGHT_LIST_FIELDS)),
+            highlight_list_data,
+            FastJSONRenderer().render,
+        ),
+    }
+    totals, bodies = {}, {}
+    for name, (fetch, serialize, render) in paths.items():
+        fetch_time, rows = best(fetch, args.repeat)
+        serialize_time, data = best(lambda: serialize(rows), args.repeat)
+        render_time, body = best(lambda: render(data), args.repeat)
+        total = fetch_time + serialize_time + render_time
+        totals[name] = total
+        bodies[name] = body
+        print(
+            f"{name:<6} выборка {args.rows / fetch_time:>10,.0f}  сериализация {args.rows / serialize_time:>10,.0f}  "
+            f"JSON {args.rows / render_time:>10,.0f}  всего {args.rows / total:>10,.0f} строк/с  ({len(body):,} байт)",
+        )
+    print(f"ускорение: {totals['до'] / totals['после']:.1f}x")
+    if bodies["до"] != bodies["после"]:
+        print("ВНИМАНИЕ: JSON до и после различается")
+
+    level = getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5)
+    for name, compress in (
+        ("gzip", lambda: gzip.compress(body, compresslevel=6)),
+        (f"brotli {level}", lambda: brotli.compress(body, quality=level)),
+    ):
+        elapsed, compressed = best(compress, args.repeat)
+        print(
+            f"{name:<9} {len(compressed):>10,} байт ({len(compressed) / len(body):.1%})  "
+            f"{elapsed * 1000:.1f} мс  {args.rows / elapsed:,.0f} строк/с",
+        )
+
+
+if __name__ == "__main__":
+    main()
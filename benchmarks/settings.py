@@ -0,0 +1,71 @@
+"""Настройки для бенчмарков: локальные заменители MinIO, Redis и ML.
+
+Адреса заменителей задаёт benchmarks.run через переменные окружения.
+"""
+import os
+
+from config.settings import *  # noqa: F401,F403
+from config.settings import MIDDLEWARE, ROOT_URLCONF, SQLITE_OPTIONS
+
+BENCH_DIR = os.environ.get("BENCH_DIR", "/tmp/bench")
+
+DEBUG = False
+ALLOWED_HOSTS = ["*"]
+# benchmarks.asgi_capacity добавляет к URL проекта эндпоинт с задержкой.
+ROOT_URLCONF = os.environ.get("BENCH_URLCONF", ROOT_URLCONF)
+
+# BENCH_DB: sqlite — профиль проекта (WAL), sqlite-default — настройки SQLite
+# по умолчанию в Django, postgres — config.settings_postgres (переменные POSTGRES_*).
+BENCH_DB = os.environ.get("BENCH_DB", "sqlite")
+if BENCH_DB == "postgres":
+    from config.settings_postgres import DATABASES  # noqa: F811
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(BENCH_DIR, "db.sqlite3"),
+            # Запросы приходят из потоков сервера и воркера одновременно.
+            "OPTIONS": {**SQLITE_OPTIONS, "timeout": 30} if BENCH_DB == "sqlite" else {},
+        }
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# S3 поднимает moto в режиме сервера.
+AWS_S3_ENDPOINT_URL = os.environ.get("BENCH_S3_ENDPOINT", "http://127.0.0.1:5000")
+AWS_S3_CUSTOM_DOMAIN = None
+AWS_S3_FILE_OVERWRITE = True
+MEDIA_PUBLIC_BASE_URL = "http://127.0.0.1"
+
+# Воркер Celery работает в том же процессе на транспорте в памяти.
+CELERY_BROKER_URL = "memory://"
+CELERY_RESULT_BACKEND = "cache+memory://"
+CELERY_CACHE_BACKEND = "memory"
+CELERY_BEAT_SCHEDULE = {}
+CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+
+ML_API_URL = os.environ.get("BENCH_ML_URL", "http://127.0.0.1:30001/ml")
+# Пороги backpressure не должны искажать замер пропускной способности.
+ML_QUEUE_HIGH_WATERMARK = 10 ** 6
+ML_INFLIGHT_HIGH_WATERMARK = 10 ** 6
+# Заменитель ML не читает файлы, медиа-этапы не нужны.
+KEYFRAME_INDEX_ENABLED = False
+
+MIDDLEWARE = ["benchmarks.middleware.QueryCountMiddleware", *MIDDLEWARE]
+
+# BENCH_TRACING=1 пишет трассы прогона в BENCH_DIR/traces.jsonl (manage.py show_trace --file).
+TRACING_ENABLED = os.environ.get("BENCH_TRACING") == "1"
+TRACING_FILE = os.path.join(BENCH_DIR, "traces.jsonl")
+
+# Ошибки сервера видны в выводе бенчмарка.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "root": {"handlers": ["console"], "level": "WARNING"},
+    "loggers": {"werkzeug": {"level": "ERROR"}},
+}
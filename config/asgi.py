@@ -0,0 +1,23 @@
+"""
+ASGI config for config project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Продакшен-запуск: gunicorn -c config/gunicorn.conf.py config.asgi:application
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+application = get_asgi_application()
+
+if settings.DEBUG:
+    # Статика админки при разработке, как у runserver.
+    application = ASGIStaticFilesHandler(application)
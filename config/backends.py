@@ -0,0 +1,13 @@
+"""Бэкенды хранилища и кэша с метриками Prometheus (config.metrics)."""
+from django.core.cache.backends.redis import RedisCache
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from config.metrics import CacheMetricsMixin, StorageMetricsMixin
+
+
+class InstrumentedS3Storage(StorageMetricsMixin, S3Boto3Storage):
+    pass
+
+
+class InstrumentedRedisCache(CacheMetricsMixin, RedisCache):
+    pass
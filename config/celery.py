@@ -26,6 +26,13 @@ except Exception:
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Метрики задач: ожидание в очереди, время выполнения, экспортёр воркера.
+# Трассировка: контекст трассы в заголовках задач.
+from config import metrics, tracing  # noqa: E402
+
+metrics.connect_celery_signals()
+tracing.connect_celery_signals()
+
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
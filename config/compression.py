@@ -0,0 +1,49 @@
+"""Сжатие ответов: brotli для JSON API, если клиент его принимает, иначе gzip.
+
+Сжимаются только текстовые ответы (COMPRESSION_CONTENT_TYPES): видео, ZIP и
+картинки уже сжаты. HTML и прочий текст сжимает GZipMiddleware Django с его
+защитой от BREACH; у brotli её нет, поэтому он применяется только к JSON.
+"""
+import re
+
+import brotli
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+ACCEPTS_BROTLI = re.compile(r"\bbr\b")
+MIN_LENGTH = 200
+
+
+def content_types() -> tuple:
+    return tuple(getattr(settings, "COMPRESSION_CONTENT_TYPES", ("application/json", "text/", "application/javascript")))
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        content_type = response.get("Content-Type", "")
+        if not content_type.startswith(content_types()):
+            return response
+        if (
+            content_type.startswith("application/json")
+            and not response.streaming
+            and ACCEPTS_BROTLI.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        ):
+            return self.compress_brotli(response)
+        return super().process_response(request, response)
+
+    def compress_brotli(self, response):
+        if len(response.content) < MIN_LENGTH or response.has_header("Content-Encoding"):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        # Уровни выше 5 почти не уменьшают JSON, но в разы медленнее.
+        compressed = brotli.compress(response.content, quality=getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5))
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
@@ -0,0 +1,129 @@
+"""Чтение с реплик базы: маршрутизатор и закрепление сессии за основной базой.
+
+Реплики перечислены в DATABASE_REPLICAS (алиасы из DATABASES). На реплику
+уходят только чтения внутри безопасных HTTP-запросов (GET, HEAD, OPTIONS) —
+это разрешает ReplicaRoutingMiddleware. Запись, чтение внутри транзакции,
+задачи Celery и команды работают с основной базой.
+
+После записи ответ ставит cookie REPLICA_PIN_COOKIE на REPLICA_PIN_SECONDS:
+пока она жива, запросы этой сессии читают основную базу и видят свои записи,
+даже если реплика отстаёт.
+"""
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@dataclass
+class RoutingState:
+    use_replica: bool
+    # Реплика выбирается один раз на запрос: все чтения видят один снимок данных.
+    replica: str | None = None
+    wrote: bool = False
+
+
+# Изменяемое состояние: запись из потока sync_to_async видна middleware.
+_state: ContextVar[RoutingState | None] = ContextVar("db_routing", default=None)
+
+
+def replicas() -> list:
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def pin_seconds() -> int:
+    return getattr(settings, "REPLICA_PIN_SECONDS", 5)
+
+
+def pin_cookie() -> str:
+    return getattr(settings, "REPLICA_PIN_COOKIE", "db_pin")
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Связанные объекты читаются из той же базы, что и исходный.
+            return instance._state.db
+        state = _state.get()
+        if state is None or not state.use_replica or state.replica is None:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # После записи запрос дочитывает основную базу.
+            state.use_replica = False
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплики получают репликацией (локально — manage.py sync_replica).
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает чтение с реплик для безопасных запросов и ставит cookie после записи."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request) -> RoutingState:
+        use_replica = request.method in SAFE_METHODS and not self.pinned(request)
+        return RoutingState(use_replica=use_replica, replica=random.choice(replicas()) if use_replica else None)
+
+    def pinned(self, request) -> bool:
+        try:
+            return float(request.COOKIES.get(pin_cookie(), 0)) > time.time()
+        except ValueError:
+            return False
+
+    def finish(self, state, response):
+        if state.wrote:
+            seconds = pin_seconds()
+            response.set_cookie(
+                pin_cookie(), str(int(time.time()) + seconds),
+                max_age=seconds, httponly=True, samesite="Lax",
+            )
+        return response
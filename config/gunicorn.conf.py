@@ -0,0 +1,33 @@
+"""Gunicorn для API: процессы-воркеры uvicorn с приложением config.asgi.
+
+    gunicorn -c config/gunicorn.conf.py config.asgi:application
+
+Асинхронные представления (опрос статуса, список хайлайтов, обратные вызовы
+ML) не держат поток на время ожидания; синхронные Django выполняет в пуле
+потоков. Параметры переопределяются переменными окружения.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn_worker.UvicornWorker"
+# Загрузка видео по URL и ZIP вырезок выполняются внутри запроса.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+graceful_timeout = 30
+keepalive = 5
+# Перезапуск воркеров ограничивает рост памяти; jitter разносит перезапуски.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+reload = os.environ.get("GUNICORN_RELOAD") == "1"
+# Пустое значение GUNICORN_ACCESS_LOG отключает журнал запросов.
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+# Метрики всех воркеров собираются через каталог PROMETHEUS_MULTIPROC_DIR.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    def child_exit(server, worker):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,376 @@
+"""Метрики Prometheus: HTTP API, Celery, ML, загрузка видео, хранилище и кэш.
+
+API отдаёт метрики на /metrics, воркер Celery поднимает свой экспортёр на
+CELERY_METRICS_PORT. Если процессов несколько (gunicorn, prefork-воркер),
+задайте переменную окружения PROMETHEUS_MULTIPROC_DIR (существующий пустой
+каталог): метрики всех процессов собираются из него.
+
+На пути запроса — только замер времени и счётчик SQL-запросов; глубина
+очередей считается при сборе метрик, а не на каждый запрос.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from kombu.exceptions import ChannelError
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (0.1, 1, 5, 15, 60, 300, 900, 1800, 3600, 4 * 3600)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+CELERY_QUEUES = ("ml", "celery", "media")
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["view", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL-запросов на HTTP-запрос",
+    ["view"],
+    buckets=QUERY_BUCKETS,
+)
+CELERY_TASK_WAIT = Histogram(
+    "celery_task_wait_seconds",
+    "Ожидание задачи в очереди от публикации (или ETA) до запуска",
+    ["task"],
+    buckets=TASK_BUCKETS,
+)
+CELERY_TASK_RUN = Histogram(
+    "celery_task_run_seconds",
+    "Время выполнения задачи",
+    ["task", "state"],
+    buckets=TASK_BUCKETS,
+)
+ML_LATENCY = Histogram(
+    "ml_request_duration_seconds",
+    "Время запроса к ML",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+ML_ERRORS = Counter(
+    "ml_request_errors_total",
+    "Ошибки запросов к ML",
+    ["endpoint", "error"],
+)
+INGEST_BYTES = Counter(
+    "ingest_bytes_total",
+    "Загружено байт видео по URL",
+    ["source"],
+)
+INGEST_DURATION = Histogram(
+    "ingest_duration_seconds",
+    "Время загрузки видео по URL",
+    ["source"],
+    buckets=TASK_BUCKETS,
+)
+INGEST_ERRORS = Counter(
+    "ingest_errors_total",
+    "Ошибки загрузки видео по URL",
+    ["source", "error"],
+)
+STORAGE_LATENCY = Histogram(
+    "storage_operation_duration_seconds",
+    "Время операции с хранилищем",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+STORAGE_ERRORS = Counter(
+    "storage_operation_errors_total",
+    "Ошибки операций с хранилищем",
+    ["operation", "error"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Чтения из кэша: попадания и промахи",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def timed(histogram, errors=None, **labels):
+    """Замеряет блок в histogram; исключение считается в errors с типом ошибки."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if errors is not None:
+            errors.labels(error=type(e).__name__, **labels).inc()
+        raise
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+
+def view_name(request) -> str:
+    """Имя представления DRF (с действием ViewSet) — метка с ограниченным числом значений."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    func = match.func
+    view_class = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    if view_class is None:
+        return getattr(func, "__name__", "unknown")
+    actions = getattr(func, "actions", None)
+    if actions:
+        return f"{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+    return view_class.__name__
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+
+# Все активные счётчики: вложенные блоки (метрики и X-Query-Count) считают каждый своё.
+_query_counters: ContextVar[tuple[QueryCounter, ...]] = ContextVar("query_counters", default=())
+
+
+def _count_query(execute, sql, params, many, context):
+    for counter in _query_counters.get():
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender=None, connection=None, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def install_query_counter() -> None:
+    """Подключает счётчик ко всем соединениям с БД, в том числе будущим.
+
+    Счётчик запроса хранится в ContextVar, а не в обёртке соединения: под ASGI
+    ORM выполняется в потоках sync_to_async со своими соединениями, а контекст
+    передаётся в эти потоки.
+    """
+    connection_created.connect(_install_query_counter, dispatch_uid="metrics_query_counter")
+    for conn in connections.all(initialized_only=True):
+        _install_query_counter(connection=conn)
+
+
+@contextmanager
+def counting_queries():
+    """Считает SQL-запросы, выполненные внутри блока (включая потоки sync_to_async)."""
+    counter = QueryCounter()
+    token = _query_counters.set((*_query_counters.get(), counter))
+    try:
+        yield counter
+    finally:
+        _query_counters.reset(token)
+
+
+class MetricsMiddleware:
+    """Время запроса и число SQL-запросов по представлениям. Работает под WSGI и ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        install_query_counter()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with counting_queries() as queries:
+            response = self.get_response(request)
+        self.observe(request, response, started, queries.count)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with counting_queries() as queries:
+            response = await self.get_response(request)
+        self.observe(request, response, started, queries.count)
+        return response
+
+    def observe(self, request, response, started, queries):
+        view = view_name(request)
+        HTTP_LATENCY.labels(view, request.method, f"{response.status_code // 100}xx").observe(
+            time.perf_counter() - started,
+        )
+        HTTP_QUERIES.labels(view).observe(queries)
+
+
+def broker_queue_lengths() -> dict:
+    """Число сообщений в очередях брокера; пусто, если брокер недоступен."""
+    from config.celery import app
+
+    lengths = {}
+    try:
+        with app.connection_for_read() as conn:
+            conn.ensure_connection(max_retries=1)
+            for queue in CELERY_QUEUES:
+                # Ошибка канала закрывает его, поэтому на каждую очередь — свой.
+                with conn.channel() as channel:
+                    try:
+                        lengths[queue] = channel.queue_declare(queue=queue, passive=True).message_count
+                    except ChannelError:
+                        # Очередь ещё не объявлена — сообщений в ней нет.
+                        lengths[queue] = 0
+    except Exception as e:
+        logger.warning("Не удалось получить длину очередей брокера: %s", e)
+    return lengths
+
+
+class QueueCollector:
+    """Глубина очередей на момент сбора метрик."""
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        from logistic.service.backpressure import get_queue_state
+
+        state = get_queue_state()
+        tasks = GaugeMetricFamily("ml_tasks", "Задания ML по состоянию", labels=["state"])
+        tasks.add_metric(["pending"], state.pending)
+        tasks.add_metric(["in_flight"], state.in_flight)
+        yield tasks
+
+        broker = GaugeMetricFamily("celery_queue_length", "Сообщений в очереди брокера", labels=["queue"])
+        for queue, length in broker_queue_lengths().items():
+            broker.add_metric([queue], length)
+        yield broker
+
+
+QUEUE_REGISTRY = CollectorRegistry()
+QUEUE_REGISTRY.register(QueueCollector())
+
+
+def process_registry():
+    """Метрики этого процесса или, в многопроцессном режиме, всех процессов."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    output = generate_latest(process_registry()) + generate_latest(QUEUE_REGISTRY)
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
+
+
+# Celery: время ожидания и выполнения задач, экспортёр в воркере.
+
+_task_started = {}
+
+
+def _before_task_publish(headers=None, **kwargs):
+    if headers is not None:
+        headers["published_at"] = time.time()
+
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = task.request.get("published_at")
+    if published_at:
+        # Для задач с countdown ожидание считается от ETA.
+        eta = task.request.eta
+        ready_at = max(published_at, _timestamp(eta)) if eta else published_at
+        CELERY_TASK_WAIT.labels(task.name).observe(max(time.time() - ready_at, 0))
+
+
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_RUN.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+def _timestamp(value) -> float:
+    from datetime import datetime
+
+    return datetime.fromisoformat(value).timestamp() if isinstance(value, str) else value.timestamp()
+
+
+def _worker_init(**kwargs):
+    port = getattr(settings, "CELERY_METRICS_PORT", None)
+    if not port:
+        return
+    try:
+        start_http_server(port, registry=process_registry())
+    except OSError as e:
+        logger.warning("Экспортёр метрик воркера не запущен на порту %s: %s", port, e)
+
+
+def connect_celery_signals() -> None:
+    from celery import signals
+
+    signals.before_task_publish.connect(_before_task_publish, weak=False)
+    signals.task_prerun.connect(_task_prerun, weak=False)
+    signals.task_postrun.connect(_task_postrun, weak=False)
+    signals.worker_init.connect(_worker_init, weak=False)
+
+
+# Хранилище и кэш: примеси к бэкендам Django (config.backends).
+
+class StorageMetricsMixin:
+    @contextmanager
+    def _timed(self, operation, name):
+        from config import tracing
+
+        with tracing.span(f"storage.{operation}", path=name):
+            with timed(STORAGE_LATENCY, STORAGE_ERRORS, operation=operation):
+                yield
+
+    def _save(self, name, content):
+        with self._timed("save", name):
+            return super()._save(name, content)
+
+    def _open(self, name, mode="rb"):
+        with self._timed("open", name):
+            return super()._open(name, mode)
+
+    def delete(self, name):
+        with self._timed("delete", name):
+            return super().delete(name)
+
+    def exists(self, name):
+        with self._timed("exists", name):
+            return super().exists(name)
+
+    def size(self, name):
+        with self._timed("size", name):
+            return super().size(name)
+
+    def listdir(self, path):
+        with self._timed("listdir", path):
+            return super().listdir(path)
+
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        CACHE_REQUESTS.labels(type(self).__name__, "miss" if value is _MISSING else "hit").inc()
+        return default if value is _MISSING else value
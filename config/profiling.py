@@ -0,0 +1,290 @@
+"""Сэмплирующий профилировщик запросов и захват медленных запросов.
+
+Профилируются запросы с заголовком X-Profile, совпадающим с PROFILER_TOKEN,
+случайная доля PROFILER_SAMPLE_RATE и, если задан PROFILER_SLOW_MS, любой
+запрос медленнее порога. Фоновый поток раз в PROFILER_INTERVAL_MS снимает
+стек потока, обрабатывающего запрос (sys._current_frames), параллельно
+пишется журнал SQL. Стеки сохраняются в хранилище в свёрнутом формате
+(flamegraph.pl, speedscope), журнал SQL — в JSON, индекс — RequestProfile.
+
+Под ASGI снимается стек потока цикла событий, и только пока выполняется
+задача asyncio этого запроса: время в потоках sync_to_async попадает в
+профиль как ожидание, зато журнал SQL полный — он ведётся через ContextVar,
+который передаётся в эти потоки.
+
+При PROFILER_ENABLED = False middleware не подключается вовсе.
+"""
+import asyncio
+import json
+import logging
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+MAX_DEPTH = 128
+
+
+class Recording:
+    """Стеки и SQL одного запроса."""
+
+    def __init__(self, max_queries: int):
+        self.stacks = Counter()
+        self.queries = []
+        self.query_count = 0
+        self.query_time = 0.0
+        self.max_queries = max_queries
+        self.thread_id = threading.get_ident()
+        # Под ASGI: задача запроса и её цикл событий.
+        self.task = None
+        self.loop = None
+        try:
+            self.task = asyncio.current_task()
+            self.loop = self.task.get_loop() if self.task else None
+        except RuntimeError:
+            pass
+
+    def is_running(self) -> bool:
+        """Выполняется ли сейчас код этого запроса в его потоке."""
+        if self.task is None:
+            return True
+        return asyncio.current_task(self.loop) is self.task
+
+    def log_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.query_count += 1
+            self.query_time += elapsed
+            if len(self.queries) < self.max_queries:
+                self.queries.append({"sql": sql, "many": many, "ms": round(elapsed * 1000, 3)})
+
+    def folded(self) -> str:
+        """Стеки в свёрнутом формате: «корень;...;лист число» по строке."""
+        return "".join(
+            ";".join(_frame_label(code) for code in stack) + f" {count}\n"
+            for stack, count in self.stacks.most_common()
+        )
+
+
+_recording: ContextVar[Recording | None] = ContextVar("profiling_recording", default=None)
+
+
+def _log_query(execute, sql, params, many, context):
+    recording = _recording.get()
+    if recording is None:
+        return execute(sql, params, many, context)
+    return recording.log_query(execute, sql, params, many, context)
+
+
+def _install_query_log(sender=None, connection=None, **kwargs):
+    if _log_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_log_query)
+
+
+def install_query_log() -> None:
+    """Журнал SQL на всех соединениях, включая соединения потоков sync_to_async."""
+    connection_created.connect(_install_query_log, dispatch_uid="profiling_query_log")
+    for conn in connections.all(initialized_only=True):
+        _install_query_log(connection=conn)
+
+
+_labels = {}
+
+
+def _frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        base = str(settings.BASE_DIR)
+        if filename.startswith(base):
+            filename = filename[len(base) + 1:]
+        elif "site-packages/" in filename:
+            filename = filename.split("site-packages/", 1)[1]
+        label = _labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+class Sampler(threading.Thread):
+    """Один поток на процесс: снимает стеки потоков с активной записью."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        # Под ASGI в одном потоке цикла событий может быть несколько записей.
+        self.recordings = set()
+        self.wake = threading.Event()
+
+    def register(self, recording: Recording) -> None:
+        self.recordings.add(recording)
+        self.wake.set()
+
+    def unregister(self, recording: Recording) -> None:
+        self.recordings.discard(recording)
+
+    def run(self):
+        while True:
+            # Без активных записей поток спит и не тратит процессор.
+            self.wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for recording in list(self.recordings):
+                frame = frames.get(recording.thread_id)
+                if frame is not None and recording.is_running():
+                    recording.stacks[_stack(frame)] += 1
+            del frames
+            if not self.recordings:
+                self.wake.clear()
+                if self.recordings:
+                    self.wake.set()
+
+
+def _stack(frame) -> tuple:
+    codes = []
+    while frame is not None and len(codes) < MAX_DEPTH:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return tuple(codes)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> Sampler:
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = Sampler(getattr(settings, "PROFILER_INTERVAL_MS", 5) / 1000)
+            _sampler.start()
+    return _sampler
+
+
+class ProfilingMiddleware:
+    """Профилирует выбранные запросы под WSGI и ASGI. Включать на время диагностики."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILER_ENABLED", False):
+            raise MiddlewareNotUsed
+        install_query_log()
+        self.get_response = get_response
+        self.token = getattr(settings, "PROFILER_TOKEN", "")
+        self.sample_rate = getattr(settings, "PROFILER_SAMPLE_RATE", 0.0)
+        self.slow_ms = getattr(settings, "PROFILER_SLOW_MS", None)
+        self.max_queries = getattr(settings, "PROFILER_MAX_QUERIES", 1000)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _reason(self, request):
+        from main.models import ProfileReason
+
+        header = request.headers.get(PROFILE_HEADER)
+        if header and self.token and secrets.compare_digest(header, self.token):
+            return ProfileReason.HEADER
+        if self.sample_rate and random.random() < self.sample_rate:
+            return ProfileReason.SAMPLED
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = self._reason(request)
+        if reason is None and not self.slow_ms:
+            return self.get_response(request)
+
+        recording = Recording(self.max_queries)
+        sampler = get_sampler()
+        started = time.perf_counter()
+        sampler.register(recording)
+        token = _recording.set(recording)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recording.reset(token)
+            sampler.unregister(recording)
+        duration_ms = (time.perf_counter() - started) * 1000
+        reason = self._final_reason(reason, duration_ms)
+        if reason is None:
+            return response
+        return self.save(request, response, recording, reason, duration_ms)
+
+    async def __acall__(self, request):
+        reason = self._reason(request)
+        if reason is None and not self.slow_ms:
+            return await self.get_response(request)
+
+        recording = Recording(self.max_queries)
+        sampler = get_sampler()
+        started = time.perf_counter()
+        sampler.register(recording)
+        token = _recording.set(recording)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recording.reset(token)
+            sampler.unregister(recording)
+        duration_ms = (time.perf_counter() - started) * 1000
+        reason = self._final_reason(reason, duration_ms)
+        if reason is None:
+            return response
+        return await sync_to_async(self.save)(request, response, recording, reason, duration_ms)
+
+    def _final_reason(self, reason, duration_ms):
+        """Причина сохранить профиль или None, если запрос не выбран и быстрый."""
+        from main.models import ProfileReason
+
+        if reason is None and duration_ms >= self.slow_ms:
+            return ProfileReason.SLOW
+        return reason
+
+    def save(self, request, response, recording, reason, duration_ms):
+        try:
+            profile = store(request, response, recording, reason, duration_ms)
+            response["X-Profile-Id"] = str(profile.pk)
+        except Exception as e:
+            logger.warning("Не удалось сохранить профиль %s %s: %s", request.method, request.path, e)
+        return response
+
+
+def store(request, response, recording: Recording, reason: str, duration_ms: float):
+    """Сохраняет стеки и журнал SQL в хранилище и создаёт RequestProfile."""
+    from config.metrics import view_name
+    from main.models import RequestProfile
+
+    name = uuid.uuid4().hex
+    profile = RequestProfile(
+        method=request.method,
+        path=request.path[:255],
+        view=view_name(request)[:128],
+        status_code=response.status_code,
+        reason=reason,
+        duration_ms=duration_ms,
+        samples=sum(recording.stacks.values()),
+        query_count=recording.query_count,
+        query_time_ms=recording.query_time * 1000,
+    )
+    profile.profile_file.save(f"{name}.folded", ContentFile(recording.folded().encode("utf-8")), save=False)
+    queries = json.dumps(recording.queries, ensure_ascii=False, indent=1)
+    profile.queries_file.save(f"{name}.queries.json", ContentFile(queries.encode("utf-8")), save=False)
+    profile.save()
+    return profile
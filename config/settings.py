@@ -29,6 +29,91 @@ ALLOWED_HOSTS = ["*"]
 ML_API_URL = "http://45.80.129.41:30001/ml"
 API_BASE_URL = "http://45.80.129.41:8001"
 
+# Backpressure очереди ML
+ML_QUEUE_HIGH_WATERMARK = 50  # заданий в статусе pending, выше — 429
+ML_INFLIGHT_HIGH_WATERMARK = 4  # одновременных запросов к ML, выше — откладываем запуск
+ML_RETRY_AFTER_SECONDS = 30  # значение заголовка Retry-After
+ML_TASK_MAX_QUEUE_WAIT = 30 * 60  # задания, ждавшие дольше, отбрасываются
+ML_DEFER_SECONDS = 15  # на сколько откладывается запуск при переполнении ML
+
+# Таймауты заданий ML: overhead + duration / rate * safety, в пределах [min, max]
+ML_TASK_DEFAULT_TIMEOUT = 600  # если длительность видео неизвестна
+ML_DEFAULT_PROCESSING_RATE = 1.0  # секунд видео на секунду работы, пока нет наблюдений
+ML_RATE_SMOOTHING = 0.2  # вес нового наблюдения в скользящем среднем
+ML_TIMEOUT_OVERHEAD_SECONDS = 60
+ML_TIMEOUT_SAFETY_FACTOR = 2.0
+ML_TIMEOUT_MIN_SECONDS = 120
+ML_TIMEOUT_MAX_SECONDS = 4 * 60 * 60
+
+# Обработка длинных видео окнами (дочерние задания параллельно)
+ML_WINDOWS_ENABLED = True
+ML_WINDOW_MIN_DURATION = 20 * 60  # видео длиннее делятся на окна
+ML_WINDOW_SECONDS = 10 * 60  # длина окна
+ML_WINDOW_OVERLAP_SECONDS = 30  # перекрытие соседних окон
+ML_WINDOW_MAX_ATTEMPTS = 3  # попыток на одно окно
+
+# Proxy для ML: видео в низком разрешении и с малым fps (очередь media)
+ML_PROXY_ENABLED = False
+ML_PROXY_HEIGHT = 360
+ML_PROXY_FPS = 5
+ML_PROXY_TIMEOUT = 60 * 60  # секунд на транскодирование одного видео
+ML_PROXY_WORKERS = 2  # процессов в build_proxies
+
+# Индекс ключевых кадров строится при загрузке видео отдельной задачей media, ML его не ждёт
+KEYFRAME_INDEX_ENABLED = True
+KEYFRAME_INDEX_TIMEOUT = 30 * 60
+
+# Превью: кадр на хайлайт и спрайт-лист на видео (build_previews)
+THUMBNAIL_HEIGHT = 180
+THUMBNAIL_POSITION = "mid"  # "mid" или "start" хайлайта
+SPRITE_INTERVAL_SECONDS = 10
+SPRITE_COLUMNS = 10
+SPRITE_TILE_SIZE = (160, 90)
+PREVIEW_TIMEOUT = 5 * 60
+
+# HLS: сегменты без перекодирования, если кодеки позволяют; отдельная задача media после загрузки
+HLS_ENABLED = False
+HLS_HIGHLIGHT_FILES_ENABLED = False
+HLS_SEGMENT_SECONDS = 6
+HLS_TIMEOUT = 60 * 60
+
+# Локальный отбор кандидатов по смене сцены (очередь media)
+ML_SCENE_PREFILTER_ENABLED = False
+ML_SEND_CANDIDATES = False  # передавать кандидатов в ML вместо всего видео
+SCENE_SAMPLE_FPS = 2  # кадров в секунду для анализа
+SCENE_FRAME_SIZE = (64, 36)  # размер кадра для анализа
+SCENE_THRESHOLD_MAD = 3.0  # порог: медиана + k * MAD
+SCENE_MIN_SCORE = 0.05  # минимальная оценка смены сцены
+SCENE_PAD_SECONDS = 5  # окно вокруг смены сцены
+SCENE_MERGE_GAP_SECONDS = 5  # близкие окна сливаются
+CANDIDATE_WORKERS = 2  # процессов в detect_candidates
+
+# Локальный отбор кандидатов по пикам звука (очередь media)
+ML_AUDIO_PREFILTER_ENABLED = False
+AUDIO_SAMPLE_RATE = 8000  # Гц, моно
+AUDIO_FRAME_SECONDS = 0.25  # длина кадра огибающей
+AUDIO_THRESHOLD_MAD = 4.0  # порог: медиана + k * MAD
+AUDIO_MIN_SCORE = 1.0  # минимальная оценка пика (в MAD)
+AUDIO_PAD_SECONDS = 5
+AUDIO_MERGE_GAP_SECONDS = 5
+AUDIO_PEAKS_AS_HIGHLIGHTS = False  # дублировать пики хайлайтами audio_peak
+AUDIO_HIGHLIGHT_MAX_CONFIDENCE = 0.3
+
+FFMPEG_BINARY = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+
+# Reaper заданий, зависших в статусе running
+REAPER_BATCH_SIZE = 500  # заданий за одну транзакцию
+REAPER_MAX_BATCHES = 20  # пачек за один запуск periodic-задачи
+
+# Повторная обработка видео (reprocess_videos)
+REPROCESS_RATE_PER_MINUTE = 30  # заданий в минуту по умолчанию
+
+HIGHLIGHT_QUERY_MAX_LIMIT = 1000  # максимум и значение по умолчанию для limit в /api/highlights/
+HIGHLIGHT_TOP_K_MAX = 100  # максимум для параметра top_k
+HIGHLIGHT_MERGE_ON_INGEST = True  # сливать пересекающиеся отрезки при приёме от ML
+HIGHLIGHT_MERGE_GAP_SECONDS = 2  # отрезки с разрывом не больше этого тоже сливаются
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -39,15 +124,20 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
+    "adrf",
     "drf_spectacular",
     "storages",
-    "django_celery_results", 
     "main",  
     "logistic",
     "corsheaders",
 ]
 
 MIDDLEWARE = [
+    "config.tracing.TracingMiddleware",
+    "config.metrics.MetricsMiddleware",
+    "config.profiling.ProfilingMiddleware",
+    "config.db_router.ReplicaRoutingMiddleware",
+    "config.compression.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",  
@@ -76,23 +166,43 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+# Продакшен: gunicorn с воркерами uvicorn (config/gunicorn.conf.py)
+ASGI_APPLICATION = "config.asgi.application"
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite для одного узла: WAL не блокирует чтение во время записи, запись
+# берёт блокировку в начале транзакции (без SQLITE_BUSY при повышении
+# блокировки), занятая база ожидается до timeout секунд.
+# Postgres с пулом соединений — config.settings_postgres.
+SQLITE_OPTIONS = {
+    "timeout": 20,
+    "transaction_mode": "IMMEDIATE",
+    "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": SQLITE_OPTIONS,
     }
 }
 
-# Cache configuration for Celery
+# Чтение с реплик (config.db_router): алиасы реплик из DATABASES. После записи
+# сессия REPLICA_PIN_SECONDS секунд читает основную базу.
+DATABASE_ROUTERS = ["config.db_router.PrimaryReplicaRouter"]
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = "db_pin"
+
+# Кэш в Redis, отдельно от основной базы
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-        'LOCATION': 'django_cache',
+    "default": {
+        "BACKEND": "config.backends.InstrumentedRedisCache",
+        "LOCATION": "redis://redis:6379/1",
     }
 }
 
@@ -141,8 +251,16 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Сжатие ответов (config.compression): brotli для JSON, gzip для остального текста
+COMPRESSION_CONTENT_TYPES = ("application/json", "text/", "application/javascript")
+COMPRESSION_BROTLI_QUALITY = 5
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Survey System API',
     'DESCRIPTION': 'API для создания и прохождения опросов',
@@ -166,17 +284,45 @@ AWS_S3_ADDRESSING_STYLE = 'path'
 
 STORAGES = {
     "default": {
-        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
+        "BACKEND": "config.backends.InstrumentedS3Storage",
     },
     "staticfiles": {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
     },
 }
 
+# Кэш статуса видео для опроса, секунд (0 — без кэша). Имеет смысл с кэшем в
+# памяти или Redis: чтение из DatabaseCache не дешевле самого запроса статуса.
+VIDEO_STATUS_CACHE_SECONDS = 2
+
+# Метрики Prometheus: /metrics в API, экспортёр воркера Celery на порту
+METRICS_ENABLED = True
+CELERY_METRICS_PORT = 9808
+
+# Трассировка API → Celery → ML → обратные вызовы (config.tracing).
+# Спаны пишутся в TRACING_FILE построчно в JSON или в лог ("console").
+TRACING_ENABLED = False
+TRACING_EXPORTER = "file"
+TRACING_FILE = BASE_DIR / "traces.jsonl"
+# Спан на каждый SQL-запрос внутри трассы
+TRACING_DB_SPANS = True
+
+# Профилировщик запросов (config.profiling): запросы с заголовком X-Profile,
+# равным PROFILER_TOKEN, доля PROFILER_SAMPLE_RATE и запросы дольше
+# PROFILER_SLOW_MS (None — не захватывать). Результаты — в админке «Профили запросов».
+PROFILER_ENABLED = False
+PROFILER_TOKEN = ""
+PROFILER_SAMPLE_RATE = 0.0
+PROFILER_SLOW_MS = None
+PROFILER_INTERVAL_MS = 5
+PROFILER_MAX_QUERIES = 1000
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://redis:6379/0'
-CELERY_RESULT_BACKEND = 'django-db'  # Сохранение результатов в БД для просмотра в админке
-CELERY_CACHE_BACKEND = 'django-cache'  # Кэш для результатов
+# Результаты задач — в Redis: запись результата каждой задачи в основную базу
+# конкурировала с API и обратными вызовами ML за блокировку записи.
+CELERY_RESULT_BACKEND = 'redis://redis:6379/2'
+CELERY_RESULT_EXPIRES = 24 * 60 * 60
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -187,6 +333,21 @@ CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutes
 CELERY_WORKER_SEND_TASK_EVENTS = True
 CELERY_TASK_SEND_SENT_EVENT = True
 CELERY_RESULT_EXTENDED = True  # Расширенная информация о результатах
+CELERY_BEAT_SCHEDULE = {
+    "reap-stuck-tasks": {
+        "task": "logistic.tasks.reap_stuck_tasks",
+        "schedule": 60.0,
+    },
+    "rollup-task-analytics": {
+        "task": "logistic.tasks.rollup_task_analytics",
+        "schedule": 300.0,
+    },
+}
+
+# Сводки заданий ML для аналитики (logistic.service.analytics):
+# последние секунды не учитываются, история читается окнами по часам.
+TASK_ROLLUP_LAG_SECONDS = 60
+TASK_ROLLUP_WINDOW_HOURS = 24
 
 CORS_ALLOW_ALL_ORIGINS = True  
 # CORS_ALLOWED_ORIGINS = ["https://your-frontend.com", "http://localhost:3000"]
@@ -0,0 +1,48 @@
+"""Профиль с Postgres и пулом соединений для нескольких процессов и узлов.
+
+    DJANGO_SETTINGS_MODULE=config.settings_postgres
+
+Параметры подключения — переменные окружения POSTGRES_*. Каждый процесс
+(воркер gunicorn, процесс prefork Celery) держит свой пул psycopg до
+POSTGRES_POOL_MAX_SIZE соединений: сумма по процессам не должна превышать
+max_connections сервера. За PgBouncer в режиме транзакций встроенный пул не
+нужен — POSTGRES_POOL=0 включает постоянные соединения (CONN_MAX_AGE).
+Реплики для чтения — POSTGRES_REPLICA_HOSTS через запятую (config.db_router).
+"""
+import os
+
+from config.settings import *  # noqa: F401,F403
+
+POSTGRES_POOL = os.environ.get("POSTGRES_POOL", "1") == "1"
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("POSTGRES_DB", "highlights"),
+        "USER": os.environ.get("POSTGRES_USER", "highlights"),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "highlights"),
+        "HOST": os.environ.get("POSTGRES_HOST", "postgres"),
+        "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        # Пул psycopg несовместим с CONN_MAX_AGE: соединение возвращается в пул
+        # в конце запроса или задачи.
+        "CONN_MAX_AGE": 0 if POSTGRES_POOL else int(os.environ.get("POSTGRES_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": not POSTGRES_POOL,
+        "OPTIONS": {
+            "pool": {
+                "min_size": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", 1)),
+                "max_size": int(os.environ.get("POSTGRES_POOL_MAX_SIZE", 8)),
+                # Сколько ждать свободного соединения, прежде чем вернуть ошибку.
+                "timeout": float(os.environ.get("POSTGRES_POOL_TIMEOUT", 10)),
+            } if POSTGRES_POOL else False,
+            # Зависший запрос не держит соединение пула дольше таймаута воркера.
+            "options": f"-c statement_timeout={int(os.environ.get('POSTGRES_STATEMENT_TIMEOUT_MS', 60000))}",
+        },
+    }
+}
+
+DATABASES.update({
+    f"replica_{n}": {**DATABASES["default"], "HOST": host.strip(), "TEST": {"MIRROR": "default"}}
+    for n, host in enumerate(os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(","))
+    if host.strip()
+})
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith("replica_")]
@@ -0,0 +1,22 @@
+"""Локальная проверка чтения с реплики: вторая база SQLite вместо реплики.
+
+    DJANGO_SETTINGS_MODULE=config.settings_replica python manage.py migrate
+    DJANGO_SETTINGS_MODULE=config.settings_replica python manage.py sync_replica --interval 5
+
+Реплика — копия db.sqlite3, которую sync_replica обновляет раз в interval
+секунд, то есть реплика отстаёт так же, как настоящая. В тестах реплика —
+отдельная база, которую тест заполняет через sync_replica.copy_sqlite:
+
+    python manage.py test --settings=config.settings_replica
+"""
+from config.settings import *  # noqa: F401,F403
+from config.settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    **DATABASES,
+    "replica": {
+        **DATABASES["default"],
+        "NAME": BASE_DIR / "db.replica.sqlite3",
+    },
+}
+DATABASE_REPLICAS = ["replica"]
@@ -0,0 +1,256 @@
+"""Лёгкая трассировка пути видео: API → Celery → ML → обратные вызовы ML.
+
+Контекст трассы — заголовок W3C traceparent (00-<trace_id>-<span_id>-01).
+Он создаётся при приёме запроса, уходит в заголовках задач Celery, в запросе
+к ML и сохраняется в ConfigTask.traceparent, чтобы обратные вызовы ML
+продолжили ту же трассу. Спаны пишутся построчно в JSON (TRACING_FILE) или в
+лог (TRACING_EXPORTER = "console"); внешний коллектор не нужен.
+
+    python manage.py show_trace --task 42
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+_write_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return getattr(settings, "TRACING_ENABLED", False)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    start: float = field(default_factory=time.time)
+    duration: float | None = None
+    status: str = "ok"
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+            "pid": os.getpid(),
+        }
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    """(trace_id, span_id) из traceparent или None, если значение некорректно."""
+    match = TRACEPARENT_RE.match((value or "").strip().lower())
+    return match.groups() if match else None
+
+
+def current_traceparent() -> str:
+    """traceparent текущего спана или пустая строка вне трассы."""
+    span = _current.get()
+    return span.traceparent if span else ""
+
+
+def start_span(name: str, parent: str | None = None, **attributes):
+    """Открывает спан и делает его текущим. Возвращает (span, token) для finish_span.
+
+    parent — traceparent удалённого родителя (заголовок задачи, ConfigTask);
+    без него спан продолжает текущую трассу или начинает новую. Если удалённый
+    родитель из другой трассы, текущий спан сохраняется как ссылка (link).
+    """
+    current = _current.get()
+    remote = parse_traceparent(parent)
+    if remote:
+        trace_id, parent_id = remote
+        if current and current.trace_id != trace_id:
+            attributes["link"] = current.traceparent
+    elif current:
+        trace_id, parent_id = current.trace_id, current.span_id
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+    span = Span(name, trace_id, os.urandom(8).hex(), parent_id, attributes=attributes)
+    return span, _current.set(span)
+
+
+def finish_span(span: Span, token, error: BaseException | None = None) -> None:
+    span.duration = time.time() - span.start
+    if error is not None:
+        span.status = "error"
+        span.attributes["error"] = f"{type(error).__name__}: {error}"[:500]
+    _current.reset(token)
+    export(span)
+
+
+@contextmanager
+def span(name: str, parent: str | None = None, **attributes):
+    """Спан на время блока; при выключенной трассировке ничего не делает."""
+    if not enabled():
+        yield None
+        return
+    current, token = start_span(name, parent, **attributes)
+    try:
+        yield current
+    except BaseException as e:
+        finish_span(current, token, e)
+        raise
+    finish_span(current, token)
+
+
+def export(span: Span) -> None:
+    line = json.dumps(span.as_dict(), ensure_ascii=False, default=str)
+    if getattr(settings, "TRACING_EXPORTER", "file") == "console":
+        logger.info(line)
+        return
+    path = str(getattr(settings, "TRACING_FILE", "traces.jsonl"))
+    try:
+        with _write_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logger.warning("Не удалось записать спан в %s: %s", path, e)
+
+
+# Запросы к БД: спан на каждый SQL-запрос внутри трассы.
+
+def _trace_query(execute, sql, params, many, context):
+    if _current.get() is None:
+        return execute(sql, params, many, context)
+    with span("db.query", sql=sql[:300], many=many, database=context["connection"].alias):
+        return execute(sql, params, many, context)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    if not enabled() or not getattr(settings, "TRACING_DB_SPANS", True):
+        return
+    if _trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_trace_query)
+
+
+def connect_db_signals() -> None:
+    connection_created.connect(_on_connection_created, dispatch_uid="tracing_db")
+    for conn in connections.all(initialized_only=True):
+        _on_connection_created(None, conn)
+
+
+class TracingMiddleware:
+    """Спан на HTTP-запрос; входящий заголовок traceparent продолжает трассу клиента."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        connect_db_signals()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        except BaseException as e:
+            finish_span(current, token, e)
+            raise
+        return self.finish(request, response, current, token)
+
+    async def __acall__(self, request):
+        current, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException as e:
+            finish_span(current, token, e)
+            raise
+        return self.finish(request, response, current, token)
+
+    def start(self, request):
+        return start_span(
+            "http",
+            parent=request.headers.get("traceparent"),
+            method=request.method,
+            path=request.path,
+        )
+
+    def finish(self, request, response, current, token):
+        from config.metrics import view_name
+
+        current.name = f"http {view_name(request)}"
+        current.set(status=response.status_code)
+        if response.status_code >= 500:
+            current.status = "error"
+        response["traceparent"] = current.traceparent
+        finish_span(current, token)
+        return response
+
+
+# Celery: контекст в заголовках задачи, спан на выполнение задачи.
+
+_task_spans = {}
+
+
+def _before_task_publish(headers=None, **kwargs):
+    traceparent = current_traceparent()
+    if headers is not None and traceparent:
+        headers["traceparent"] = traceparent
+
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    if not enabled():
+        return
+    _task_spans[task_id] = start_span(
+        f"celery {task.name}",
+        parent=task.request.get("traceparent"),
+        task_id=task_id,
+        args=repr(task.request.args)[:200],
+    )
+
+
+def _task_postrun(task_id=None, state=None, retval=None, **kwargs):
+    started = _task_spans.pop(task_id, None)
+    if started is None:
+        return
+    current, token = started
+    current.set(state=state)
+    finish_span(current, token, retval if state == "FAILURE" and isinstance(retval, BaseException) else None)
+
+
+def connect_celery_signals() -> None:
+    """Подключает сигналы; включённость проверяется при вызове, настройки ещё могут загружаться."""
+    from celery import signals
+
+    # Только сигнал: обращение к connections здесь закэшировало бы незагруженные DATABASES.
+    connection_created.connect(_on_connection_created, dispatch_uid="tracing_db")
+    signals.before_task_publish.connect(_before_task_publish, weak=False)
+    signals.task_prerun.connect(_task_prerun, weak=False)
+    signals.task_postrun.connect(_task_postrun, weak=False)
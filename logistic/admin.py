@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import ConfigTask
+from .models import CandidateSegment, ConfigTask, ProcessingRate, TaskRollup, VideoAnalysis
+from .service.analytics import percentile, rollup_stats
 
 
 @admin.register(ConfigTask)
@@ -9,9 +10,106 @@ class ConfigTaskAdmin(admin.ModelAdmin):
         "id",
         "video",
         "status",
+        "parent",
+        "window_start",
+        "window_end",
+        "attempts",
         "created_at",
         "started_at",
         "finished_at",
+        "deadline_at",
     )
     list_filter = ("status", "created_at", "started_at", "finished_at")
     search_fields = ("video__title",)
+
+
+@admin.register(ProcessingRate)
+class ProcessingRateAdmin(admin.ModelAdmin):
+    list_display = ("kind", "rate", "samples", "updated_at")
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(VideoAnalysis)
+class VideoAnalysisAdmin(admin.ModelAdmin):
+    list_display = ("id", "video", "stage", "params_key", "stats", "created_at")
+    list_filter = ("stage",)
+    search_fields = ("video__title",)
+
+
+@admin.register(CandidateSegment)
+class CandidateSegmentAdmin(admin.ModelAdmin):
+    list_display = ("id", "video", "source", "start_time", "end_time", "score")
+    list_filter = ("source",)
+    search_fields = ("video__title",)
+
+
+def _seconds(value) -> str:
+    return "—" if value is None else f"{value:.1f}"
+
+
+@admin.register(TaskRollup)
+class TaskRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        "hour",
+        "kind",
+        "duration_bucket",
+        "finished",
+        "failed",
+        "failure_rate",
+        "wait_p50",
+        "wait_p90",
+        "wait_p99",
+        "run_p50",
+        "run_p90",
+        "run_p99",
+        "errors",
+    )
+    list_filter = ("kind", "duration_bucket", "hour")
+    date_hierarchy = "hour"
+    readonly_fields = [f.name for f in TaskRollup._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        context = getattr(response, "context_data", None)
+        if context and "cl" in context:
+            # Итог по отфильтрованным сводкам — в заголовке списка.
+            stats = rollup_stats(context["cl"].queryset)
+            wait, run = stats["wait"], stats["run"]
+            context["title"] = (
+                f"Заданий: {stats['finished']}, ошибок: {stats['failed']}; "
+                f"ожидание p50/p90/p99: {_seconds(wait['p50'])}/{_seconds(wait['p90'])}/{_seconds(wait['p99'])} с; "
+                f"обработка: {_seconds(run['p50'])}/{_seconds(run['p90'])}/{_seconds(run['p99'])} с"
+            )
+        return response
+
+    @admin.display(description="Доля ошибок")
+    def failure_rate(self, obj):
+        return f"{obj.failed / obj.finished:.1%}" if obj.finished else "—"
+
+    @admin.display(description="Ожидание p50, с")
+    def wait_p50(self, obj):
+        return _seconds(percentile(obj.wait_histogram, 50))
+
+    @admin.display(description="Ожидание p90, с")
+    def wait_p90(self, obj):
+        return _seconds(percentile(obj.wait_histogram, 90))
+
+    @admin.display(description="Ожидание p99, с")
+    def wait_p99(self, obj):
+        return _seconds(percentile(obj.wait_histogram, 99))
+
+    @admin.display(description="Обработка p50, с")
+    def run_p50(self, obj):
+        return _seconds(percentile(obj.run_histogram, 50))
+
+    @admin.display(description="Обработка p90, с")
+    def run_p90(self, obj):
+        return _seconds(percentile(obj.run_histogram, 90))
+
+    @admin.display(description="Обработка p99, с")
+    def run_p99(self, obj):
+        return _seconds(percentile(obj.run_histogram, 99))
+
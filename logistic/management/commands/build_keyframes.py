@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from logistic.service.keyframes import build_keyframe_indexes, is_current
+from main.models import Video
+
+
+class Command(BaseCommand):
+    help = "Строит индексы ключевых кадров для видео в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", nargs="+", type=int, help="Конкретные id видео")
+        parser.add_argument("--workers", type=int, default=None, help="Процессов ffprobe")
+        parser.add_argument("--force", action="store_true", help="Перестроить существующие индексы")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(file="")
+        if options["ids"]:
+            videos = videos.filter(pk__in=options["ids"])
+        video_ids = [
+            video.pk for video in videos.only("id", "file", "keyframes_file")
+            if options["force"] or not is_current(video)
+        ]
+        self.stdout.write(f"Видео без индекса ключевых кадров: {len(video_ids)}")
+        if not video_ids:
+            return
+
+        results = build_keyframe_indexes(video_ids, workers=options["workers"], force=options["force"])
+        failed = {video_id: e for video_id, e in results.items() if isinstance(e, Exception)}
+        self.stdout.write(self.style.SUCCESS(f"Построено: {len(results) - len(failed)}"))
+        for video_id, e in sorted(failed.items()):
+            self.stderr.write(f"Видео #{video_id}: {e}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from logistic.service.previews import build_previews_batch
+from main.models import Video
+
+
+class Command(BaseCommand):
+    help = "Собирает кадры-превью хайлайтов и спрайт-листы видео в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", nargs="+", type=int, help="Конкретные id видео")
+        parser.add_argument("--workers", type=int, default=None, help="Процессов ffmpeg")
+        parser.add_argument("--force", action="store_true", help="Пересобрать существующие превью")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(file="")
+        if options["ids"]:
+            videos = videos.filter(pk__in=options["ids"])
+        video_ids = list(videos.values_list("id", flat=True))
+        self.stdout.write(f"Видео: {len(video_ids)}")
+        if not video_ids:
+            return
+
+        results = build_previews_batch(video_ids, workers=options["workers"], force=options["force"])
+        failed = {video_id: e for video_id, e in results.items() if isinstance(e, Exception)}
+        done = [r for r in results.values() if isinstance(r, dict)]
+        self.stdout.write(self.style.SUCCESS(
+            f"Спрайтов: {sum(r['sprite'] for r in done)}, "
+            f"кадров: {sum(r['thumbnails'] for r in done)}"
+        ))
+        for video_id, e in sorted(failed.items()):
+            self.stderr.write(f"Видео #{video_id}: {e}")
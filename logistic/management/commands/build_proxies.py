@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from logistic.service.proxy import build_proxies, proxy_is_current
+from main.models import Video
+
+
+class Command(BaseCommand):
+    help = "Собирает proxy-копии видео для ML в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", nargs="+", type=int, help="Конкретные id видео")
+        parser.add_argument("--workers", type=int, default=None, help="Процессов ffmpeg")
+        parser.add_argument("--force", action="store_true", help="Пересобрать существующие proxy")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(file="")
+        if options["ids"]:
+            videos = videos.filter(pk__in=options["ids"])
+        video_ids = [
+            video.pk for video in videos.only("id", "file", "proxy_file")
+            if options["force"] or not proxy_is_current(video)
+        ]
+        self.stdout.write(f"Видео без актуальной proxy: {len(video_ids)}")
+        if not video_ids:
+            return
+
+        results = build_proxies(video_ids, workers=options["workers"], force=options["force"])
+        failed = [video_id for video_id, name in results.items() if not name]
+        self.stdout.write(self.style.SUCCESS(f"Собрано: {len(results) - len(failed)}"))
+        if failed:
+            self.stderr.write(f"Ошибки для видео: {sorted(failed)}")
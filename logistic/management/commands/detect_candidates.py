@@ -0,0 +1,63 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from logistic.models import AnalysisStage
+from logistic.service import audio_peaks, scene_detect
+from logistic.service.pool import run_in_processes
+from main.models import Video
+
+STAGES = {
+    AnalysisStage.SCENE: scene_detect.detect_scenes,
+    AnalysisStage.AUDIO: audio_peaks.detect_audio_peaks,
+}
+
+
+class Command(BaseCommand):
+    help = "Находит участки-кандидаты для ML локальным анализом видео в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stage", choices=[s.value for s in STAGES], default=AnalysisStage.SCENE)
+        parser.add_argument("--ids", nargs="+", type=int, help="Конкретные id видео")
+        parser.add_argument("--workers", type=int, default=None, help="Процессов анализа")
+        parser.add_argument("--force", action="store_true", help="Повторить анализ с актуальными параметрами")
+        parser.add_argument(
+            "--benchmark",
+            action="store_true",
+            help="Вывести скорость анализа: кадров (видео или звука) в секунду на процесс",
+        )
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(file="")
+        if options["ids"]:
+            videos = videos.filter(pk__in=options["ids"])
+        video_ids = list(videos.values_list("id", flat=True))
+        self.stdout.write(f"Видео для анализа: {len(video_ids)}")
+        if not video_ids:
+            return
+
+        workers = options["workers"] or getattr(settings, "CANDIDATE_WORKERS", None)
+        func = STAGES[AnalysisStage(options["stage"])]
+        started = time.perf_counter()
+        results = run_in_processes(partial(func, force=options["force"]), video_ids, workers=workers)
+        elapsed = time.perf_counter() - started
+
+        failed = {video_id: e for video_id, e in results.items() if isinstance(e, Exception)}
+        done = [stats for stats in results.values() if isinstance(stats, dict)]
+        self.stdout.write(self.style.SUCCESS(
+            f"Проанализировано: {len(done)}, без изменений: {len(results) - len(done) - len(failed)}"
+        ))
+        for video_id, e in sorted(failed.items()):
+            self.stderr.write(f"Видео #{video_id}: {e}")
+
+        if options["benchmark"] and done:
+            frames = sum(stats["frames"] for stats in done)
+            seconds = sum(stats["seconds"] for stats in done)
+            used = min(workers or len(video_ids), len(video_ids))
+            self.stdout.write(
+                f"Кадров: {frames}, секунд видео: {seconds:.0f}, время: {elapsed:.1f} с, процессов: {used}\n"
+                f"Кадров в секунду на процесс: {frames / (elapsed * used):.0f}, "
+                f"видео в реальном времени: {seconds / elapsed:.0f}x"
+            )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from logistic.service.hls import is_current, package_batch, package_highlight_file, package_video
+from main.models import HighlightFile, Video
+
+
+class Command(BaseCommand):
+    help = "Упаковывает видео (и при желании вырезки) в HLS в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", nargs="+", type=int, help="Конкретные id видео")
+        parser.add_argument("--workers", type=int, default=None, help="Процессов ffmpeg")
+        parser.add_argument("--force", action="store_true", help="Пересобрать существующие плейлисты")
+        parser.add_argument("--highlight-files", action="store_true", help="Упаковать и вырезки этих видео")
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(file="")
+        if options["ids"]:
+            videos = videos.filter(pk__in=options["ids"])
+        video_ids = [
+            video.pk for video in videos.only("id", "file", "hls_manifest")
+            if options["force"] or not is_current(video)
+        ]
+        self.stdout.write(f"Видео без актуального HLS: {len(video_ids)}")
+        if video_ids:
+            self.report(package_batch(package_video, video_ids, options["workers"], options["force"]), "Видео")
+
+        if options["highlight_files"]:
+            file_ids = list(
+                HighlightFile.objects.filter(video__in=videos).values_list("id", flat=True)
+            )
+            self.stdout.write(f"Вырезок: {len(file_ids)}")
+            if file_ids:
+                self.report(
+                    package_batch(package_highlight_file, file_ids, options["workers"], options["force"]),
+                    "Вырезка",
+                )
+
+    def report(self, results, label):
+        failed = {pk: e for pk, e in results.items() if isinstance(e, Exception)}
+        self.stdout.write(self.style.SUCCESS(f"Упаковано: {len(results) - len(failed)}"))
+        for pk, e in sorted(failed.items()):
+            self.stderr.write(f"{label} #{pk}: {e}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from logistic.service.reaper import expired_tasks, reap_expired_tasks
+
+
+class Command(BaseCommand):
+    help = "Завершает задания ML, зависшие в статусе running после истечения крайнего срока"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Размер пачки")
+        parser.add_argument("--max-batches", type=int, default=None, help="Максимум пачек за запуск")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать просроченные задания",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            count = expired_tasks(timezone.now()).count()
+            self.stdout.write(f"Просроченных заданий: {count}")
+            return
+
+        total = reap_expired_tasks(
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Завершено заданий: {total}"))
@@ -0,0 +1,81 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from logistic.service.reprocess import reprocess_videos
+from main.models import Video
+
+
+class Command(BaseCommand):
+    help = "Повторно отправляет существующие видео в ML пачками с ограничением скорости"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="LOOKUP=VALUE",
+            help="Фильтр queryset видео, например status=processed или created_at__gte=2026-01-01",
+        )
+        parser.add_argument("--ids", nargs="+", type=int, help="Конкретные id видео")
+        parser.add_argument("--chunk-size", type=int, default=100, help="Видео, читаемых из базы за раз")
+        parser.add_argument("--rate", type=float, default=None, help="Заданий в минуту")
+        parser.add_argument(
+            "--replace-highlights",
+            action="store_true",
+            help="Удалить прежние стандартные хайлайты, когда придут новые результаты",
+        )
+        parser.add_argument(
+            "--state-file",
+            default=None,
+            help="Файл прогресса: при повторном запуске продолжить с последнего видео",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Только посчитать видео")
+
+    def handle(self, *args, **options):
+        queryset = Video.objects.all()
+        filters = {}
+        for item in options["filter"]:
+            lookup, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"Ожидается LOOKUP=VALUE, получено: {item}")
+            filters[lookup] = value
+        if filters:
+            queryset = queryset.filter(**filters)
+        if options["ids"]:
+            queryset = queryset.filter(pk__in=options["ids"])
+
+        state_file = options["state_file"]
+        state = {"last_id": None, "done": 0}
+        if state_file and os.path.exists(state_file):
+            with open(state_file, encoding="utf-8") as f:
+                state = json.load(f)
+            self.stdout.write(f"Продолжаем после видео #{state['last_id']}, уже поставлено {state['done']}")
+
+        remaining = queryset
+        if state["last_id"]:
+            remaining = queryset.filter(pk__gt=state["last_id"])
+        total = remaining.count()
+        self.stdout.write(f"Видео к переобработке: {total}")
+        if options["dry_run"] or not total:
+            return
+
+        already_done = state["done"]
+
+        def on_progress(last_id, done):
+            state.update(last_id=last_id, done=already_done + done)
+            if state_file:
+                with open(state_file, "w", encoding="utf-8") as f:
+                    json.dump(state, f)
+            self.stdout.write(f"Поставлено {done}/{total}, последнее видео #{last_id}")
+
+        done = reprocess_videos(
+            queryset,
+            chunk_size=options["chunk_size"],
+            rate_per_minute=options["rate"],
+            replace_highlights=options["replace_highlights"],
+            after_id=state["last_id"],
+            on_progress=on_progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Готово: поставлено заданий {done}"))
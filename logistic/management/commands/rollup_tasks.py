@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from logistic.service.analytics import rebuild_rollups, update_rollups
+
+
+class Command(BaseCommand):
+    help = "Добавляет завершённые задания ML в часовые сводки аналитики"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Удалить сводки и пересчитать по всей истории заданий",
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_rollups() if options["rebuild"] else update_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Учтено заданий: {total}"))
@@ -0,0 +1,83 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config.tracing import parse_traceparent
+from logistic.models import ConfigTask
+
+
+class Command(BaseCommand):
+    help = "Выводит дерево спанов трассы из TRACING_FILE: где ушло время обработки видео"
+
+    def add_arguments(self, parser):
+        parser.add_argument("trace_id", nargs="?", help="Идентификатор трассы")
+        parser.add_argument("--task", type=int, help="Трасса, в которой создано задание ML")
+        parser.add_argument("--file", help="Файл спанов (по умолчанию TRACING_FILE)")
+        parser.add_argument(
+            "--db",
+            action="store_true",
+            help="Показывать каждый SQL-запрос (по умолчанию — сводка на родительский спан)",
+        )
+
+    def handle(self, *args, **options):
+        trace_id = options["trace_id"]
+        if options["task"]:
+            task = ConfigTask.objects.filter(pk=options["task"]).first()
+            parsed = parse_traceparent(task.traceparent) if task else None
+            if not parsed:
+                raise CommandError(f"У задания #{options['task']} нет контекста трассы")
+            trace_id = parsed[0]
+        if not trace_id:
+            raise CommandError("Укажите trace_id или --task")
+
+        path = options["file"] or str(getattr(settings, "TRACING_FILE", "traces.jsonl"))
+        try:
+            with open(path, encoding="utf-8") as f:
+                spans = [s for s in map(json.loads, f) if s["trace_id"] == trace_id]
+        except FileNotFoundError as e:
+            raise CommandError(f"Файл спанов не найден: {path}") from e
+        if not spans:
+            raise CommandError(f"Спаны трассы {trace_id} не найдены в {path}")
+
+        known = {s["span_id"] for s in spans}
+        children = defaultdict(list)
+        for s in spans:
+            # Спаны с родителем вне файла (например, из другого процесса) выводим как корни.
+            children[s["parent_id"] if s["parent_id"] in known else None].append(s)
+        for items in children.values():
+            items.sort(key=lambda s: s["start"])
+
+        self.origin = min(s["start"] for s in spans)
+        self.show_db = options["db"]
+        self.stdout.write(f"Трасса {trace_id}: спанов {len(spans)}")
+        self.stdout.write(f"{'начало, мс':>11} {'длит., мс':>10}  спан")
+        for root in children[None]:
+            self._write(root, children, 0)
+
+    def _write(self, span, children, depth):
+        self._line(span["start"], span["duration"], depth, self._label(span))
+        queries = []
+        for child in children[span["span_id"]]:
+            if child["name"] == "db.query" and not self.show_db:
+                queries.append(child)
+            else:
+                self._write(child, children, depth + 1)
+        if queries:
+            total = sum(q["duration"] or 0 for q in queries)
+            self._line(queries[0]["start"], total, depth + 1, f"db.query ×{len(queries)}")
+
+    def _line(self, start, duration, depth, label):
+        offset = (start - self.origin) * 1000
+        elapsed = f"{duration * 1000:10.1f}" if duration is not None else f"{'—':>10}"
+        self.stdout.write(f"{offset:11.1f} {elapsed}  {'  ' * depth}{label}")
+
+    def _label(self, span):
+        attributes = {k: v for k, v in span["attributes"].items() if k not in ("link", "sql")}
+        label = span["name"]
+        if attributes:
+            label += " " + " ".join(f"{k}={v}" for k, v in attributes.items())
+        if span["status"] == "error":
+            label = self.style.ERROR(label)
+        return label
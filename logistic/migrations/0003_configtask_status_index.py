@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistic', '0002_configtask_promt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='configtask',
+            index=models.Index(fields=['status', 'created_at'], name='task_status_created_idx'),
+        ),
+    ]
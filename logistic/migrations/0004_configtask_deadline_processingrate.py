@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistic', '0003_configtask_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('default', 'Стандартная обработка'), ('custom', 'Собственный промт')], help_text='Тип заданий', max_length=16, unique=True)),
+                ('rate', models.FloatField(help_text='Скользящее среднее: секунд видео на секунду обработки')),
+                ('samples', models.PositiveIntegerField(default=0, help_text='Количество заданий, по которым обучена оценка')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Скорость обработки ML',
+                'verbose_name_plural': 'Скорости обработки ML',
+            },
+        ),
+        migrations.AddField(
+            model_name='configtask',
+            name='deadline_at',
+            field=models.DateTimeField(blank=True, help_text='Крайний срок выполнения, рассчитанный по длительности видео', null=True),
+        ),
+    ]
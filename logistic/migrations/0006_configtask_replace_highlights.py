@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistic', '0005_configtask_status_deadline_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configtask',
+            name='replace_highlights',
+            field=models.BooleanField(default=False, help_text='Заменить прежние стандартные хайлайты видео результатами этого задания'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistic', '0006_configtask_replace_highlights'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configtask',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Количество повторных запусков окна'),
+        ),
+        migrations.AddField(
+            model_name='configtask',
+            name='is_split',
+            field=models.BooleanField(default=False, help_text='Видео обрабатывается окнами в дочерних заданиях'),
+        ),
+        migrations.AddField(
+            model_name='configtask',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='Задание, на окна которого разбито видео', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='windows', to='logistic.configtask'),
+        ),
+        migrations.AddField(
+            model_name='configtask',
+            name='window_end',
+            field=models.PositiveIntegerField(blank=True, help_text='Конец окна в секундах от начала видео', null=True),
+        ),
+        migrations.AddField(
+            model_name='configtask',
+            name='window_start',
+            field=models.PositiveIntegerField(blank=True, help_text='Начало окна в секундах от начала видео', null=True),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistic', '0007_configtask_windows'),
+        ('main', '0010_video_proxy_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('scene', 'Смена сцены')], help_text='Этап анализа, нашедший участок', max_length=16)),
+                ('start_time', models.PositiveIntegerField(help_text='Начало участка в секундах')),
+                ('end_time', models.PositiveIntegerField(help_text='Конец участка в секундах')),
+                ('score', models.FloatField(help_text='Оценка интересности участка')),
+                ('video', models.ForeignKey(help_text='Видео', on_delete=django.db.models.deletion.CASCADE, related_name='candidates', to='main.video')),
+            ],
+            options={
+                'verbose_name': 'Кандидат в хайлайты',
+                'verbose_name_plural': 'Кандидаты в хайлайты',
+                'ordering': ['video', 'start_time'],
+                'indexes': [models.Index(fields=['video', 'source', 'start_time'], name='candidate_video_source_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VideoAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('scene', 'Смена сцены')], help_text='Этап анализа', max_length=16)),
+                ('params_key', models.CharField(help_text='Ключ параметров этапа: при их изменении анализ повторяется', max_length=64)),
+                ('stats', models.JSONField(blank=True, default=dict, help_text='Статистика: кадров, секунд, скорость обработки')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('video', models.ForeignKey(help_text='Видео', on_delete=django.db.models.deletion.CASCADE, related_name='analyses', to='main.video')),
+            ],
+            options={
+                'verbose_name': 'Анализ видео',
+                'verbose_name_plural': 'Анализы видео',
+                'constraints': [models.UniqueConstraint(fields=('video', 'stage'), name='video_analysis_stage_unique')],
+            },
+        ),
+    ]
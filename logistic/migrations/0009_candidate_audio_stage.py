@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistic', '0008_video_analysis_candidates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candidatesegment',
+            name='source',
+            field=models.CharField(choices=[('scene', 'Смена сцены'), ('audio', 'Пики звука')], help_text='Этап анализа, нашедший участок', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='videoanalysis',
+            name='stage',
+            field=models.CharField(choices=[('scene', 'Смена сцены'), ('audio', 'Пики звука')], help_text='Этап анализа', max_length=16),
+        ),
+    ]
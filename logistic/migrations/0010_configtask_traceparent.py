@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistic', '0009_candidate_audio_stage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configtask',
+            name='traceparent',
+            field=models.CharField(blank=True, default='', help_text='Контекст трассы (W3C traceparent), в которой создано задание', max_length=55),
+        ),
+    ]
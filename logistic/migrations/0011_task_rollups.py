@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistic', '0010_configtask_traceparent'),
+        ('main', '0013_hls_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True)),
+                ('position', models.DateTimeField(blank=True, help_text='Задания, завершённые не позже этого момента, уже в сводках', null=True)),
+            ],
+            options={
+                'verbose_name': 'Позиция сводок',
+                'verbose_name_plural': 'Позиции сводок',
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Начало часа, в котором задания завершились')),
+                ('kind', models.CharField(choices=[('default', 'Стандартная обработка'), ('custom', 'Собственный промт')], help_text='Тип заданий', max_length=16)),
+                ('duration_bucket', models.CharField(choices=[('short', 'До 5 минут'), ('medium', '5–20 минут'), ('long', '20–60 минут'), ('very_long', 'Больше часа'), ('unknown', 'Длительность неизвестна')], help_text='Длительность видео', max_length=16)),
+                ('finished', models.PositiveIntegerField(default=0, help_text='Завершено заданий')),
+                ('failed', models.PositiveIntegerField(default=0, help_text='Из них с ошибкой')),
+                ('errors', models.JSONField(blank=True, default=dict, help_text='Число ошибок по классам')),
+                ('wait_histogram', models.JSONField(blank=True, default=dict, help_text='Ожидание в очереди: {номер корзины: число заданий}')),
+                ('run_histogram', models.JSONField(blank=True, default=dict, help_text='Время обработки: {номер корзины: число заданий}')),
+                ('wait_sum', models.FloatField(default=0, help_text='Суммарное ожидание, с')),
+                ('run_sum', models.FloatField(default=0, help_text='Суммарное время обработки, с')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Сводка заданий за час',
+                'verbose_name_plural': 'Сводки заданий по часам',
+                'ordering': ['-hour', 'kind', 'duration_bucket'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='configtask',
+            index=models.Index(fields=['finished_at'], name='task_finished_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskrollup',
+            constraint=models.UniqueConstraint(fields=('hour', 'kind', 'duration_bucket'), name='task_rollup_hour_kind_bucket_unique'),
+        ),
+    ]
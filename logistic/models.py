@@ -1,7 +1,9 @@
 import logging
+from datetime import timedelta
 
 from django.db import models
 
+from config import tracing
 from main.models import Video
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,11 @@ class TaskStatus(models.TextChoices):
     FAILED = "failed", "Завершено с ошибкой"
 
 
+class RateKind(models.TextChoices):
+    DEFAULT = "default", "Стандартная обработка"
+    CUSTOM = "custom", "Собственный промт"
+
+
 class ConfigTask(models.Model):
     video = models.ForeignKey(
         Video,
@@ -32,9 +39,44 @@ class ConfigTask(models.Model):
         blank=True,
         null=True,
     )
+    replace_highlights = models.BooleanField(
+        default=False,
+        help_text="Заменить прежние стандартные хайлайты видео результатами этого задания",
+    )
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        related_name="windows",
+        null=True,
+        blank=True,
+        help_text="Задание, на окна которого разбито видео",
+    )
+    is_split = models.BooleanField(
+        default=False,
+        help_text="Видео обрабатывается окнами в дочерних заданиях",
+    )
+    window_start = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Начало окна в секундах от начала видео",
+    )
+    window_end = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Конец окна в секундах от начала видео",
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Количество повторных запусков окна",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
+    deadline_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Крайний срок выполнения, рассчитанный по длительности видео",
+    )
     result = models.JSONField(
         null=True,
         blank=True,
@@ -44,59 +86,146 @@ class ConfigTask(models.Model):
         blank=True,
         help_text="Текст ошибки",
     )
+    traceparent = models.CharField(
+        max_length=55,
+        blank=True,
+        default="",
+        help_text="Контекст трассы (W3C traceparent), в которой создано задание",
+    )
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Задание"
         verbose_name_plural = "Задания"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="task_status_created_idx"),
+            models.Index(fields=["status", "deadline_at"], name="task_status_deadline_idx"),
+            # Инкрементальные сводки читают задания по времени завершения.
+            models.Index(fields=["finished_at"], name="task_finished_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Задание #{self.pk} для {self.video}"
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
+        if is_new and not self.traceparent:
+            self.traceparent = tracing.current_traceparent()
         super().save(*args, **kwargs)
         if is_new:
-            try:
-                from .tasks import run_ml_task
-                run_ml_task.apply_async(args=[self.pk])
-            except Exception as e:
-                logger.warning(
-                    f"Не удалось поставить задачу ML в очередь (брокер недоступен). ",
-                    f"Ошибка: {e}"
-                )
+            self.dispatch()
+
+    @classmethod
+    def create_batch(cls, videos, dispatch=True, **fields):
+        """Создаёт задания для пачки видео одним bulk_create и ставит их в очередь."""
+        fields.setdefault("traceparent", tracing.current_traceparent())
+        tasks = cls.objects.bulk_create([cls(video=video, **fields) for video in videos])
+        if dispatch:
+            for task in tasks:
+                task.dispatch()
+        return tasks
+
+    def dispatch(self, countdown=None, extra_payload=None, queued_at=None) -> None:
+        """Ставит задание в очередь ML с лимитами времени по его таймауту.
+
+        queued_at — с какого момента (ISO) считать ожидание в очереди ML, если
+        не с created_at: например, после подготовки видео.
+        """
+        from .service.pipeline import needs_preparation
+        from .tasks import prepare_video_task
+
+        ml_task = self.ml_signature(extra_payload=extra_payload, queued_at=queued_at)
+        try:
+            if not self.is_window and needs_preparation(self.video):
+                # Proxy и кандидаты готовятся в очереди media, затем prepare_video_task
+                # ставит задание в очередь ML с отметкой времени окончания подготовки.
+                prepare_video_task.apply_async(args=[self.video_id, ml_task], countdown=countdown)
+            else:
+                ml_task.apply_async(countdown=countdown)
+        except Exception as e:
+            logger.warning(
+                f"Не удалось поставить задачу ML в очередь (брокер недоступен). ",
+                f"Ошибка: {e}"
+            )
+
+    def ml_signature(self, extra_payload=None, timeout=None, queued_at=None):
+        """Сигнатура run_ml_task с лимитами времени Celery по таймауту задания."""
+        from .service.timeouts import compute_timeout
+        from .tasks import run_ml_task
+
+        # Один таймаут на лимиты Celery и на deadline_at в start(): иначе при
+        # изменении скорости обработки лимит может сработать раньше дедлайна.
+        if timeout is None:
+            timeout = compute_timeout(self)
+        # Запас сверх таймаута: воркер должен успеть сам пометить задание failed.
+        time_limit = timeout + 60
+        return run_ml_task.signature(
+            args=[self.pk, extra_payload, timeout],
+            kwargs={"queued_at": queued_at} if queued_at else {},
+            soft_time_limit=time_limit,
+            time_limit=time_limit + 30,
+        )
+
     @property
     def is_custom(self):
         return self.promt and self.promt != ''
 
-    def start(self, extra_payload=None) -> None:
+    @property
+    def is_window(self) -> bool:
+        return self.parent_id is not None
+
+    @property
+    def media_duration(self):
+        """Длительность обрабатываемого фрагмента: окна или всего видео."""
+        if self.is_window:
+            return self.window_end - self.window_start
+        return self.video.duration
+
+    def fail(self, message: str) -> None:
+        """Переводит задание в статус failed с текстом ошибки."""
+        from django.utils import timezone
+
+        self.status = TaskStatus.FAILED
+        self.error_message = message
+        self.finished_at = timezone.now()
+        self.save(update_fields=["status", "error_message", "finished_at"])
+        self.on_finished()
+
+    def on_finished(self) -> None:
+        """Вызывается после перехода в success/failed: повтор окна и сборка родителя."""
+        if self.is_window:
+            from .service.windows import on_window_finished
+            on_window_finished(self)
+
+    def start(self, extra_payload=None, timeout=None) -> None:
+        """Отправляет задание в ML. timeout — значение, с которым dispatch выставил лимиты Celery."""
         from django.conf import settings
         from django.utils import timezone
 
         from .service.ml_adapter import MLAdapter
+        from .service.pipeline import candidates_for
+        from .service.proxy import proxy_enabled
+        from .service.timeouts import compute_timeout
 
         if self.status != TaskStatus.PENDING:
             return
 
         self.status = TaskStatus.RUNNING
         self.started_at = timezone.now()
-        self.save(update_fields=["status", "started_at"])
+        self.deadline_at = self.started_at + timedelta(seconds=timeout or compute_timeout(self))
+        self.save(update_fields=["status", "started_at", "deadline_at"])
 
         api_url = getattr(settings, "ML_API_URL", None)
 
         if not api_url:
-            self.status = TaskStatus.FAILED
-            self.error_message = "ML_API_URL не настроен в settings"
-            self.finished_at = timezone.now()
-            self.save(update_fields=["status", "error_message", "finished_at"])
+            self.fail("ML_API_URL не настроен в settings")
             return
 
-        video_filename = f"/{self.video.file.name}" if self.video.file else ""
+        # ML читает proxy, если она собрана; вырезки делаются из оригинала.
+        ml_file = self.video.proxy_file if proxy_enabled() and self.video.proxy_file else self.video.file
+        video_filename = f"/{ml_file.name}" if self.video.file else ""
         if not video_filename:
-            self.status = TaskStatus.FAILED
-            self.error_message = "У видео нет загруженного файла"
-            self.finished_at = timezone.now()
-            self.save(update_fields=["status", "error_message", "finished_at"])
+            self.fail("У видео нет загруженного файла")
             return
 
         adapter = MLAdapter(api_url=api_url)
@@ -105,20 +234,28 @@ class ConfigTask(models.Model):
                 'video_filename': video_filename,
                 'task_id': str(self.pk),
             }
+            if self.is_window:
+                # Статус видео ведёт родительское задание.
+                args['window_start'] = self.window_start
+                args['window_end'] = self.window_end
+            candidates = candidates_for(self)
+            if candidates:
+                args['candidates'] = candidates
             if self.is_custom:
                 args['prompt'] = self.promt
-            else:
+            elif not self.is_window:
                 self.video.status = "processing"
             response = adapter.send_request(**args)
             self.result = response
         except Exception as exc:
             self.error_message = str(exc)
             self.status = TaskStatus.FAILED
-            if not self.is_custom:
+            if not self.is_custom and not self.is_window:
                 self.video.status = "not_processed"
         finally:
             self.finished_at = timezone.now()
-            self.video.save()
+            if not self.is_window:
+                self.video.save()
             self.save(
                 update_fields=[
                     "status",
@@ -127,3 +264,182 @@ class ConfigTask(models.Model):
                     "error_message",
                 ]
             )
+        if self.status == TaskStatus.FAILED:
+            self.on_finished()
+
+
+class ProcessingRate(models.Model):
+    """Наблюдаемая скорость ML: секунд видео, обрабатываемых за секунду."""
+
+    kind = models.CharField(
+        max_length=16,
+        choices=RateKind.choices,
+        unique=True,
+        help_text="Тип заданий",
+    )
+    rate = models.FloatField(
+        help_text="Скользящее среднее: секунд видео на секунду обработки",
+    )
+    samples = models.PositiveIntegerField(
+        default=0,
+        help_text="Количество заданий, по которым обучена оценка",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Скорость обработки ML"
+        verbose_name_plural = "Скорости обработки ML"
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()}: {self.rate:.2f}x"
+
+
+class AnalysisStage(models.TextChoices):
+    SCENE = "scene", "Смена сцены"
+    AUDIO = "audio", "Пики звука"
+
+
+class VideoAnalysis(models.Model):
+    """Результат локального анализа видео: параметры и статистика этапа."""
+
+    video = models.ForeignKey(
+        Video,
+        on_delete=models.CASCADE,
+        related_name="analyses",
+        help_text="Видео",
+    )
+    stage = models.CharField(
+        max_length=16,
+        choices=AnalysisStage.choices,
+        help_text="Этап анализа",
+    )
+    params_key = models.CharField(
+        max_length=64,
+        help_text="Ключ параметров этапа: при их изменении анализ повторяется",
+    )
+    stats = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Статистика: кадров, секунд, скорость обработки",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Анализ видео"
+        verbose_name_plural = "Анализы видео"
+        constraints = [
+            models.UniqueConstraint(fields=["video", "stage"], name="video_analysis_stage_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_stage_display()} для {self.video}"
+
+
+class CandidateSegment(models.Model):
+    """Участок видео, который стоит показать ML, с оценкой интересности."""
+
+    video = models.ForeignKey(
+        Video,
+        on_delete=models.CASCADE,
+        related_name="candidates",
+        help_text="Видео",
+    )
+    source = models.CharField(
+        max_length=16,
+        choices=AnalysisStage.choices,
+        help_text="Этап анализа, нашедший участок",
+    )
+    start_time = models.PositiveIntegerField(help_text="Начало участка в секундах")
+    end_time = models.PositiveIntegerField(help_text="Конец участка в секундах")
+    score = models.FloatField(help_text="Оценка интересности участка")
+
+    class Meta:
+        ordering = ["video", "start_time"]
+        verbose_name = "Кандидат в хайлайты"
+        verbose_name_plural = "Кандидаты в хайлайты"
+        indexes = [
+            models.Index(fields=["video", "source", "start_time"], name="candidate_video_source_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.video} [{self.start_time}-{self.end_time}] {self.score:.2f}"
+
+
+class DurationBucket(models.TextChoices):
+    SHORT = "short", "До 5 минут"
+    MEDIUM = "medium", "5–20 минут"
+    LONG = "long", "20–60 минут"
+    VERY_LONG = "very_long", "Больше часа"
+    UNKNOWN = "unknown", "Длительность неизвестна"
+
+
+class TaskRollup(models.Model):
+    """Сводка завершённых заданий ML за час: гистограммы ожидания и работы, ошибки.
+
+    Гистограммы складываются, поэтому процентили за любой период считаются по
+    сводкам без чтения истории заданий (logistic.service.analytics).
+    """
+
+    hour = models.DateTimeField(help_text="Начало часа, в котором задания завершились")
+    kind = models.CharField(
+        max_length=16,
+        choices=RateKind.choices,
+        help_text="Тип заданий",
+    )
+    duration_bucket = models.CharField(
+        max_length=16,
+        choices=DurationBucket.choices,
+        help_text="Длительность видео",
+    )
+    finished = models.PositiveIntegerField(default=0, help_text="Завершено заданий")
+    failed = models.PositiveIntegerField(default=0, help_text="Из них с ошибкой")
+    errors = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Число ошибок по классам",
+    )
+    wait_histogram = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Ожидание в очереди: {номер корзины: число заданий}",
+    )
+    run_histogram = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Время обработки: {номер корзины: число заданий}",
+    )
+    wait_sum = models.FloatField(default=0, help_text="Суммарное ожидание, с")
+    run_sum = models.FloatField(default=0, help_text="Суммарное время обработки, с")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-hour", "kind", "duration_bucket"]
+        verbose_name = "Сводка заданий за час"
+        verbose_name_plural = "Сводки заданий по часам"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hour", "kind", "duration_bucket"],
+                name="task_rollup_hour_kind_bucket_unique",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.hour:%Y-%m-%d %H:00} {self.get_kind_display()}, {self.get_duration_bucket_display()}"
+
+
+class RollupCursor(models.Model):
+    """Докуда история заданий уже учтена в сводках."""
+
+    name = models.CharField(max_length=32, unique=True)
+    position = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Задания, завершённые не позже этого момента, уже в сводках",
+    )
+
+    class Meta:
+        verbose_name = "Позиция сводок"
+        verbose_name_plural = "Позиции сводок"
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.position}"
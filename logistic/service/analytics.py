@@ -0,0 +1,284 @@
+"""Аналитика жизненного цикла заданий ML: инкрементальные часовые сводки.
+
+update_rollups читает только задания, завершённые после прошлого запуска, и
+добавляет их в TaskRollup: число завершённых и упавших, ошибки по классам и
+гистограммы ожидания (created_at → started_at) и обработки (started_at →
+finished_at) в логарифмических корзинах. Гистограммы складываются, поэтому
+процентили за любой период и срез считаются по сводкам (summarize) без
+чтения истории заданий. Относительная ошибка процентиля — около 6%.
+"""
+import logging
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from logistic.models import ConfigTask, DurationBucket, RateKind, RollupCursor, TaskRollup, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "tasks"
+PERCENTILES = (50, 90, 99)
+# Корзины от 0,1 с до недели; корзина 0 — меньше 0,1 с, последняя — больше недели.
+EDGES = np.geomspace(0.1, 7 * 24 * 3600, 128)
+DURATION_BOUNDS = (
+    (5 * 60, DurationBucket.SHORT),
+    (20 * 60, DurationBucket.MEDIUM),
+    (60 * 60, DurationBucket.LONG),
+)
+# Класс ошибки по тексту error_message; проверяются по порядку.
+ERROR_CLASSES = (
+    ("deadline", re.compile(r"^Reaper:")),
+    ("timeout", re.compile(r"^Timeout:|timed out", re.IGNORECASE)),
+    ("dropped", re.compile(r"^Отброшено:")),
+    ("windows", re.compile(r"^Окон с ошибкой")),
+    ("config", re.compile(r"ML_API_URL")),
+    ("no_file", re.compile(r"^У видео нет")),
+    ("http_4xx", re.compile(r"^4\d\d Client Error")),
+    ("http_5xx", re.compile(r"^5\d\d Server Error")),
+    ("connection", re.compile(r"Connection|Max retries exceeded|Name or service not known")),
+)
+
+
+def duration_bucket(duration) -> str:
+    if not duration:
+        return DurationBucket.UNKNOWN
+    for bound, bucket in DURATION_BOUNDS:
+        if duration < bound:
+            return bucket
+    return DurationBucket.VERY_LONG
+
+
+def error_class(message: str) -> str:
+    if not message:
+        # ML сообщил о неудаче без текста ошибки.
+        return "ml_reported"
+    for name, pattern in ERROR_CLASSES:
+        if pattern.search(message):
+            return name
+    return "other"
+
+
+def histogram(values) -> dict:
+    """{номер корзины: число значений} для непустых корзин."""
+    if not values:
+        return {}
+    counts = np.bincount(np.searchsorted(EDGES, values, side="right"), minlength=len(EDGES) + 1)
+    return {str(i): int(n) for i, n in enumerate(counts) if n}
+
+
+def merge_histograms(*histograms) -> dict:
+    merged = Counter()
+    for h in histograms:
+        merged.update(h)
+    return dict(merged)
+
+
+def percentile(hist: dict, q: float) -> float | None:
+    """Процентиль по гистограмме: геометрическая интерполяция внутри корзины."""
+    total = sum(hist.values())
+    if not total:
+        return None
+    rank = q / 100 * total
+    seen = 0
+    for index in sorted(hist, key=int):
+        count = hist[index]
+        if seen + count >= rank:
+            i = int(index)
+            if i == 0:
+                return float(EDGES[0])
+            if i >= len(EDGES):
+                return float(EDGES[-1])
+            low, high = EDGES[i - 1], EDGES[i]
+            fraction = (rank - seen) / count
+            return float(low * (high / low) ** fraction)
+        seen += count
+    return float(EDGES[-1])
+
+
+@dataclass
+class Accumulator:
+    finished: int = 0
+    failed: int = 0
+    errors: Counter = field(default_factory=Counter)
+    waits: list = field(default_factory=list)
+    runs: list = field(default_factory=list)
+
+    def add(self, task: dict) -> None:
+        self.finished += 1
+        if task["status"] == TaskStatus.FAILED:
+            self.failed += 1
+            self.errors[error_class(task["error_message"])] += 1
+        if task["started_at"]:
+            self.waits.append((task["started_at"] - task["created_at"]).total_seconds())
+            self.runs.append((task["finished_at"] - task["started_at"]).total_seconds())
+        else:
+            # Отброшено до запуска: всё время — ожидание.
+            self.waits.append((task["finished_at"] - task["created_at"]).total_seconds())
+
+    def apply(self, rollup: TaskRollup) -> None:
+        rollup.finished += self.finished
+        rollup.failed += self.failed
+        rollup.errors = merge_histograms(rollup.errors, self.errors)
+        rollup.wait_histogram = merge_histograms(rollup.wait_histogram, histogram(self.waits))
+        rollup.run_histogram = merge_histograms(rollup.run_histogram, histogram(self.runs))
+        rollup.wait_sum += max(sum(self.waits), 0)
+        rollup.run_sum += max(sum(self.runs), 0)
+
+
+def finished_tasks(after, until):
+    """Завершённые задания верхнего уровня за (after, until] по индексу finished_at."""
+    tasks = ConfigTask.objects.filter(
+        parent__isnull=True,
+        status__in=(TaskStatus.SUCCESS, TaskStatus.FAILED),
+        finished_at__lte=until,
+    )
+    if after is not None:
+        tasks = tasks.filter(finished_at__gt=after)
+    return tasks
+
+
+def rollup_window(after, until) -> int:
+    """Добавляет в сводки задания, завершённые за (after, until]."""
+    groups = defaultdict(Accumulator)
+    rows = finished_tasks(after, until).values(
+        "status", "promt", "error_message", "created_at", "started_at", "finished_at", "video__duration",
+    )
+    for row in rows.iterator(chunk_size=2000):
+        key = (
+            row["finished_at"].replace(minute=0, second=0, microsecond=0),
+            RateKind.CUSTOM if row["promt"] else RateKind.DEFAULT,
+            duration_bucket(row["video__duration"]),
+        )
+        groups[key].add(row)
+    if not groups:
+        return 0
+
+    existing = {
+        (r.hour, r.kind, r.duration_bucket): r
+        for r in TaskRollup.objects.filter(hour__in={key[0] for key in groups})
+    }
+    created = []
+    for key, acc in groups.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = TaskRollup(hour=key[0], kind=key[1], duration_bucket=key[2])
+            created.append(rollup)
+        acc.apply(rollup)
+    updated = [r for key, r in existing.items() if key in groups]
+    for rollup in updated:
+        # bulk_update не обновляет auto_now.
+        rollup.updated_at = timezone.now()
+    if updated:
+        TaskRollup.objects.bulk_update(
+            updated,
+            ["finished", "failed", "errors", "wait_histogram", "run_histogram", "wait_sum", "run_sum", "updated_at"],
+        )
+    TaskRollup.objects.bulk_create(created)
+    return sum(acc.finished for acc in groups.values())
+
+
+def update_rollups(now=None) -> int:
+    """Учитывает в сводках задания, завершённые с прошлого запуска. Возвращает их число.
+
+    История читается окнами по TASK_ROLLUP_WINDOW_HOURS, каждое — в своей
+    транзакции вместе со сдвигом позиции. Последние TASK_ROLLUP_LAG_SECONDS не
+    учитываются: задания, завершённые в этот момент, могут быть ещё не зафиксированы.
+    """
+    now = now or timezone.now()
+    until = now - timedelta(seconds=getattr(settings, "TASK_ROLLUP_LAG_SECONDS", 60))
+    step = timedelta(hours=getattr(settings, "TASK_ROLLUP_WINDOW_HOURS", 24))
+    cursor, _ = RollupCursor.objects.get_or_create(name=CURSOR_NAME)
+    position = cursor.position
+    if position is None:
+        first = finished_tasks(None, until).order_by("finished_at").values_list("finished_at", flat=True).first()
+        if first is None:
+            return 0
+        position = first - timedelta(microseconds=1)
+
+    total = 0
+    while position < until:
+        window_end = min(position + step, until)
+        with transaction.atomic():
+            # Позиция сдвигается только вместе с записью сводок и только одним процессом.
+            moved = RollupCursor.objects.filter(
+                pk=cursor.pk,
+                position=cursor.position,
+            ).update(position=window_end)
+            if not moved:
+                logger.info("Сводки заданий обновляет другой процесс")
+                return total
+            total += rollup_window(position, window_end)
+        cursor.position = position = window_end
+    if total:
+        logger.info("В сводки добавлено заданий: %s", total)
+    return total
+
+
+def rebuild_rollups() -> int:
+    """Пересчитывает сводки по всей истории заданий."""
+    with transaction.atomic():
+        TaskRollup.objects.all().delete()
+        RollupCursor.objects.filter(name=CURSOR_NAME).delete()
+    return update_rollups()
+
+
+def _timing(hist: dict, total: float) -> dict:
+    count = sum(hist.values())
+    stats = {f"p{q}": percentile(hist, q) for q in PERCENTILES}
+    stats["mean"] = total / count if count else None
+    stats["count"] = count
+    return stats
+
+
+def rollup_stats(rollups) -> dict:
+    """Процентили, доля ошибок и ошибки по классам для набора сводок."""
+    rollups = list(rollups)
+    finished = sum(r.finished for r in rollups)
+    failed = sum(r.failed for r in rollups)
+    errors = merge_histograms(*(r.errors for r in rollups))
+    return {
+        "finished": finished,
+        "failed": failed,
+        "failure_rate": failed / finished if finished else None,
+        "errors": {
+            name: {"count": count, "rate": count / finished}
+            for name, count in sorted(errors.items(), key=lambda item: -item[1])
+        },
+        "wait": _timing(merge_histograms(*(r.wait_histogram for r in rollups)), sum(r.wait_sum for r in rollups)),
+        "run": _timing(merge_histograms(*(r.run_histogram for r in rollups)), sum(r.run_sum for r in rollups)),
+    }
+
+
+def summarize(since, kind: str | None = None, bucket: str | None = None) -> dict:
+    """Статистика за период по сводкам: итог, срезы по типу и длительности, поток по часам."""
+    rollups = TaskRollup.objects.filter(hour__gte=since.replace(minute=0, second=0, microsecond=0))
+    if kind:
+        rollups = rollups.filter(kind=kind)
+    if bucket:
+        rollups = rollups.filter(duration_bucket=bucket)
+    rollups = list(rollups.order_by("hour"))
+
+    groups = defaultdict(list)
+    hours = defaultdict(lambda: {"finished": 0, "failed": 0})
+    for r in rollups:
+        groups[(r.kind, r.duration_bucket)].append(r)
+        hours[r.hour]["finished"] += r.finished
+        hours[r.hour]["failed"] += r.failed
+
+    position = RollupCursor.objects.filter(name=CURSOR_NAME).values_list("position", flat=True).first()
+    return {
+        "since": since,
+        "up_to": position,
+        "total": rollup_stats(rollups),
+        "groups": [
+            {"kind": group_kind, "duration_bucket": group_bucket, **rollup_stats(items)}
+            for (group_kind, group_bucket), items in sorted(groups.items())
+        ],
+        "throughput": [{"hour": hour, **counts} for hour, counts in sorted(hours.items())],
+    }
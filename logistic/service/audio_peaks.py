@@ -0,0 +1,175 @@
+"""Локальный отбор кандидатов по пикам громкости звука.
+
+Шум трибун и возбуждённый комментатор — сильный признак хайлайта, а считать
+его намного дешевле, чем модели по картинке. ffmpeg отдаёт моно PCM с низкой
+частотой дискретизации, звук читается кусками, поэтому память не зависит от
+длины файла. Для каждого кадра звука считаются RMS и спектральный поток
+(spectral flux); пики огибающей дают окна-кандидаты.
+"""
+import logging
+import time
+from typing import Iterator, List, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from logistic.models import AnalysisStage
+from logistic.service import candidates, ffmpeg
+from main.models import Highlight, Video
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EVENT_TYPE = "audio_peak"
+CHUNK_FRAMES = 1024
+SAMPLE_BYTES = 2  # s16le
+
+
+def _params():
+    return {
+        "sample_rate": getattr(settings, "AUDIO_SAMPLE_RATE", 8000),
+        "frame_seconds": getattr(settings, "AUDIO_FRAME_SECONDS", 0.25),
+        "threshold_mad": getattr(settings, "AUDIO_THRESHOLD_MAD", 4.0),
+        "min_score": getattr(settings, "AUDIO_MIN_SCORE", 1.0),
+        "pad": getattr(settings, "AUDIO_PAD_SECONDS", 5),
+        "gap": getattr(settings, "AUDIO_MERGE_GAP_SECONDS", 5),
+    }
+
+
+def params_key() -> str:
+    return "{sample_rate}:{frame_seconds}:{threshold_mad}:{min_score}:{pad}:{gap}".format(**_params())
+
+
+def has_audio(source: str) -> bool:
+    streams = ffmpeg.probe(source).get("streams", [])
+    return any(stream.get("codec_type") == "audio" for stream in streams)
+
+
+def iter_audio_frames(source: str, sample_rate: int, frame_size: int) -> Iterator[np.ndarray]:
+    """Кадры звука пачками формы (n, frame_size), float32 в диапазоне [-1, 1]."""
+    frame_bytes = frame_size * SAMPLE_BYTES
+    args = [
+        "-i", source,
+        "-vn",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-f", "s16le",
+        "pipe:1",
+    ]
+    tail = b""
+    for chunk in ffmpeg.stream(args, frame_bytes * CHUNK_FRAMES):
+        data = tail + chunk
+        n = len(data) // frame_bytes
+        tail = data[n * frame_bytes:]
+        if n:
+            samples = np.frombuffer(data[:n * frame_bytes], dtype="<i2").reshape(n, frame_size)
+            yield samples.astype(np.float32) / 32768.0
+
+
+def frame_envelopes(
+    frames: np.ndarray,
+    previous_spectrum: np.ndarray | None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """RMS и спектральный поток для пачки кадров.
+
+    Возвращает (rms, flux, спектр последнего кадра): спектр передаётся в
+    следующую пачку, чтобы поток на границе пачек считался без разрыва.
+    """
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), axis=1))
+    # Сжатие динамики: громкие частоты не подавляют остальные.
+    spectrum = np.log1p(spectrum)
+    if previous_spectrum is None:
+        previous_spectrum = spectrum[:1]
+    stack = np.concatenate([previous_spectrum[-1:], spectrum])
+    # Учитывается только рост энергии: начало шума, а не его затухание.
+    flux = np.maximum(np.diff(stack, axis=0), 0).sum(axis=1)
+    return rms, flux, spectrum[-1:]
+
+
+def robust_z(values: np.ndarray) -> np.ndarray:
+    """Отклонение от медианы в единицах MAD."""
+    median = np.median(values)
+    mad = np.median(np.abs(values - median)) * 1.4826
+    return (values - median) / mad if mad > 0 else np.zeros_like(values)
+
+
+def peak_scores(rms: np.ndarray, flux: np.ndarray, frames_per_second: float) -> np.ndarray:
+    """Общая оценка пика: среднее нормированных огибающих, сглаженное на секунду."""
+    scores = 0.5 * robust_z(rms) + 0.5 * robust_z(flux)
+    width = max(int(round(frames_per_second)), 1)
+    if len(scores) >= width:
+        scores = np.convolve(scores, np.ones(width) / width, mode="same")
+    return scores
+
+
+def analyse(source: str) -> Tuple[List[Tuple[int, int, float]], dict]:
+    """Читает звук источника и возвращает окна-кандидаты и статистику."""
+    p = _params()
+    frame_size = max(int(p["sample_rate"] * p["frame_seconds"]), 1)
+    frames_per_second = p["sample_rate"] / frame_size
+    started = time.perf_counter()
+
+    rms_parts, flux_parts = [], []
+    previous_spectrum = None
+    if has_audio(source):
+        for frames in iter_audio_frames(source, p["sample_rate"], frame_size):
+            rms, flux, previous_spectrum = frame_envelopes(frames, previous_spectrum)
+            rms_parts.append(rms)
+            flux_parts.append(flux)
+    rms = np.concatenate(rms_parts) if rms_parts else np.empty(0)
+    flux = np.concatenate(flux_parts) if flux_parts else np.empty(0)
+
+    scores = peak_scores(rms, flux, frames_per_second) if len(rms) else rms
+    windows = candidates.candidate_windows(
+        scores, frames_per_second, p["threshold_mad"], p["min_score"], p["pad"], p["gap"],
+    )
+    elapsed = time.perf_counter() - started
+    stats = {
+        "frames": int(len(scores)),
+        "seconds": round(len(scores) / frames_per_second, 1),
+        "elapsed": round(elapsed, 3),
+        "frames_per_second": round(len(scores) / elapsed, 1) if elapsed else None,
+        "candidates": len(windows),
+    }
+    return windows, stats
+
+
+def save_highlights(video: Video, windows: List[Tuple[int, int, float]]) -> None:
+    """Записывает пики хайлайтами с низкой уверенностью и event_type audio_peak."""
+    max_confidence = getattr(settings, "AUDIO_HIGHLIGHT_MAX_CONFIDENCE", 0.3)
+    top = max((score for _, _, score in windows), default=0) or 1
+    with transaction.atomic():
+        Highlight.objects.filter(video=video, event_type=AUDIO_EVENT_TYPE).delete()
+        Highlight.objects.bulk_create([
+            Highlight(
+                video=video,
+                event_type=AUDIO_EVENT_TYPE,
+                start_time=start,
+                end_time=end,
+                confidence=round(max_confidence * score / top, 3),
+                description="Пик громкости звука",
+            )
+            for start, end, score in windows
+        ])
+
+
+def is_current(video: Video) -> bool:
+    return candidates.is_current(video, AnalysisStage.AUDIO, params_key())
+
+
+def detect_audio_peaks(video_id: int, force: bool = False) -> dict | None:
+    """Находит и сохраняет кандидатов по пикам звука. Возвращает статистику."""
+    video = Video.objects.get(pk=video_id)
+    if not video.file:
+        return None
+    if not force and is_current(video):
+        return None
+
+    # В proxy звука нет, поэтому читается оригинал.
+    windows, stats = analyse(ffmpeg.source_for(video.file))
+    candidates.save_candidates(video, AnalysisStage.AUDIO, params_key(), windows, stats)
+    if getattr(settings, "AUDIO_PEAKS_AS_HIGHLIGHTS", False):
+        save_highlights(video, windows)
+    logger.info("Пики звука для видео #%s: %s", video_id, stats)
+    return stats
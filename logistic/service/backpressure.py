@@ -0,0 +1,79 @@
+"""Backpressure очереди ML: глубина очереди, запросы в работе и сброс нагрузки."""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
+
+from logistic.models import ConfigTask, TaskStatus
+
+
+@dataclass(frozen=True)
+class QueueState:
+    pending: int
+    in_flight: int
+    queue_high_watermark: int
+    in_flight_high_watermark: int
+
+    @property
+    def queue_saturated(self) -> bool:
+        return self.pending >= self.queue_high_watermark
+
+    @property
+    def in_flight_saturated(self) -> bool:
+        return self.in_flight >= self.in_flight_high_watermark
+
+    def as_dict(self) -> dict:
+        return {
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "queue_high_watermark": self.queue_high_watermark,
+            "in_flight_high_watermark": self.in_flight_high_watermark,
+            "queue_saturated": self.queue_saturated,
+            "in_flight_saturated": self.in_flight_saturated,
+        }
+
+
+def get_queue_state() -> QueueState:
+    """Глубина очереди и число запросов в ML одним запросом по индексу статуса."""
+    counts = ConfigTask.objects.filter(
+        status__in=(TaskStatus.PENDING, TaskStatus.RUNNING),
+    ).aggregate(
+        # Окна разбитого видео — часть уже принятого задания, не новые заявки.
+        pending=Count("id", filter=Q(status=TaskStatus.PENDING, parent__isnull=True)),
+        # Родитель окон сам не обращается к ML.
+        in_flight=Count("id", filter=Q(status=TaskStatus.RUNNING, is_split=False)),
+    )
+    return QueueState(
+        pending=counts["pending"],
+        in_flight=counts["in_flight"],
+        queue_high_watermark=getattr(settings, "ML_QUEUE_HIGH_WATERMARK", 50),
+        in_flight_high_watermark=getattr(settings, "ML_INFLIGHT_HIGH_WATERMARK", 4),
+    )
+
+
+def ensure_ml_capacity() -> None:
+    """Отвечает 429 с Retry-After, если очередь ML выше порога."""
+    state = get_queue_state()
+    if state.queue_saturated:
+        raise Throttled(
+            wait=getattr(settings, "ML_RETRY_AFTER_SECONDS", 30),
+            detail="Очередь ML переполнена, повторите запрос позже.",
+        )
+
+
+def deadline_exceeded(task: ConfigTask, now=None, queued_at: str | None = None) -> bool:
+    """Задание ждало в очереди дольше ML_TASK_MAX_QUEUE_WAIT и уже неактуально.
+
+    Ожидание считается с queued_at (ISO, конец подготовки видео), а без него —
+    с создания задания: время транскодирования proxy в него не входит.
+    """
+    max_wait = getattr(settings, "ML_TASK_MAX_QUEUE_WAIT", None)
+    # Окна уже принятого задания не отбрасываем: родитель прошёл эту проверку.
+    if not max_wait or task.is_window:
+        return False
+    now = now or timezone.now()
+    since = datetime.fromisoformat(queued_at) if queued_at else task.created_at
+    return since + timedelta(seconds=max_wait) < now
@@ -0,0 +1,65 @@
+"""Общие шаги локальных этапов анализа: окна-кандидаты и их сохранение."""
+from typing import List, Tuple
+
+import numpy as np
+from django.db import transaction
+
+from logistic.models import CandidateSegment, VideoAnalysis
+from logistic.service.highlight_merge import merge_intervals
+from main.models import Video
+
+
+def candidate_windows(
+    scores: np.ndarray,
+    rate: float,
+    threshold_mad: float,
+    min_score: float,
+    pad: int,
+    gap: int,
+) -> List[Tuple[int, int, float]]:
+    """Окна (start, end, score) вокруг отсчётов с аномально высокой оценкой.
+
+    rate — отсчётов оценки в секунду видео.
+    """
+    if len(scores) == 0:
+        return []
+    median = np.median(scores)
+    mad = np.median(np.abs(scores - median)) * 1.4826
+    threshold = max(median + threshold_mad * mad, min_score)
+    hits = np.flatnonzero(scores >= threshold)
+    if len(hits) == 0:
+        return []
+
+    times = hits / rate
+    starts = np.maximum(np.floor(times - pad), 0).astype(np.int64)
+    ends = np.ceil(times + pad).astype(np.int64)
+    clusters = merge_intervals(np.zeros(len(hits), dtype=np.int64), starts, ends, gap)
+    return [
+        (int(starts[c].min()), int(ends[c].max()), float(scores[hits[c]].max()))
+        for c in clusters
+    ]
+
+
+def is_current(video: Video, stage: str, params_key: str) -> bool:
+    return VideoAnalysis.objects.filter(video=video, stage=stage, params_key=params_key).exists()
+
+
+def save_candidates(
+    video: Video,
+    stage: str,
+    params_key: str,
+    windows: List[Tuple[int, int, float]],
+    stats: dict,
+) -> None:
+    """Заменяет кандидатов этапа для видео и запоминает параметры анализа."""
+    with transaction.atomic():
+        CandidateSegment.objects.filter(video=video, source=stage).delete()
+        CandidateSegment.objects.bulk_create([
+            CandidateSegment(video=video, source=stage, start_time=start, end_time=end, score=score)
+            for start, end, score in windows
+        ])
+        VideoAnalysis.objects.update_or_create(
+            video=video,
+            stage=stage,
+            defaults={"params_key": params_key, "stats": stats},
+        )
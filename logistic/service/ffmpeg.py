@@ -0,0 +1,102 @@
+"""Запуск ffmpeg/ffprobe и доступ к файлам хранилища для обработки видео."""
+import json
+import logging
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MediaError(Exception):
+    """Ошибка ffmpeg/ffprobe при обработке видео."""
+
+
+def ffmpeg_binary() -> str:
+    return getattr(settings, "FFMPEG_BINARY", "ffmpeg")
+
+
+def ffprobe_binary() -> str:
+    return getattr(settings, "FFPROBE_BINARY", "ffprobe")
+
+
+def run(args: List[str], timeout: int | None = None, binary: str | None = None) -> bytes:
+    """Запускает ffmpeg (или binary) и возвращает stdout; при ошибке — MediaError."""
+    cmd = [binary or ffmpeg_binary(), "-hide_banner", "-loglevel", "error", *args]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout, check=False)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise MediaError(f"Не удалось выполнить {cmd[0]}: {e}") from e
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", "replace").strip()[-2000:]
+        raise MediaError(f"{cmd[0]} завершился с кодом {result.returncode}: {stderr}")
+    return result.stdout
+
+
+def stream(args: List[str], chunk_size: int) -> Iterator[bytes]:
+    """Запускает ffmpeg с выводом в pipe:1 и отдаёт stdout кусками по chunk_size байт.
+
+    Память не зависит от длины видео: в каждый момент читается один кусок.
+    """
+    cmd = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-nostdin", *args]
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise MediaError(f"Не удалось выполнить {cmd[0]}: {e}") from e
+    try:
+        while True:
+            chunk = proc.stdout.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode("utf-8", "replace").strip()[-2000:]
+        proc.stderr.close()
+        if proc.poll() is None:
+            proc.kill()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise MediaError(f"{cmd[0]} завершился с кодом {returncode}: {stderr}")
+
+
+def probe(source: str) -> dict:
+    """Формат и потоки файла (ffprobe -show_format -show_streams)."""
+    output = run(
+        ["-of", "json", "-show_format", "-show_streams", source],
+        binary=ffprobe_binary(),
+    )
+    return json.loads(output)
+
+
+def source_for(field_file) -> str:
+    """Путь или URL, по которому ffmpeg прочитает файл из хранилища.
+
+    Для S3 ffmpeg читает по HTTP и при перемотке запрашивает только нужные
+    диапазоны байт, поэтому файл целиком не скачивается.
+    """
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return field_file.storage.url(field_file.name)
+
+
+@contextmanager
+def temp_dir():
+    path = tempfile.mkdtemp(prefix="media_")
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def save_to_storage(storage, name: str, local_path: str) -> str:
+    """Загружает локальный файл в хранилище под name, заменяя прежний."""
+    if storage.exists(name):
+        storage.delete(name)
+    with open(local_path, "rb") as f:
+        return storage.save(name, f)
@@ -0,0 +1,91 @@
+"""Слияние пересекающихся и соседних отрезков хайлайтов одного типа.
+
+Все отрезки обрабатываются одним проходом NumPy: сортировка по (группа, начало),
+накопленный максимум концов и разбиение на кластеры там, где следующий отрезок
+начинается дальше, чем через gap секунд после конца предыдущих.
+"""
+from typing import Any, Dict, Hashable, List, Sequence
+
+import numpy as np
+
+
+def merge_intervals(
+    groups: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    gap: int = 0,
+) -> List[np.ndarray]:
+    """Возвращает индексы исходных отрезков, сгруппированные по кластерам слияния.
+
+    groups — целочисленный номер группы для каждого отрезка; отрезки разных
+    групп никогда не сливаются.
+    """
+    if len(starts) == 0:
+        return []
+    groups = np.asarray(groups, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.maximum(np.asarray(ends, dtype=np.int64), starts)
+
+    order = np.lexsort((starts, groups))
+    # Сдвигаем каждую группу по оси времени дальше предыдущей, чтобы один
+    # накопленный максимум работал независимо внутри каждой группы.
+    offset = groups[order] * (int(ends.max()) + gap + 1)
+    shifted_starts = starts[order] + offset
+    running_end = np.maximum.accumulate(ends[order] + offset)
+
+    new_cluster = np.empty(len(order), dtype=bool)
+    new_cluster[0] = True
+    new_cluster[1:] = shifted_starts[1:] > running_end[:-1] + gap
+    return np.split(order, np.flatnonzero(new_cluster)[1:])
+
+
+def merge_items(
+    items: Sequence[Dict[str, Any]],
+    key_fields: Sequence[str],
+    gap: int = 0,
+) -> List[Dict[str, Any]]:
+    """Сливает словари с полями start_time, end_time, confidence, description.
+
+    Отрезки сливаются только внутри одинаковых значений key_fields. Результат
+    сохраняет ключевые поля, берёт максимальную уверенность, объединяет
+    описания и перечисляет исходные позиции в members.
+    """
+    if not items:
+        return []
+    group_ids: Dict[Hashable, int] = {}
+    groups = np.fromiter(
+        (group_ids.setdefault(tuple(item[f] for f in key_fields), len(group_ids)) for item in items),
+        dtype=np.int64,
+        count=len(items),
+    )
+    starts = np.fromiter((item["start_time"] for item in items), dtype=np.int64, count=len(items))
+    ends = np.fromiter((item["end_time"] for item in items), dtype=np.int64, count=len(items))
+    confidences = np.fromiter((item["confidence"] for item in items), dtype=np.float64, count=len(items))
+
+    clusters = merge_intervals(groups, starts, ends, gap)
+    if not clusters:
+        return []
+    heads = np.fromiter((c[0] for c in clusters), dtype=np.int64, count=len(clusters))
+    bounds = np.cumsum([0] + [len(c) for c in clusters[:-1]])
+    flat = np.concatenate(clusters)
+    merged_starts = np.minimum.reduceat(starts[flat], bounds)
+    merged_ends = np.maximum.reduceat(ends[flat], bounds)
+    merged_confidences = np.maximum.reduceat(confidences[flat], bounds)
+
+    merged = []
+    for i, members in enumerate(clusters):
+        head = items[heads[i]]
+        descriptions = []
+        for m in members:
+            description = (items[m].get("description") or "").strip()
+            if description and description not in descriptions:
+                descriptions.append(description)
+        merged.append({
+            **{f: head[f] for f in key_fields},
+            "start_time": int(merged_starts[i]),
+            "end_time": int(merged_ends[i]),
+            "confidence": float(merged_confidences[i]),
+            "description": "; ".join(descriptions),
+            "members": members.tolist(),
+        })
+    return merged
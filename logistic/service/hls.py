@@ -0,0 +1,122 @@
+"""Упаковка видео и вырезок в HLS для адаптивного воспроизведения.
+
+Плеер загружает короткий плейлист и первый сегмент, поэтому время до первого
+кадра не зависит от размера файла. Если кодеки совместимы с HLS (H.264 и AAC
+или MP3), сегменты нарезаются без перекодирования (-c copy) по ключевым кадрам;
+иначе видео перекодируется с ключевым кадром на границе каждого сегмента.
+Сегменты и плейлист лежат в хранилище в каталоге с детерминированным именем,
+ссылки на сегменты в плейлисте относительные.
+"""
+import hashlib
+import logging
+import os
+from functools import partial
+
+from django.conf import settings
+
+from logistic.service import ffmpeg
+from logistic.service.pool import run_in_processes
+from main.models import HighlightFile, Video
+
+logger = logging.getLogger(__name__)
+
+HLS_PREFIX = "hls/"
+MANIFEST = "index.m3u8"
+COPY_VIDEO_CODECS = ("h264",)
+COPY_AUDIO_CODECS = ("aac", "mp3")
+
+
+def hls_enabled() -> bool:
+    return getattr(settings, "HLS_ENABLED", False)
+
+
+def segment_seconds() -> int:
+    return getattr(settings, "HLS_SEGMENT_SECONDS", 6)
+
+
+def manifest_name(kind: str, obj) -> str:
+    """Плейлист меняется вместе с исходным файлом и длиной сегмента."""
+    digest = hashlib.sha1(obj.file.name.encode("utf-8")).hexdigest()[:12]
+    return f"{HLS_PREFIX}{kind}/{obj.pk}_{digest}_{segment_seconds()}s/{MANIFEST}"
+
+
+def is_current(video: Video) -> bool:
+    return bool(video.hls_manifest) and video.hls_manifest.name == manifest_name("videos", video)
+
+
+def can_stream_copy(source: str) -> bool:
+    streams = ffmpeg.probe(source).get("streams", [])
+    video = [s["codec_name"] for s in streams if s.get("codec_type") == "video"]
+    audio = [s["codec_name"] for s in streams if s.get("codec_type") == "audio"]
+    return (
+        bool(video)
+        and all(codec in COPY_VIDEO_CODECS for codec in video)
+        and all(codec in COPY_AUDIO_CODECS for codec in audio)
+    )
+
+
+def package(source: str, manifest: str, storage) -> str:
+    """Нарезает source в HLS и загружает в хранилище. Возвращает имя плейлиста."""
+    seconds = segment_seconds()
+    if can_stream_copy(source):
+        codec_args = ["-c", "copy"]
+    else:
+        codec_args = [
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-crf", "23",
+            "-force_key_frames", f"expr:gte(t,n_forced*{seconds})",
+            "-c:a", "aac",
+            "-b:a", "128k",
+        ]
+    directory = os.path.dirname(manifest)
+    with ffmpeg.temp_dir() as tmp:
+        ffmpeg.run([
+            "-y",
+            "-i", source,
+            "-map", "0:v:0",
+            "-map", "0:a:0?",
+            *codec_args,
+            "-f", "hls",
+            "-hls_time", str(seconds),
+            "-hls_playlist_type", "vod",
+            "-hls_segment_filename", os.path.join(tmp, "segment_%05d.ts"),
+            os.path.join(tmp, MANIFEST),
+        ], timeout=getattr(settings, "HLS_TIMEOUT", 60 * 60))
+        # Плейлист загружается последним: пока его нет, пакет считается несобранным.
+        for filename in sorted(os.listdir(tmp), key=lambda f: f == MANIFEST):
+            ffmpeg.save_to_storage(storage, f"{directory}/{filename}", os.path.join(tmp, filename))
+    return manifest
+
+
+def package_video(video_id: int, force: bool = False) -> str | None:
+    video = Video.objects.get(pk=video_id)
+    if not video.file:
+        return None
+    if not force and is_current(video):
+        return None
+    name = package(ffmpeg.source_for(video.file), manifest_name("videos", video), video.hls_manifest.storage)
+    Video.objects.filter(pk=video.pk).update(hls_manifest=name)
+    video.hls_manifest.name = name
+    logger.info("HLS для видео #%s: %s", video.pk, name)
+    return name
+
+
+def package_highlight_file(highlight_file_id: int, force: bool = False) -> str | None:
+    highlight_file = HighlightFile.objects.get(pk=highlight_file_id)
+    name = manifest_name("highlights", highlight_file)
+    if not force and highlight_file.hls_manifest.name == name:
+        return None
+    package(ffmpeg.source_for(highlight_file.file), name, highlight_file.hls_manifest.storage)
+    HighlightFile.objects.filter(pk=highlight_file.pk).update(hls_manifest=name)
+    logger.info("HLS для вырезки #%s: %s", highlight_file.pk, name)
+    return name
+
+
+def package_batch(func, ids, workers: int | None = None, force: bool = False):
+    """Упаковывает набор видео или вырезок в пуле процессов. Возвращает {id: результат или исключение}."""
+    return run_in_processes(
+        partial(func, force=force),
+        ids,
+        workers=workers or getattr(settings, "ML_PROXY_WORKERS", None),
+    )
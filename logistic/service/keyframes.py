@@ -0,0 +1,179 @@
+"""Индекс ключевых кадров видео для быстрой перемотки и границ вырезок.
+
+ffprobe читает пакеты видеопотока без декодирования; позиции ключевых кадров
+(время и смещение в файле) сохраняются компактным .npz рядом с видео. По
+индексу любой интервал [start, end] переводится в интервал, выровненный по
+ключевым кадрам, и диапазон байт для HTTP Range. Для MP4 плееру кроме
+диапазона нужен заголовок moov (при faststart он в начале файла).
+"""
+import io
+import logging
+import os
+from dataclasses import asdict, dataclass
+from functools import lru_cache, partial
+
+import numpy as np
+from django.conf import settings
+
+from logistic.service import ffmpeg
+from logistic.service.pool import run_in_processes
+from main.models import Video
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".keyframes.npz"
+# Декодированных индексов в памяти процесса; индекс — десятки КБ.
+INDEX_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class KeyframeRange:
+    start: float
+    end: float
+    byte_start: int | None
+    byte_end: int | None
+    keyframes: int
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class KeyframeIndex:
+    pts: np.ndarray  # float64, секунды
+    pos: np.ndarray  # int64, смещение пакета в файле или -1
+    duration: float
+    size: int
+
+    def range_for(self, start: float, end: float) -> KeyframeRange:
+        """Минимальный интервал из целых GOP, покрывающий [start, end].
+
+        Начинается с ключевого кадра не позже start и заканчивается перед
+        первым ключевым кадром не раньше end (или в конце файла).
+        """
+        first = max(int(np.searchsorted(self.pts, start, side="right")) - 1, 0)
+        last = int(np.searchsorted(self.pts, end, side="left"))
+        if last <= first:
+            last = first + 1
+        time_end = float(self.pts[last]) if last < len(self.pts) else self.duration
+        byte_start = int(self.pos[first]) if self.pos[first] >= 0 else None
+        if last < len(self.pos):
+            byte_end = int(self.pos[last]) - 1 if self.pos[last] >= 0 else None
+        else:
+            byte_end = self.size - 1 if self.size else None
+        return KeyframeRange(
+            start=float(self.pts[first]),
+            end=time_end,
+            byte_start=byte_start,
+            byte_end=byte_end if byte_start is not None else None,
+            keyframes=last - first,
+        )
+
+
+def keyframes_enabled() -> bool:
+    return getattr(settings, "KEYFRAME_INDEX_ENABLED", True)
+
+
+def index_name(video: Video) -> str:
+    """Индекс лежит рядом с файлом видео и меняется вместе с ним."""
+    base = os.path.splitext(video.file.name)[0]
+    return base[:255 - len(INDEX_SUFFIX)] + INDEX_SUFFIX
+
+
+def is_current(video: Video) -> bool:
+    return bool(video.keyframes_file) and video.keyframes_file.name == index_name(video)
+
+
+def scan_keyframes(source: str) -> KeyframeIndex:
+    """Читает пакеты видеопотока и оставляет ключевые кадры."""
+    output = ffmpeg.run(
+        [
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,pos,flags",
+            "-of", "csv=p=0",
+            source,
+        ],
+        timeout=getattr(settings, "KEYFRAME_INDEX_TIMEOUT", 30 * 60),
+        binary=ffmpeg.ffprobe_binary(),
+    )
+    pts, pos = [], []
+    for line in output.decode("utf-8", "replace").splitlines():
+        parts = line.split(",")
+        if len(parts) < 3 or "K" not in parts[2] or parts[0] in ("", "N/A"):
+            continue
+        pts.append(float(parts[0]))
+        pos.append(int(parts[1]) if parts[1].isdigit() else -1)
+    if not pts:
+        raise ffmpeg.MediaError("В видеопотоке нет ключевых кадров")
+
+    order = np.argsort(pts, kind="stable")
+    fmt = ffmpeg.probe(source).get("format", {})
+    return KeyframeIndex(
+        pts=np.asarray(pts, dtype=np.float64)[order],
+        pos=np.asarray(pos, dtype=np.int64)[order],
+        duration=float(fmt.get("duration") or pts[-1]),
+        size=int(fmt.get("size") or 0),
+    )
+
+
+def dump_index(index: KeyframeIndex) -> bytes:
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        pts=index.pts,
+        pos=index.pos,
+        meta=np.array([index.duration, index.size], dtype=np.float64),
+    )
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=INDEX_CACHE_SIZE)
+def _read_index(video_id: int, name: str) -> KeyframeIndex:
+    """Читает и декодирует .npz один раз на процесс: имя меняется вместе с файлом видео."""
+    storage = Video._meta.get_field("keyframes_file").storage
+    with storage.open(name, "rb") as f:
+        data = np.load(io.BytesIO(f.read()))
+        duration, size = data["meta"]
+        pts, pos = data["pts"], data["pos"]
+    # Массивы общие для всех запросов процесса.
+    pts.flags.writeable = False
+    pos.flags.writeable = False
+    return KeyframeIndex(pts=pts, pos=pos, duration=float(duration), size=int(size))
+
+
+def load_index(video: Video) -> KeyframeIndex | None:
+    if not is_current(video):
+        return None
+    return _read_index(video.pk, video.keyframes_file.name)
+
+
+def build_keyframe_index(video_id: int, force: bool = False) -> int | None:
+    """Строит индекс для видео, если его нет. Возвращает число ключевых кадров."""
+    video = Video.objects.get(pk=video_id)
+    if not video.file:
+        return None
+    if not force and is_current(video):
+        return None
+
+    index = scan_keyframes(ffmpeg.source_for(video.file))
+    name = index_name(video)
+    storage = video.keyframes_file.storage
+    with ffmpeg.temp_dir() as tmp:
+        local_path = os.path.join(tmp, "keyframes.npz")
+        with open(local_path, "wb") as f:
+            f.write(dump_index(index))
+        saved = ffmpeg.save_to_storage(storage, name, local_path)
+
+    Video.objects.filter(pk=video.pk).update(keyframes_file=saved)
+    video.keyframes_file.name = saved
+    logger.info("Индекс ключевых кадров для видео #%s: %s кадров", video.pk, len(index.pts))
+    return len(index.pts)
+
+
+def build_keyframe_indexes(video_ids, workers: int | None = None, force: bool = False):
+    """Строит индексы в пуле процессов. Возвращает {id: число кадров, None или исключение}."""
+    return run_in_processes(
+        partial(build_keyframe_index, force=force),
+        video_ids,
+        workers=workers or getattr(settings, "ML_PROXY_WORKERS", None),
+    )
@@ -1,5 +1,8 @@
 import requests
-from typing import Any, Dict
+from typing import Any, Dict, List
+
+from config import tracing
+from config.metrics import ML_ERRORS, ML_LATENCY, timed
 
 
 class MLAdapter:
@@ -17,20 +20,40 @@ class MLAdapter:
         task_id: str,
         video_filename: str,
         prompt: str | None = None,
+        window_start: int | None = None,
+        window_end: int | None = None,
+        candidates: List[List[int]] | None = None,
     ) -> Dict[str, Any]:
         is_custom = False
         payload: Dict[str, Any] = {
             "task_id": task_id,
             "video_filename": video_filename,
         }
+        if window_start is not None:
+            # Окно [window_start, window_end) в секундах; ML возвращает время
+            # хайлайтов относительно начала окна.
+            payload["window_start"] = window_start
+            payload["window_end"] = window_end
+        if candidates:
+            # Участки [start, end] в секундах от начала видео, найденные локальным анализом;
+            # ML может ограничиться ими.
+            payload["candidates"] = candidates
         if prompt:
             payload["prompt"] = prompt.strip()
             is_custom = True
 
-        response = requests.post(
-            self.get_url(is_custom),
-            json=payload,
-            timeout=self.timeout,
-        )
-        response.raise_for_status()
-        return response.json()
\ No newline at end of file
+        endpoint = "parse_video_custom" if is_custom else "parse_video"
+        with tracing.span(f"ml {endpoint}", task_id=task_id), timed(ML_LATENCY, ML_ERRORS, endpoint=endpoint):
+            # ML может вернуть traceparent в обратных вызовах, иначе трасса
+            # продолжается по ConfigTask.traceparent.
+            traceparent = tracing.current_traceparent()
+            if traceparent:
+                payload["traceparent"] = traceparent
+            response = requests.post(
+                self.get_url(is_custom),
+                json=payload,
+                headers={"traceparent": traceparent} if traceparent else None,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            return response.json()
\ No newline at end of file
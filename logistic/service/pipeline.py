@@ -0,0 +1,95 @@
+"""Подготовка видео перед отправкой в ML: proxy и локальный отбор кандидатов.
+
+Этапы выполняются в очереди media до задания ML. Ошибка этапа только
+логируется: ML в этом случае получает видео целиком. Индекс ключевых кадров
+и HLS ML не нужны: они строятся отдельными задачами media при загрузке видео
+(dispatch_media_tasks) и не задерживают обработку.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+
+from logistic.models import CandidateSegment
+from logistic.service import audio_peaks, hls, keyframes, scene_detect
+from logistic.service.highlight_merge import merge_intervals
+from logistic.service.proxy import ensure_proxy, needs_proxy, proxy_enabled
+from main.models import Video
+
+logger = logging.getLogger(__name__)
+
+
+def scene_prefilter_enabled() -> bool:
+    return getattr(settings, "ML_SCENE_PREFILTER_ENABLED", False)
+
+
+def audio_prefilter_enabled() -> bool:
+    return getattr(settings, "ML_AUDIO_PREFILTER_ENABLED", False)
+
+
+# (включён ли этап, актуален ли результат для видео, запуск этапа)
+STAGES = (
+    (scene_prefilter_enabled, scene_detect.is_current, scene_detect.detect_scenes),
+    (audio_prefilter_enabled, audio_peaks.is_current, audio_peaks.detect_audio_peaks),
+)
+
+
+def needs_preparation(video: Video) -> bool:
+    if not video.file:
+        return False
+    if needs_proxy(video):
+        return True
+    return any(enabled() and not is_current(video) for enabled, is_current, _ in STAGES)
+
+
+def dispatch_media_tasks(video: Video) -> None:
+    """Ставит в очередь media задачи для проигрывания видео, не связанные с ML."""
+    from logistic.tasks import build_keyframe_index_task, package_video_task
+
+    if not video.file:
+        return
+    try:
+        if keyframes.keyframes_enabled() and not keyframes.is_current(video):
+            build_keyframe_index_task.delay(video.pk)
+        if hls.hls_enabled() and not hls.is_current(video):
+            package_video_task.delay(video.pk)
+    except Exception as e:
+        logger.warning("Не удалось поставить задачи media для видео #%s: %s", video.pk, e)
+
+
+def prepare_video(video_id: int) -> None:
+    """Выполняет включённые этапы подготовки для видео."""
+    if proxy_enabled():
+        try:
+            ensure_proxy(video_id)
+        except Exception as e:
+            # Без proxy задание ML отправит оригинал, остальные этапы продолжаются.
+            logger.warning("Proxy не собрана для видео #%s: %s", video_id, e)
+    for enabled, _, run in STAGES:
+        if not enabled():
+            continue
+        try:
+            run(video_id)
+        except Exception as e:
+            # Любая ошибка этапа не должна обрывать цепочку до задания ML.
+            logger.warning("Этап %s не выполнен для видео #%s: %s", run.__name__, video_id, e)
+
+
+def candidates_for(task) -> list | None:
+    """Участки-кандидаты для запроса в ML или None, если отправлять всё видео."""
+    if not getattr(settings, "ML_SEND_CANDIDATES", False):
+        return None
+    candidates = CandidateSegment.objects.filter(video_id=task.video_id)
+    if task.is_window:
+        candidates = candidates.filter(
+            start_time__lt=task.window_end,
+            end_time__gt=task.window_start,
+        )
+    rows = list(candidates.values_list("start_time", "end_time"))
+    if not rows:
+        return None
+    # Участки разных этапов могут пересекаться: ML получает их объединение.
+    starts = np.array([start for start, _ in rows], dtype=np.int64)
+    ends = np.array([end for _, end in rows], dtype=np.int64)
+    clusters = merge_intervals(np.zeros(len(rows), dtype=np.int64), starts, ends, 0)
+    return sorted([int(starts[c].min()), int(ends[c].max())] for c in clusters)
@@ -0,0 +1,25 @@
+"""Пул процессов для тяжёлых медиа-этапов (ffmpeg, NumPy) вне Celery."""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.db import connections
+
+
+def _init_worker():
+    django.setup()
+
+
+def run_in_processes(func, items, workers: int | None = None):
+    """Выполняет func(item) в пуле процессов. Возвращает {item: результат или исключение}."""
+    # Дочерние процессы не должны наследовать открытые соединения с БД.
+    connections.close_all()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker) as pool:
+        futures = {pool.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = e
+    return results
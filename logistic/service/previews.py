@@ -0,0 +1,153 @@
+"""Превью для фронтенда: кадр на каждый хайлайт и спрайт-лист на видео.
+
+Кадр хайлайта извлекается перемоткой на ближайший ключевой кадр перед нужным
+моментом (-ss до -i), поэтому декодируется одна GOP, а не всё видео. Спрайт
+собирается только из ключевых кадров (-skip_frame nokey). Имена файлов в
+хранилище детерминированы: зависят от исходного файла, момента и параметров,
+так что повторный запуск без изменений ничего не перекодирует.
+"""
+import hashlib
+import logging
+import math
+import os
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+
+from logistic.service import ffmpeg
+from logistic.service.pool import run_in_processes
+from main.models import Highlight, Video
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_PREFIX = "thumbnails/"
+SPRITE_PREFIX = "sprites/"
+
+
+def _file_digest(video: Video) -> str:
+    return hashlib.sha1(video.file.name.encode("utf-8")).hexdigest()[:12]
+
+
+def sprite_params() -> dict:
+    width, height = getattr(settings, "SPRITE_TILE_SIZE", (160, 90))
+    return {
+        "interval": getattr(settings, "SPRITE_INTERVAL_SECONDS", 10),
+        "columns": getattr(settings, "SPRITE_COLUMNS", 10),
+        "width": width,
+        "height": height,
+    }
+
+
+def thumbnail_time(highlight: Highlight) -> float:
+    if getattr(settings, "THUMBNAIL_POSITION", "mid") == "start":
+        return float(highlight.start_time)
+    return (highlight.start_time + highlight.end_time) / 2
+
+
+def thumbnail_name(video: Video, seconds: float) -> str:
+    height = getattr(settings, "THUMBNAIL_HEIGHT", 180)
+    return f"{THUMBNAIL_PREFIX}{video.pk}/{_file_digest(video)}_{int(seconds * 1000)}_{height}p.jpg"
+
+
+def sprite_name(video: Video) -> str:
+    p = sprite_params()
+    return (
+        f"{SPRITE_PREFIX}{video.pk}_{_file_digest(video)}_"
+        f"{p['interval']}s_{p['columns']}x{p['width']}x{p['height']}.jpg"
+    )
+
+
+def sprite_is_current(video: Video) -> bool:
+    return bool(video.file) and bool(video.sprite_file) and video.sprite_file.name == sprite_name(video)
+
+
+def _source(video: Video) -> str:
+    # Proxy меньше и с частыми ключевыми кадрами: перемотка и декодирование дешевле.
+    return ffmpeg.source_for(video.proxy_file if video.proxy_file else video.file)
+
+
+def build_thumbnail(video: Video, seconds: float, name: str) -> str:
+    height = getattr(settings, "THUMBNAIL_HEIGHT", 180)
+    storage = Highlight.thumbnail.field.storage
+    with ffmpeg.temp_dir() as tmp:
+        local_path = os.path.join(tmp, "thumbnail.jpg")
+        ffmpeg.run([
+            "-y",
+            "-ss", f"{seconds:.3f}",
+            "-i", _source(video),
+            "-frames:v", "1",
+            "-vf", f"scale=-2:{height}",
+            "-q:v", "4",
+            local_path,
+        ], timeout=getattr(settings, "PREVIEW_TIMEOUT", 5 * 60))
+        return ffmpeg.save_to_storage(storage, name, local_path)
+
+
+def build_sprite(video: Video) -> str:
+    p = sprite_params()
+    duration = video.duration or float(ffmpeg.probe(_source(video))["format"]["duration"])
+    rows = max(math.ceil(duration / p["interval"] / p["columns"]), 1)
+    w, h = p["width"], p["height"]
+    with ffmpeg.temp_dir() as tmp:
+        local_path = os.path.join(tmp, "sprite.jpg")
+        ffmpeg.run([
+            "-y",
+            "-skip_frame", "nokey",
+            "-i", _source(video),
+            "-an",
+            "-vf",
+            f"fps=1/{p['interval']},"
+            f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+            f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,"
+            f"tile={p['columns']}x{rows}",
+            "-frames:v", "1",
+            "-q:v", "5",
+            local_path,
+        ], timeout=getattr(settings, "PREVIEW_TIMEOUT", 5 * 60))
+        saved = ffmpeg.save_to_storage(video.sprite_file.storage, sprite_name(video), local_path)
+    Video.objects.filter(pk=video.pk).update(sprite_file=saved)
+    video.sprite_file.name = saved
+    return saved
+
+
+def build_previews(video_id: int, force: bool = False) -> dict | None:
+    """Спрайт видео и кадры его хайлайтов. Возвращает число собранных файлов."""
+    video = Video.objects.get(pk=video_id)
+    if not video.file:
+        return None
+    built = {"sprite": 0, "thumbnails": 0}
+    if force or not sprite_is_current(video):
+        build_sprite(video)
+        built["sprite"] = 1
+
+    # Хайлайты с одинаковым моментом используют один файл.
+    by_name = defaultdict(list)
+    for highlight in video.highlights.only("id", "start_time", "end_time", "thumbnail"):
+        seconds = thumbnail_time(highlight)
+        by_name[(thumbnail_name(video, seconds), seconds)].append(highlight)
+
+    storage = Highlight.thumbnail.field.storage
+    changed = []
+    for (name, seconds), highlights in by_name.items():
+        stale = [h for h in highlights if h.thumbnail.name != name]
+        if not force and not stale:
+            continue
+        if force or not storage.exists(name):
+            name = build_thumbnail(video, seconds, name)
+            built["thumbnails"] += 1
+        for highlight in (highlights if force else stale):
+            highlight.thumbnail = name
+            changed.append(highlight)
+    Highlight.objects.bulk_update(changed, ["thumbnail"], batch_size=500)
+    logger.info("Превью для видео #%s: %s", video_id, built)
+    return built
+
+
+def build_previews_batch(video_ids, workers: int | None = None, force: bool = False):
+    """Собирает превью для набора видео в пуле процессов. Возвращает {id: результат или исключение}."""
+    return run_in_processes(
+        partial(build_previews, force=force),
+        video_ids,
+        workers=workers or getattr(settings, "ML_PROXY_WORKERS", None),
+    )
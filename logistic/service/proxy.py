@@ -0,0 +1,107 @@
+"""Облегчённая копия видео (proxy) для ML: низкое разрешение, малый fps, частые ключевые кадры.
+
+Proxy сохраняется в хранилище под детерминированным именем, зависящим от
+исходного файла и параметров, и переиспользуется стандартными заданиями и
+заданиями с собственным промтом. Вырезки по-прежнему делаются из оригинала.
+"""
+import hashlib
+import logging
+import os
+from functools import partial
+
+from django.conf import settings
+
+from logistic.service import ffmpeg
+from logistic.service.pool import run_in_processes
+from main.models import Video
+
+logger = logging.getLogger(__name__)
+
+PROXY_PREFIX = "proxies/"
+
+
+def proxy_enabled() -> bool:
+    return getattr(settings, "ML_PROXY_ENABLED", False)
+
+
+def proxy_name(video: Video) -> str:
+    """Имя proxy меняется вместе с исходным файлом и параметрами транскодирования."""
+    height = getattr(settings, "ML_PROXY_HEIGHT", 360)
+    fps = getattr(settings, "ML_PROXY_FPS", 5)
+    digest = hashlib.sha1(video.file.name.encode("utf-8")).hexdigest()[:12]
+    return f"{PROXY_PREFIX}{video.pk}_{digest}_{height}p{fps}.mp4"
+
+
+def proxy_is_current(video: Video) -> bool:
+    return bool(video.proxy_file) and video.proxy_file.name == proxy_name(video)
+
+
+def needs_proxy(video: Video) -> bool:
+    """Proxy включён, у видео есть файл, а актуальной proxy ещё нет."""
+    return proxy_enabled() and bool(video.file) and not proxy_is_current(video)
+
+
+def build_proxy(video: Video, force: bool = False) -> str:
+    """Транскодирует видео в proxy и сохраняет её в Video.proxy_file."""
+    name = proxy_name(video)
+    storage = video.proxy_file.storage
+    if not force and proxy_is_current(video):
+        return name
+    if not force and storage.exists(name):
+        # Proxy уже собрана ранее (например, другим воркером).
+        Video.objects.filter(pk=video.pk).update(proxy_file=name)
+        video.proxy_file.name = name
+        return name
+
+    height = getattr(settings, "ML_PROXY_HEIGHT", 360)
+    fps = getattr(settings, "ML_PROXY_FPS", 5)
+    with ffmpeg.temp_dir() as tmp:
+        local_path = os.path.join(tmp, "proxy.mp4")
+        ffmpeg.run([
+            "-y",
+            "-i", ffmpeg.source_for(video.file),
+            "-an",
+            "-vf", f"scale=-2:{height},fps={fps}",
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-crf", "28",
+            # Ключевой кадр каждую секунду: ML перематывает без декодирования лишнего.
+            "-g", str(fps),
+            "-keyint_min", str(fps),
+            "-sc_threshold", "0",
+            "-movflags", "+faststart",
+            local_path,
+        ], timeout=getattr(settings, "ML_PROXY_TIMEOUT", 60 * 60))
+        saved = ffmpeg.save_to_storage(storage, name, local_path)
+
+    Video.objects.filter(pk=video.pk).update(proxy_file=saved)
+    video.proxy_file.name = saved
+    logger.info("Proxy для видео #%s: %s", video.pk, saved)
+    return saved
+
+
+def ensure_proxy(video_id: int, force: bool = False) -> str | None:
+    """Собирает proxy для видео, если нужно. Ошибка не мешает обработке оригинала."""
+    video = Video.objects.get(pk=video_id)
+    if not video.file:
+        return None
+    if not force and proxy_is_current(video):
+        return video.proxy_file.name
+    try:
+        return build_proxy(video, force=force)
+    except ffmpeg.MediaError as e:
+        logger.warning("Не удалось собрать proxy для видео #%s: %s", video_id, e)
+        return None
+
+
+def build_proxies(video_ids, workers: int | None = None, force: bool = False):
+    """Собирает proxy для набора видео в пуле процессов. Возвращает {id: имя или None}."""
+    results = run_in_processes(
+        partial(ensure_proxy, force=force),
+        video_ids,
+        workers=workers or getattr(settings, "ML_PROXY_WORKERS", None),
+    )
+    return {
+        video_id: None if isinstance(result, Exception) else result
+        for video_id, result in results.items()
+    }
@@ -0,0 +1,82 @@
+"""Поиск и завершение заданий ML, зависших в статусе running."""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from logistic.models import ConfigTask, TaskStatus
+from logistic.service.timeouts import DEFAULT_TIMEOUT_SECONDS
+from main.models import Video, VideoStatus
+
+logger = logging.getLogger(__name__)
+
+REAPER_MESSAGE = "Reaper: задача не завершилась до крайнего срока"
+
+
+def expired_tasks(now):
+    """Задания running с истёкшим deadline_at (индекс status, deadline_at).
+
+    Родители окон не берутся: их завершает complete_parent, когда окна
+    закончатся (в том числе по reaper).
+    """
+    # Задания, запущенные до появления deadline_at, считаем по started_at.
+    legacy_deadline = now - timedelta(
+        seconds=getattr(settings, "ML_TASK_DEFAULT_TIMEOUT", DEFAULT_TIMEOUT_SECONDS)
+    )
+    return ConfigTask.objects.filter(status=TaskStatus.RUNNING, is_split=False).filter(
+        Q(deadline_at__lt=now) | Q(deadline_at__isnull=True, started_at__lt=legacy_deadline)
+    )
+
+
+def reap_batch(now, batch_size: int) -> int:
+    """Завершает одну пачку просроченных заданий в короткой транзакции."""
+    with transaction.atomic():
+        tasks = list(
+            expired_tasks(now)
+            .select_for_update(skip_locked=True)
+            .only("id", "video_id", "promt", "status", "parent_id", "attempts")
+            .order_by("deadline_at")[:batch_size]
+        )
+        if not tasks:
+            return 0
+
+        for task in tasks:
+            task.status = TaskStatus.FAILED
+            task.error_message = REAPER_MESSAGE
+            task.finished_at = now
+        ConfigTask.objects.bulk_update(tasks, ["status", "error_message", "finished_at"])
+
+        # Статус видео меняет только стандартная обработка, как в ConfigTask.start;
+        # для окон его ведёт родительское задание.
+        video_ids = {task.video_id for task in tasks if not task.is_custom and not task.is_window}
+        videos = list(
+            Video.objects.filter(pk__in=video_ids, status=VideoStatus.PROCESSING).only("id", "status")
+        )
+        for video in videos:
+            video.status = VideoStatus.NOT_PROCESSED
+        Video.objects.bulk_update(videos, ["status"])
+
+    # Окна повторяются или собираются в родителя после фиксации пачки.
+    for task in tasks:
+        task.on_finished()
+
+    logger.info("Reaper: завершено %s заданий, сброшено %s видео", len(tasks), len(videos))
+    return len(tasks)
+
+
+def reap_expired_tasks(batch_size: int | None = None, max_batches: int | None = None) -> int:
+    """Завершает просроченные задания пачками, пока они не закончатся."""
+    batch_size = batch_size or getattr(settings, "REAPER_BATCH_SIZE", 500)
+    now = timezone.now()
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        reaped = reap_batch(now, batch_size)
+        total += reaped
+        batches += 1
+        if reaped < batch_size:
+            break
+    return total
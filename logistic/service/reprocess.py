@@ -0,0 +1,67 @@
+"""Повторная обработка существующих видео ML пачками с ограничением скорости."""
+import logging
+import time
+
+from django.conf import settings
+
+from logistic.models import ConfigTask
+from logistic.service.backpressure import get_queue_state
+
+logger = logging.getLogger(__name__)
+
+
+class Throttle:
+    """Равномерно распределяет отправку заданий: не больше rate в минуту."""
+
+    def __init__(self, rate_per_minute: float | None):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(self.next_at, now) + self.interval
+
+
+def reprocess_videos(
+    queryset,
+    chunk_size: int = 100,
+    rate_per_minute: float | None = None,
+    replace_highlights: bool = False,
+    after_id: int | None = None,
+    on_progress=None,
+) -> int:
+    """Создаёт задания ML для видео из queryset в порядке pk.
+
+    Видео читаются пачками по chunk_size. Задание создаётся непосредственно
+    перед отправкой: отправка ограничена rate_per_minute и ждёт, пока очередь
+    ML не опустится ниже порога, и заранее созданные задания успевали бы
+    устареть по ML_TASK_MAX_QUEUE_WAIT, а при прерывании оставались бы в
+    pending. after_id позволяет продолжить прерванный запуск;
+    on_progress(last_id, done) вызывается после каждого поставленного задания.
+    """
+    if rate_per_minute is None:
+        rate_per_minute = getattr(settings, "REPROCESS_RATE_PER_MINUTE", None)
+    throttle = Throttle(rate_per_minute)
+    queryset = queryset.order_by("pk")
+    done = 0
+    last_id = after_id or 0
+    while True:
+        videos = list(queryset.filter(pk__gt=last_id)[:chunk_size])
+        if not videos:
+            break
+        for video in videos:
+            throttle.wait()
+            while get_queue_state().queue_saturated:
+                time.sleep(5)
+            # save() нового задания сразу ставит его в очередь.
+            ConfigTask.objects.create(video=video, replace_highlights=replace_highlights)
+            done += 1
+            last_id = video.pk
+            if on_progress:
+                on_progress(last_id, done)
+        logger.info("Переобработка: поставлено %s заданий, последнее видео #%s", done, last_id)
+    return done
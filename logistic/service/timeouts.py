@@ -0,0 +1,63 @@
+"""Таймауты заданий ML по длительности видео и наблюдаемой скорости обработки."""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from logistic.models import ProcessingRate, RateKind
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 600  # 10 минут, если длительность видео неизвестна
+
+
+def _kind(task) -> str:
+    return RateKind.CUSTOM if task.is_custom else RateKind.DEFAULT
+
+
+def get_rate(kind: str) -> float:
+    """Текущая оценка скорости ML (секунд видео на секунду работы)."""
+    rate = ProcessingRate.objects.filter(kind=kind).values_list("rate", flat=True).first()
+    return rate or getattr(settings, "ML_DEFAULT_PROCESSING_RATE", 1.0)
+
+
+def compute_timeout(task) -> int:
+    """Таймаут задания в секундах: накладные расходы + длительность / скорость с запасом."""
+    default = getattr(settings, "ML_TASK_DEFAULT_TIMEOUT", DEFAULT_TIMEOUT_SECONDS)
+    duration = task.media_duration
+    if not duration:
+        return default
+
+    overhead = getattr(settings, "ML_TIMEOUT_OVERHEAD_SECONDS", 60)
+    safety = getattr(settings, "ML_TIMEOUT_SAFETY_FACTOR", 2.0)
+    timeout = overhead + duration / get_rate(_kind(task)) * safety
+    low = getattr(settings, "ML_TIMEOUT_MIN_SECONDS", 120)
+    high = getattr(settings, "ML_TIMEOUT_MAX_SECONDS", 4 * 60 * 60)
+    return int(min(max(timeout, low), high))
+
+
+def record_processing_time(task) -> None:
+    """Обновляет скользящую оценку скорости по успешно завершённому заданию."""
+    if task.is_split:
+        # Родитель окон работает параллельно, его время не отражает скорость ML.
+        return
+    duration = task.media_duration
+    if not duration or not task.started_at or not task.finished_at:
+        return
+    elapsed = (task.finished_at - task.started_at).total_seconds()
+    if elapsed <= 0:
+        return
+
+    observed = duration / elapsed
+    alpha = getattr(settings, "ML_RATE_SMOOTHING", 0.2)
+    with transaction.atomic():
+        rate, created = ProcessingRate.objects.select_for_update().get_or_create(
+            kind=_kind(task),
+            defaults={"rate": observed, "samples": 1},
+        )
+        if created:
+            return
+        rate.rate = alpha * observed + (1 - alpha) * rate.rate
+        rate.samples += 1
+        rate.save(update_fields=["rate", "samples", "updated_at"])
+    logger.info("Скорость ML (%s): %.2fx по заданию #%s", rate.kind, rate.rate, task.pk)
@@ -6,6 +6,9 @@ from urllib.parse import urlparse
 import requests
 import yt_dlp
 
+from config import tracing
+from config.metrics import INGEST_BYTES, INGEST_DURATION, INGEST_ERRORS, timed
+
 logger = logging.getLogger(__name__)
 
 DIRECT_VIDEO_EXTENSIONS = (".mp4", ".webm", ".mkv", ".mov", ".avi", ".m4v")
@@ -33,6 +36,7 @@ class VideoUploader:
     def __init__(self, url, low_resolution=False):
         self.url = url
         self.video_file = None
+        self.duration = None
         self.low_resolution = low_resolution
         self._temp_dir = tempfile.mkdtemp()
 
@@ -88,6 +92,8 @@ class VideoUploader:
                 if info is None:
                     raise ResourceNotFoundError("Видео недоступно для загрузки")
 
+                if info.get("duration"):
+                    self.duration = int(info["duration"])
                 self.video_file = ydl.prepare_filename(info)
 
                 if not os.path.exists(self.video_file):
@@ -141,13 +147,20 @@ class VideoUploader:
 
     def upload(self):
         if self._is_youtube_url(self.url):
-            return self._download_from_youtube()
+            return self._measured("youtube", self._download_from_youtube)
         if self._is_direct_video_url(self.url):
-            return self._download_direct()
+            return self._measured("direct", self._download_direct)
         raise NotAVideoError("Предоставлена ссылка не на видео. "
                              "Поддерживаются YouTube и прямые ссылки "
                              "на видео (.mp4, .webm и т.д.)")
 
+    def _measured(self, source, download):
+        with tracing.span("ingest.download", source=source, url=self.url):
+            with timed(INGEST_DURATION, INGEST_ERRORS, source=source):
+                path = download()
+        INGEST_BYTES.labels(source).inc(os.path.getsize(path))
+        return path
+
     def cleanup(self):
         if self._temp_dir and os.path.isdir(self._temp_dir):
             try:
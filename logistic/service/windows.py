@@ -0,0 +1,133 @@
+"""Обработка длинных видео окнами: разбиение, повтор окон и сборка результата.
+
+Видео длиннее ML_WINDOW_MIN_DURATION делится на перекрывающиеся окна по
+ML_WINDOW_SECONDS. Каждое окно — дочерний ConfigTask, который отправляется в ML
+отдельно со смещениями window_start/window_end. Хайлайты окна приходят во
+времени относительно начала окна; из зоны перекрытия каждое окно оставляет
+только свою половину, чтобы соседние окна не дублировали события.
+"""
+import logging
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from logistic.models import ConfigTask, TaskStatus
+from main.models import Video, VideoStatus
+
+logger = logging.getLogger(__name__)
+
+
+def window_bounds(duration: int, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """Окна [start, end) размера size с перекрытием overlap, покрывающие видео."""
+    step = max(size - overlap, 1)
+    bounds = []
+    start = 0
+    while True:
+        end = min(start + size, duration)
+        bounds.append((start, end))
+        if end >= duration:
+            return bounds
+        start += step
+
+
+def should_split(task: ConfigTask) -> bool:
+    if task.is_window or not getattr(settings, "ML_WINDOWS_ENABLED", True):
+        return False
+    duration = task.video.duration
+    return bool(duration) and duration >= getattr(settings, "ML_WINDOW_MIN_DURATION", 20 * 60)
+
+
+def split_into_windows(task: ConfigTask) -> List[ConfigTask]:
+    """Переводит задание в режим окон и ставит дочерние задания в очередь."""
+    size = getattr(settings, "ML_WINDOW_SECONDS", 10 * 60)
+    overlap = getattr(settings, "ML_WINDOW_OVERLAP_SECONDS", 30)
+    bounds = window_bounds(task.video.duration, size, overlap)
+
+    with transaction.atomic():
+        task.status = TaskStatus.RUNNING
+        task.is_split = True
+        task.started_at = timezone.now()
+        # Дедлайны есть у окон; родителя завершает complete_parent, а не reaper.
+        task.deadline_at = None
+        task.save(update_fields=["status", "is_split", "started_at", "deadline_at"])
+        windows = ConfigTask.objects.bulk_create([
+            ConfigTask(
+                video=task.video,
+                parent=task,
+                promt=task.promt,
+                replace_highlights=task.replace_highlights,
+                window_start=start,
+                window_end=end,
+                traceparent=task.traceparent,
+            )
+            for start, end in bounds
+        ])
+        if not task.is_custom:
+            Video.objects.filter(pk=task.video_id).update(status=VideoStatus.PROCESSING)
+
+    for window in windows:
+        window.dispatch()
+    logger.info("Задание #%s разбито на %s окон", task.pk, len(windows))
+    return windows
+
+
+def owns(task: ConfigTask, start: int, end: int) -> bool:
+    """Относится ли хайлайт [start, end] (абсолютное время) к этому окну.
+
+    Зона перекрытия делится пополам между соседними окнами по середине хайлайта.
+    """
+    half_overlap = getattr(settings, "ML_WINDOW_OVERLAP_SECONDS", 30) / 2
+    owned_start = task.window_start + half_overlap if task.window_start > 0 else float("-inf")
+    is_last = task.video.duration is None or task.window_end >= task.video.duration
+    owned_end = float("inf") if is_last else task.window_end - half_overlap
+    middle = (start + end) / 2
+    return owned_start <= middle < owned_end
+
+
+def on_window_finished(window: ConfigTask) -> None:
+    """Повторяет упавшее окно или завершает родителя, когда окна закончились."""
+    max_attempts = getattr(settings, "ML_WINDOW_MAX_ATTEMPTS", 3)
+    if window.status == TaskStatus.FAILED and window.attempts + 1 < max_attempts:
+        retried = ConfigTask.objects.filter(pk=window.pk, status=TaskStatus.FAILED).update(
+            status=TaskStatus.PENDING,
+            attempts=window.attempts + 1,
+            started_at=None,
+            finished_at=None,
+            deadline_at=None,
+            error_message="",
+        )
+        if retried:
+            logger.info("Повтор окна #%s (попытка %s): %s", window.pk, window.attempts + 2, window.error_message)
+            window.refresh_from_db()
+            window.dispatch()
+        return
+    complete_parent(window.parent_id)
+
+
+def complete_parent(parent_id: int) -> None:
+    """Завершает родительское задание, если все окна в конечном статусе."""
+    statuses = list(
+        ConfigTask.objects.filter(parent_id=parent_id).values_list("status", flat=True)
+    )
+    if any(s in (TaskStatus.PENDING, TaskStatus.RUNNING) for s in statuses):
+        return
+
+    failed = statuses.count(TaskStatus.FAILED)
+    status = TaskStatus.FAILED if failed else TaskStatus.SUCCESS
+    # Условное обновление: родителя завершает только одно из окон.
+    finished = ConfigTask.objects.filter(pk=parent_id, status=TaskStatus.RUNNING).update(
+        status=status,
+        finished_at=timezone.now(),
+        error_message=f"Окон с ошибкой: {failed} из {len(statuses)}" if failed else "",
+    )
+    if not finished:
+        return
+
+    parent = ConfigTask.objects.get(pk=parent_id)
+    if not parent.is_custom:
+        Video.objects.filter(pk=parent.video_id).update(
+            status=VideoStatus.NOT_PROCESSED if failed else VideoStatus.PROCESSED,
+        )
+    logger.info("Задание #%s собрано из %s окон: %s", parent_id, len(statuses), status)
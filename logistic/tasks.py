@@ -1,28 +1,119 @@
 import time
+from datetime import timedelta
 from typing import Any, Dict, Optional
 
+from django.conf import settings
 from django.utils import timezone
 
-from celery import shared_task
+from celery import shared_task, signature
 
-from .models import ConfigTask, TaskStatus
+from main.models import Video
 
-TIMEOUT_SECONDS = 600  # 10 минут
+from .models import ConfigTask, TaskStatus
+from .service.analytics import update_rollups
+from .service.backpressure import deadline_exceeded, get_queue_state
+from .service.hls import package_highlight_file, package_video
+from .service.keyframes import build_keyframe_index
+from .service.pipeline import prepare_video
+from .service.reaper import reap_expired_tasks
+from .service.reprocess import reprocess_videos
+from .service.timeouts import compute_timeout
+from .service.windows import should_split, split_into_windows
 
 
 @shared_task(queue="ml")
-def run_ml_task(task_id: int, extra_payload: Optional[Dict[str, Any]] = None) -> None:
+def run_ml_task(
+    task_id: int,
+    extra_payload: Optional[Dict[str, Any]] = None,
+    timeout: Optional[int] = None,
+    queued_at: Optional[str] = None,
+) -> None:
     task = ConfigTask.objects.get(pk=task_id)
-    task.start(extra_payload=extra_payload)
+    if task.status != TaskStatus.PENDING:
+        return
+
+    # Сброс нагрузки до отправки в ML: устаревшие задания отбрасываем,
+    # при переполнении ML откладываем запуск.
+    if deadline_exceeded(task, queued_at=queued_at):
+        task.fail("Отброшено: задание слишком долго ждало в очереди ML")
+        return
+    if should_split(task):
+        split_into_windows(task)
+        return
+    if get_queue_state().in_flight_saturated:
+        # Откладываем то же задание ML, минуя dispatch(): подготовка видео уже
+        # выполнена (или не удалась), а ожидание считается с прежнего queued_at.
+        task.ml_signature(
+            extra_payload=extra_payload, timeout=timeout, queued_at=queued_at,
+        ).apply_async(countdown=getattr(settings, "ML_DEFER_SECONDS", 15))
+        return
 
-    start_time = time.monotonic()
+    task.start(extra_payload=extra_payload, timeout=timeout)
+
+    deadline = task.deadline_at or timezone.now() + timedelta(seconds=compute_timeout(task))
     while task.status not in (TaskStatus.SUCCESS, TaskStatus.FAILED):
-        if time.monotonic() - start_time >= TIMEOUT_SECONDS:
-            task.status = TaskStatus.FAILED
-            task.error_message = "Timeout: задача не завершилась за 10 минут"
-            task.finished_at = timezone.now()
-            task.save(update_fields=["status", "error_message", "finished_at"])
+        if timezone.now() >= deadline:
+            timeout = int((deadline - task.started_at).total_seconds())
+            task.fail(f"Timeout: задача не завершилась за {timeout} сек")
             return
         time.sleep(1)
         task.refresh_from_db()
 
+
+@shared_task
+def reap_stuck_tasks() -> int:
+    return reap_expired_tasks(
+        max_batches=getattr(settings, "REAPER_MAX_BATCHES", 20),
+    )
+
+
+@shared_task
+def rollup_task_analytics() -> int:
+    return update_rollups()
+
+
+@shared_task(bind=True)
+def reprocess_videos_task(self, video_ids, replace_highlights: bool = False) -> int:
+    """Фоновая переобработка для действия в админке.
+
+    Прогресс пишется в бэкенд результатов Celery (state PROGRESS) и отдаётся
+    ReprocessProgressView.
+    """
+    total = len(video_ids)
+
+    def on_progress(last_id, done):
+        self.update_state(state="PROGRESS", meta={"done": done, "total": total, "last_id": last_id})
+
+    return reprocess_videos(
+        Video.objects.filter(pk__in=video_ids),
+        replace_highlights=replace_highlights,
+        on_progress=on_progress,
+    )
+
+
+@shared_task(queue="media")
+def prepare_video_task(video_id: int, ml_task: Optional[Dict[str, Any]] = None) -> None:
+    # Ошибки этапов не прерывают цепочку: ML получит оригинал.
+    prepare_video(video_id)
+    if ml_task:
+        ml_task = signature(ml_task)
+        # Ожидание в очереди ML считается с этого момента, а не с создания
+        # задания, если dispatch() не передал свою отметку.
+        if not ml_task.kwargs.get("queued_at"):
+            ml_task = ml_task.clone(kwargs={"queued_at": timezone.now().isoformat()})
+        ml_task.apply_async()
+
+
+@shared_task(queue="media")
+def build_keyframe_index_task(video_id: int) -> None:
+    build_keyframe_index(video_id)
+
+
+@shared_task(queue="media")
+def package_video_task(video_id: int) -> None:
+    package_video(video_id)
+
+
+@shared_task(queue="media")
+def package_highlight_file_task(highlight_file_id: int) -> None:
+    package_highlight_file(highlight_file_id)
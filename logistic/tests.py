@@ -1,5 +1,676 @@
-from django.test import TestCase
+import io
+import os
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 
+from logistic.models import (
+    AnalysisStage,
+    CandidateSegment,
+    ConfigTask,
+    DurationBucket,
+    ProcessingRate,
+    RateKind,
+    TaskStatus,
+)
+from logistic.service import audio_peaks, hls, keyframes, scene_detect
+from logistic.service.analytics import (
+    PERCENTILES,
+    duration_bucket,
+    error_class,
+    histogram,
+    merge_histograms,
+    percentile,
+    rebuild_rollups,
+    summarize,
+    update_rollups,
+)
+from logistic.service.audio_peaks import AUDIO_EVENT_TYPE, frame_envelopes, peak_scores, robust_z
+from logistic.service.candidates import candidate_windows
+from logistic.service.highlight_merge import merge_intervals, merge_items
+from logistic.service.keyframes import KeyframeIndex, KeyframeRange
+from logistic.service.pipeline import needs_preparation, prepare_video
+from logistic.service.proxy import needs_proxy, proxy_name
+from logistic.service.reaper import REAPER_MESSAGE, reap_batch
+from logistic.service.reprocess import Throttle, reprocess_videos
+from logistic.service.scene_detect import frame_scores
+from logistic.service.timeouts import compute_timeout, record_processing_time
+from logistic.service.windows import complete_parent, owns, window_bounds
+from logistic.tasks import prepare_video_task, run_ml_task
+from main.models import Highlight, Video, VideoStatus
 
+TIMEOUT_SETTINGS = {
+    "ML_TASK_DEFAULT_TIMEOUT": 600,
+    "ML_DEFAULT_PROCESSING_RATE": 1.0,
+    "ML_RATE_SMOOTHING": 0.2,
+    "ML_TIMEOUT_OVERHEAD_SECONDS": 60,
+    "ML_TIMEOUT_SAFETY_FACTOR": 2.0,
+    "ML_TIMEOUT_MIN_SECONDS": 120,
+    "ML_TIMEOUT_MAX_SECONDS": 4 * 60 * 60,
+}
+
+
+def create_video(**fields):
+    # Задание и задачи media, созданные сигналом при сохранении видео, не уходят в брокер.
+    with mock.patch("logistic.models.ConfigTask.dispatch"), \
+            mock.patch("logistic.service.pipeline.dispatch_media_tasks"):
+        return Video.objects.create(**{"title": "Матч", "duration": 600, **fields})
+
+
+class MergeIntervalsTests(SimpleTestCase):
+    def clusters(self, groups, starts, ends, gap=0):
+        return [sorted(c.tolist()) for c in merge_intervals(np.array(groups), np.array(starts), np.array(ends), gap)]
+
+    def test_empty(self):
+        self.assertEqual(merge_intervals(np.array([]), np.array([]), np.array([])), [])
+
+    def test_overlapping_and_touching_merge(self):
+        clusters = self.clusters([0, 0, 0, 0], [0, 5, 10, 30], [6, 10, 12, 40])
+        self.assertEqual(clusters, [[0, 1, 2], [3]])
+
+    def test_gap_joins_close_intervals(self):
+        self.assertEqual(self.clusters([0, 0], [0, 15], [10, 20]), [[0], [1]])
+        self.assertEqual(self.clusters([0, 0], [0, 15], [10, 20], gap=5), [[0, 1]])
+
+    def test_groups_never_merge(self):
+        clusters = self.clusters([1, 0, 1, 0], [0, 0, 5, 5], [10, 10, 15, 15])
+        self.assertEqual(sorted(clusters), [[0, 2], [1, 3]])
+
+    def test_unsorted_input_and_nested_interval(self):
+        # Короткий отрезок внутри длинного не обрывает кластер.
+        self.assertEqual(self.clusters([0, 0, 0], [20, 0, 2], [25, 30, 4]), [[0, 1, 2]])
+
+    def test_merge_items(self):
+        items = [
+            {"video_id": 1, "event_type": "goal", "start_time": 0, "end_time": 10, "confidence": 0.4, "description": "Гол"},
+            {"video_id": 1, "event_type": "goal", "start_time": 8, "end_time": 20, "confidence": 0.9, "description": "Гол"},
+            {"video_id": 1, "event_type": "foul", "start_time": 5, "end_time": 12, "confidence": 0.5, "description": ""},
+            {"video_id": 1, "event_type": "goal", "start_time": 15, "end_time": 25, "confidence": 0.1, "description": "Повтор"},
+        ]
+        merged = merge_items(items, ("video_id", "event_type"))
+        by_type = {item["event_type"]: item for item in merged}
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(by_type["goal"], {
+            "video_id": 1,
+            "event_type": "goal",
+            "start_time": 0,
+            "end_time": 25,
+            "confidence": 0.9,
+            "description": "Гол; Повтор",
+            "members": [0, 1, 3],
+        })
+        self.assertEqual(by_type["foul"]["members"], [2])
+        self.assertEqual(merge_items([], ("video_id",)), [])
+
+
+@override_settings(ML_WINDOW_OVERLAP_SECONDS=30)
+class WindowTests(TestCase):
+    def test_window_bounds(self):
+        self.assertEqual(window_bounds(1500, 600, 30), [(0, 600), (570, 1170), (1140, 1500)])
+        self.assertEqual(window_bounds(600, 600, 30), [(0, 600)])
+        self.assertEqual(window_bounds(100, 600, 30), [(0, 100)])
+
+    def test_overlap_is_split_between_neighbours(self):
+        video = Video(duration=1500)
+        windows = [
+            ConfigTask(video=video, parent_id=1, window_start=start, window_end=end)
+            for start, end in window_bounds(1500, 600, 30)
+        ]
+        for start, end in [(0, 10), (580, 590), (575, 585), (1150, 1160), (1490, 1500)]:
+            owners = [w.window_start for w in windows if owns(w, start, end)]
+            self.assertEqual(len(owners), 1, (start, end, owners))
+        # Середина 585 — граница владения первого и второго окна.
+        self.assertTrue(owns(windows[1], 580, 590))
+        self.assertTrue(owns(windows[0], 575, 585))
+        self.assertTrue(owns(windows[2], 1490, 1500))
+
+    def split(self, statuses):
+        video = create_video(duration=1500, status=VideoStatus.PROCESSING)
+        parent = ConfigTask.create_batch([video], dispatch=False, status=TaskStatus.RUNNING, is_split=True)[0]
+        ConfigTask.objects.bulk_create([
+            ConfigTask(video=video, parent=parent, window_start=n * 570, window_end=n * 570 + 600, status=status)
+            for n, status in enumerate(statuses)
+        ])
+        return video, parent
+
+    def test_complete_parent_waits_for_all_windows(self):
+        video, parent = self.split([TaskStatus.SUCCESS, TaskStatus.RUNNING])
+        complete_parent(parent.pk)
+        parent.refresh_from_db()
+        self.assertEqual(parent.status, TaskStatus.RUNNING)
+
+    def test_complete_parent_success(self):
+        video, parent = self.split([TaskStatus.SUCCESS, TaskStatus.SUCCESS])
+        complete_parent(parent.pk)
+        parent.refresh_from_db()
+        video.refresh_from_db()
+        self.assertEqual(parent.status, TaskStatus.SUCCESS)
+        self.assertIsNotNone(parent.finished_at)
+        self.assertEqual(video.status, VideoStatus.PROCESSED)
+
+    def test_complete_parent_failed_window(self):
+        video, parent = self.split([TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.SUCCESS])
+        complete_parent(parent.pk)
+        parent.refresh_from_db()
+        video.refresh_from_db()
+        self.assertEqual(parent.status, TaskStatus.FAILED)
+        self.assertEqual(parent.error_message, "Окон с ошибкой: 1 из 3")
+        self.assertEqual(video.status, VideoStatus.NOT_PROCESSED)
+
+    def test_complete_parent_runs_once(self):
+        video, parent = self.split([TaskStatus.SUCCESS])
+        complete_parent(parent.pk)
+        finished_at = ConfigTask.objects.get(pk=parent.pk).finished_at
+        complete_parent(parent.pk)
+        self.assertEqual(ConfigTask.objects.get(pk=parent.pk).finished_at, finished_at)
+
+
+@override_settings(**TIMEOUT_SETTINGS)
+class TimeoutTests(TestCase):
+    def test_unknown_duration_uses_default(self):
+        self.assertEqual(compute_timeout(ConfigTask(video=Video(duration=None))), 600)
+
+    def test_timeout_from_duration_and_rate(self):
+        task = ConfigTask(video=Video(duration=600))
+        # 60 с накладных + 600 с видео / 1.0 × запас 2.
+        self.assertEqual(compute_timeout(task), 1260)
+        ProcessingRate.objects.create(kind=RateKind.DEFAULT, rate=4.0)
+        self.assertEqual(compute_timeout(task), 60 + 300)
+
+    def test_timeout_is_clamped(self):
+        self.assertEqual(compute_timeout(ConfigTask(video=Video(duration=10))), 120)
+        self.assertEqual(compute_timeout(ConfigTask(video=Video(duration=24 * 60 * 60))), 4 * 60 * 60)
+
+    def test_custom_prompt_and_window_rates(self):
+        ProcessingRate.objects.create(kind=RateKind.CUSTOM, rate=0.5)
+        self.assertEqual(compute_timeout(ConfigTask(video=Video(duration=600), promt="Голы")), 60 + 2400)
+        window = ConfigTask(video=Video(duration=3000), parent_id=1, window_start=570, window_end=1170)
+        self.assertEqual(compute_timeout(window), 1260)
+
+    def finished_task(self, duration, elapsed, **fields):
+        started = timezone.now()
+        return ConfigTask(
+            video=Video(duration=duration),
+            started_at=started,
+            finished_at=started + timedelta(seconds=elapsed),
+            **fields,
+        )
+
+    def test_rate_moving_average(self):
+        record_processing_time(self.finished_task(600, 300))
+        rate = ProcessingRate.objects.get(kind=RateKind.DEFAULT)
+        self.assertEqual((rate.rate, rate.samples), (2.0, 1))
+
+        record_processing_time(self.finished_task(600, 100))
+        rate.refresh_from_db()
+        # 0.2 × 6.0 + 0.8 × 2.0
+        self.assertAlmostEqual(rate.rate, 2.8)
+        self.assertEqual(rate.samples, 2)
+
+    def test_rate_ignores_split_parents_and_empty_timings(self):
+        record_processing_time(self.finished_task(3000, 10, is_split=True))
+        record_processing_time(self.finished_task(None, 10))
+        record_processing_time(self.finished_task(600, 0))
+        self.assertFalse(ProcessingRate.objects.exists())
+
+
+@override_settings(ML_WINDOW_MAX_ATTEMPTS=3)
+class ReapBatchTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.video = create_video(status=VideoStatus.PROCESSING)
+
+    def running(self, deadline, **fields):
+        return ConfigTask.create_batch(
+            [self.video], dispatch=False, status=TaskStatus.RUNNING,
+            started_at=self.now - timedelta(hours=1), deadline_at=deadline, **fields,
+        )[0]
+
+    def test_expired_task_fails_and_resets_video(self):
+        expired = self.running(self.now - timedelta(seconds=1))
+        alive = self.running(self.now + timedelta(minutes=5))
+
+        self.assertEqual(reap_batch(self.now, 10), 1)
+
+        expired.refresh_from_db()
+        alive.refresh_from_db()
+        self.video.refresh_from_db()
+        self.assertEqual((expired.status, expired.error_message), (TaskStatus.FAILED, REAPER_MESSAGE))
+        self.assertEqual(expired.finished_at, self.now)
+        self.assertEqual(alive.status, TaskStatus.RUNNING)
+        self.assertEqual(self.video.status, VideoStatus.NOT_PROCESSED)
+
+    def test_custom_prompt_keeps_video_status(self):
+        self.running(self.now - timedelta(seconds=1), promt="Голы")
+        reap_batch(self.now, 10)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.status, VideoStatus.PROCESSING)
+
+    def test_batch_size(self):
+        for n in range(3):
+            self.running(self.now - timedelta(minutes=n + 1))
+        self.assertEqual(reap_batch(self.now, 2), 2)
+        self.assertEqual(reap_batch(self.now, 2), 1)
+        self.assertEqual(reap_batch(self.now, 2), 0)
+
+    def test_split_parent_is_left_to_windows(self):
+        parent = self.running(None, is_split=True)
+        window = self.running(self.now - timedelta(seconds=1), parent=parent, window_start=0, window_end=600)
+
+        with mock.patch("logistic.models.ConfigTask.dispatch") as dispatch:
+            self.assertEqual(reap_batch(self.now, 10), 1)
+
+        parent.refresh_from_db()
+        window.refresh_from_db()
+        self.video.refresh_from_db()
+        self.assertEqual(parent.status, TaskStatus.RUNNING)
+        # Окно ушло на повтор, статус видео ведёт родитель.
+        self.assertEqual((window.status, window.attempts), (TaskStatus.PENDING, 1))
+        dispatch.assert_called_once()
+        self.assertEqual(self.video.status, VideoStatus.PROCESSING)
+
+    def test_last_window_failure_completes_parent(self):
+        parent = self.running(None, is_split=True)
+        self.running(self.now - timedelta(seconds=1), parent=parent, window_start=0, window_end=600, attempts=2)
+
+        reap_batch(self.now, 10)
+
+        parent.refresh_from_db()
+        self.assertEqual(parent.status, TaskStatus.FAILED)
+        self.assertEqual(parent.error_message, "Окон с ошибкой: 1 из 1")
+
+
+@override_settings(ML_PROXY_ENABLED=True, ML_PROXY_HEIGHT=360, ML_PROXY_FPS=5, ML_DEFER_SECONDS=15)
+class PipelineTests(TestCase):
+    def test_proxy_name_follows_file_and_settings(self):
+        video = Video(pk=7, file="videos/match.mp4")
+        name = proxy_name(video)
+        self.assertRegex(name, r"^proxies/7_[0-9a-f]{12}_360p5\.mp4$")
+        self.assertEqual(proxy_name(Video(pk=7, file="videos/match.mp4")), name)
+        self.assertNotEqual(proxy_name(Video(pk=7, file="videos/other.mp4")), name)
+        with override_settings(ML_PROXY_FPS=10):
+            self.assertTrue(proxy_name(video).endswith("_360p10.mp4"))
+
+    def test_needs_preparation(self):
+        video = Video(pk=7, file="videos/match.mp4")
+        self.assertTrue(needs_proxy(video))
+        self.assertTrue(needs_preparation(video))
+        video.proxy_file.name = proxy_name(video)
+        self.assertFalse(needs_preparation(video))
+        self.assertFalse(needs_preparation(Video(pk=8)))
+        with override_settings(ML_PROXY_ENABLED=False):
+            self.assertFalse(needs_preparation(Video(pk=7, file="videos/match.mp4")))
+
+    def test_proxy_failure_does_not_stop_stages(self):
+        stage = mock.Mock(__name__="stage")
+        with mock.patch("logistic.service.pipeline.ensure_proxy", side_effect=RuntimeError("ffmpeg")), \
+                mock.patch("logistic.service.pipeline.STAGES", ((lambda: True, None, stage),)):
+            prepare_video(1)
+        stage.assert_called_once_with(1)
+
+    def test_saturated_ml_defers_without_preparing_again(self):
+        video = create_video(file="videos/match.mp4")
+        task = ConfigTask.objects.get(video=video)
+        queued_at = (timezone.now() - timedelta(minutes=1)).isoformat()
+
+        with mock.patch("logistic.tasks.get_queue_state") as state, \
+                mock.patch("logistic.tasks.prepare_video_task.apply_async") as prepare, \
+                mock.patch("celery.canvas.Signature.apply_async", autospec=True) as apply_async:
+            state.return_value.in_flight_saturated = True
+            run_ml_task(task.pk, None, 900, queued_at=queued_at)
+
+        prepare.assert_not_called()
+        sig = apply_async.call_args.args[0]
+        self.assertEqual(sig.task, "logistic.tasks.run_ml_task")
+        self.assertEqual(sig.args, (task.pk, None, 900))
+        self.assertEqual(sig.kwargs, {"queued_at": queued_at})
+        self.assertEqual(apply_async.call_args.kwargs, {"countdown": 15})
+        task.refresh_from_db()
+        self.assertEqual(task.status, TaskStatus.PENDING)
+
+    def test_prepare_keeps_given_queued_at(self):
+        task = ConfigTask(pk=1, video=Video(duration=600))
+        with mock.patch("logistic.tasks.prepare_video"), \
+                mock.patch("celery.canvas.Signature.apply_async", autospec=True) as apply_async:
+            prepare_video_task(1, dict(task.ml_signature(timeout=900)))
+            prepare_video_task(1, dict(task.ml_signature(timeout=900, queued_at="2026-01-01T00:00:00")))
+
+        first, second = (c.args[0] for c in apply_async.call_args_list)
+        self.assertIn("queued_at", first.kwargs)
+        self.assertEqual(second.kwargs, {"queued_at": "2026-01-01T00:00:00"})
+
+
+class ThrottleTests(SimpleTestCase):
+    def test_spaces_calls_evenly(self):
+        clock = [100.0]
+        with mock.patch("logistic.service.reprocess.time") as time:
+            time.monotonic.side_effect = lambda: clock[0]
+            time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+            throttle = Throttle(30)
+            for _ in range(3):
+                throttle.wait()
+            # Первый вызов без ожидания, дальше — по 2 с.
+            self.assertEqual([c.args[0] for c in time.sleep.call_args_list], [2.0, 2.0])
+            clock[0] += 10
+            throttle.wait()
+            self.assertEqual(time.sleep.call_count, 2)
+
+    def test_no_rate_never_sleeps(self):
+        with mock.patch("logistic.service.reprocess.time") as time:
+            Throttle(None).wait()
+            Throttle(0).wait()
+        time.sleep.assert_not_called()
+
+
+class ReprocessTests(TestCase):
+    def setUp(self):
+        self.videos = [create_video() for _ in range(5)]
+        dispatch = mock.patch("logistic.models.ConfigTask.dispatch")
+        dispatch.start()
+        self.addCleanup(dispatch.stop)
+        self.last_task_id = ConfigTask.objects.order_by("pk").last().pk
+
+    def new_tasks(self):
+        return ConfigTask.objects.filter(pk__gt=self.last_task_id).order_by("pk")
+
+    def test_creates_tasks_in_pk_order_from_after_id(self):
+        progress = []
+        done = reprocess_videos(
+            Video.objects.all(), chunk_size=2, rate_per_minute=0, replace_highlights=True,
+            after_id=self.videos[0].pk, on_progress=lambda last_id, n: progress.append((last_id, n)),
+        )
+        self.assertEqual(done, 4)
+        self.assertEqual(list(self.new_tasks().values_list("video_id", flat=True)), [v.pk for v in self.videos[1:]])
+        self.assertTrue(all(self.new_tasks().values_list("replace_highlights", flat=True)))
+        self.assertEqual(progress, [(v.pk, n) for n, v in enumerate(self.videos[1:], 1)])
+
+    def test_waits_while_queue_is_saturated(self):
+        saturated = mock.Mock(queue_saturated=True)
+        free = mock.Mock(queue_saturated=False)
+        with mock.patch("logistic.service.reprocess.get_queue_state", side_effect=[saturated, saturated, free, free]), \
+                mock.patch("logistic.service.reprocess.time.sleep") as sleep:
+            done = reprocess_videos(Video.objects.filter(pk__in=[v.pk for v in self.videos[:2]]), rate_per_minute=0)
+        self.assertEqual(done, 2)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [5, 5])
+
+
+class SceneDetectTests(TestCase):
+    def frames(self, *levels):
+        return np.stack([np.full((4, 8), level, dtype=np.uint8) for level in levels])
+
+    def test_frame_scores(self):
+        scores = frame_scores(self.frames(10, 10, 250, 250), None)
+        self.assertEqual(scores[0], 0.0)
+        self.assertEqual(scores[1], 0.0)
+        # Резкая смена яркости: разница пикселей 240/255 и полная смена гистограммы.
+        self.assertAlmostEqual(scores[2], 0.5 * 240 / 255 + 0.5)
+        self.assertEqual(scores[3], 0.0)
+
+    def test_frame_scores_continue_across_chunks(self):
+        frames = np.random.default_rng(0).integers(0, 256, (10, 4, 8), dtype=np.uint8)
+        whole = frame_scores(frames, None)
+        chunked = np.concatenate([frame_scores(frames[:4], None), frame_scores(frames[4:], frames[3])])
+        np.testing.assert_allclose(chunked, whole)
+
+    def test_iter_frames_keeps_partial_frames(self):
+        data = bytes(range(5)) * 8 * 3
+        chunks = [data[:50], data[50:70], data[70:]]
+        with mock.patch("logistic.service.ffmpeg.stream", return_value=iter(chunks)):
+            batches = list(scene_detect.iter_frames("video.mp4", 2, 4, 2))
+        self.assertEqual([len(batch) for batch in batches], [6, 2, 7])
+        self.assertEqual(np.concatenate(batches).tobytes(), data[:15 * 8])
+
+    def test_candidate_windows(self):
+        scores = np.zeros(60)
+        scores[[10, 12, 40]] = 1.0
+        # 2 отсчёта в секунду: пики на 5, 6 и 20 с, ±2 с вокруг каждого.
+        self.assertEqual(candidate_windows(scores, 2, 3.0, 0.5, 2, 0), [(3, 8, 1.0), (18, 22, 1.0)])
+        self.assertEqual(candidate_windows(scores, 2, 3.0, 0.5, 2, 10), [(3, 22, 1.0)])
+        self.assertEqual(candidate_windows(scores, 2, 3.0, 2.0, 2, 0), [])
+        self.assertEqual(candidate_windows(np.empty(0), 2, 3.0, 0.5, 2, 0), [])
+
+    def test_detect_scenes_saves_candidates_once(self):
+        video = create_video(file="videos/match.mp4")
+        with mock.patch("logistic.service.scene_detect.analyse", return_value=([(3, 8, 1.0)], {"frames": 60})) as analyse:
+            self.assertEqual(scene_detect.detect_scenes(video.pk), {"frames": 60})
+            self.assertIsNone(scene_detect.detect_scenes(video.pk))
+            with override_settings(SCENE_PAD_SECONDS=10):
+                scene_detect.detect_scenes(video.pk)
+        self.assertEqual(analyse.call_count, 2)
+        segments = CandidateSegment.objects.filter(video=video, source=AnalysisStage.SCENE)
+        self.assertEqual(list(segments.values_list("start_time", "end_time", "score")), [(3, 8, 1.0)])
+
+
+class AudioPeaksTests(TestCase):
+    def test_robust_z(self):
+        np.testing.assert_allclose(robust_z(np.array([1.0, 2.0, 3.0])), [-1 / 1.4826, 0, 1 / 1.4826])
+        np.testing.assert_array_equal(robust_z(np.ones(4)), np.zeros(4))
+
+    def test_envelopes_continue_across_chunks(self):
+        frames = np.random.default_rng(0).uniform(-1, 1, (10, 64)).astype(np.float32)
+        rms, flux, _ = frame_envelopes(frames, None)
+        first = frame_envelopes(frames[:4], None)
+        second = frame_envelopes(frames[4:], first[2])
+        np.testing.assert_allclose(np.concatenate([first[0], second[0]]), rms, rtol=1e-6)
+        np.testing.assert_allclose(np.concatenate([first[1], second[1]]), flux, rtol=1e-5)
+        self.assertEqual(flux[0], 0)
+
+    def test_loud_burst_is_a_candidate(self):
+        rng = np.random.default_rng(0)
+        # 60 с тихого шума по 4 кадра в секунду и громкий всплеск на 30-й секунде.
+        frames = rng.normal(0, 0.01, (240, 64)).astype(np.float32)
+        frames[120:124] = rng.normal(0, 0.8, (4, 64))
+        rms, flux, _ = frame_envelopes(frames, None)
+        scores = peak_scores(rms, flux, 4)
+        self.assertEqual(int(np.argmax(scores)) // 4, 30)
+        windows = candidate_windows(scores, 4, 4.0, 1.0, 5, 5)
+        self.assertEqual(len(windows), 1)
+        start, end, _ = windows[0]
+        self.assertTrue(start <= 30 <= end)
+
+    def test_iter_audio_frames_scales_samples(self):
+        samples = np.array([0, 16384, -32768, 32767, 0, 0], dtype="<i2").tobytes()
+        with mock.patch("logistic.service.ffmpeg.stream", return_value=iter([samples[:5], samples[5:]])):
+            frames = np.concatenate(list(audio_peaks.iter_audio_frames("video.mp4", 8000, 2)))
+        np.testing.assert_allclose(frames, [[0, 0.5], [-1, 32767 / 32768], [0, 0]])
+
+    @override_settings(AUDIO_HIGHLIGHT_MAX_CONFIDENCE=0.3)
+    def test_save_highlights_replaces_previous_peaks(self):
+        video = create_video()
+        audio_peaks.save_highlights(video, [(0, 10, 2.0)])
+        audio_peaks.save_highlights(video, [(5, 15, 4.0), (40, 50, 2.0)])
+        rows = Highlight.objects.filter(video=video, event_type=AUDIO_EVENT_TYPE).order_by("start_time")
+        self.assertEqual(list(rows.values_list("start_time", "end_time", "confidence")), [(5, 15, 0.3), (40, 50, 0.15)])
+
+
+class KeyframeIndexTests(SimpleTestCase):
+    index = KeyframeIndex(
+        pts=np.array([0.0, 2.0, 4.0, 6.0]),
+        pos=np.array([48, 1000, 2000, 3000]),
+        duration=7.5,
+        size=3500,
+    )
+
+    def test_range_covers_whole_gops(self):
+        self.assertEqual(self.index.range_for(2.5, 4.5), KeyframeRange(2.0, 6.0, 1000, 2999, 2))
+        # Границы на ключевых кадрах не захватывают соседние GOP.
+        self.assertEqual(self.index.range_for(2.0, 4.0), KeyframeRange(2.0, 4.0, 1000, 1999, 1))
+        self.assertEqual(self.index.range_for(3.0, 3.0), KeyframeRange(2.0, 4.0, 1000, 1999, 1))
+
+    def test_range_at_file_edges(self):
+        self.assertEqual(self.index.range_for(0, 1), KeyframeRange(0.0, 2.0, 48, 999, 1))
+        self.assertEqual(self.index.range_for(6.5, 100), KeyframeRange(6.0, 7.5, 3000, 3499, 1))
+        unsized = KeyframeIndex(pts=self.index.pts, pos=self.index.pos, duration=7.5, size=0)
+        self.assertEqual(unsized.range_for(6.5, 7), KeyframeRange(6.0, 7.5, 3000, None, 1))
+
+    def test_unknown_positions_give_no_bytes(self):
+        index = KeyframeIndex(pts=self.index.pts, pos=np.array([48, -1, 2000, -1]), duration=7.5, size=3500)
+        self.assertEqual(index.range_for(2.5, 3), KeyframeRange(2.0, 4.0, None, None, 1))
+        self.assertEqual(index.range_for(4.5, 5), KeyframeRange(4.0, 6.0, 2000, None, 1))
+
+    def test_scan_keyframes(self):
+        output = b"2.000000,1000,K_\n0.000000,48,K_\n1.000000,500,__\nN/A,700,K_\n4.000000,N/A,K_\n"
+        with mock.patch("logistic.service.ffmpeg.run", return_value=output), \
+                mock.patch("logistic.service.ffmpeg.probe", return_value={"format": {"duration": "5.0", "size": "4000"}}):
+            index = keyframes.scan_keyframes("video.mp4")
+        np.testing.assert_array_equal(index.pts, [0.0, 2.0, 4.0])
+        np.testing.assert_array_equal(index.pos, [48, 1000, -1])
+        self.assertEqual((index.duration, index.size), (5.0, 4000))
+
+    def test_dump_index_round_trip(self):
+        data = np.load(io.BytesIO(keyframes.dump_index(self.index)))
+        np.testing.assert_array_equal(data["pts"], self.index.pts)
+        np.testing.assert_array_equal(data["pos"], self.index.pos)
+        self.assertEqual(data["meta"].tolist(), [7.5, 3500])
+
+
+@override_settings(HLS_SEGMENT_SECONDS=6)
+class HlsTests(TestCase):
+    def probe(self, *codecs):
+        streams = [{"codec_type": kind, "codec_name": name} for kind, name in codecs]
+        return mock.patch("logistic.service.ffmpeg.probe", return_value={"streams": streams})
+
+    def test_manifest_name(self):
+        video = Video(pk=3, file="videos/match.mp4")
+        name = hls.manifest_name("videos", video)
+        self.assertRegex(name, r"^hls/videos/3_[0-9a-f]{12}_6s/index\.m3u8$")
+        with override_settings(HLS_SEGMENT_SECONDS=4):
+            self.assertNotEqual(hls.manifest_name("videos", video), name)
+
+    def test_can_stream_copy(self):
+        with self.probe(("video", "h264"), ("audio", "aac")):
+            self.assertTrue(hls.can_stream_copy("video.mp4"))
+        with self.probe(("video", "h264")):
+            self.assertTrue(hls.can_stream_copy("video.mp4"))
+        with self.probe(("video", "hevc"), ("audio", "aac")):
+            self.assertFalse(hls.can_stream_copy("video.mp4"))
+        with self.probe(("video", "h264"), ("audio", "opus")):
+            self.assertFalse(hls.can_stream_copy("video.mp4"))
+        with self.probe(("audio", "aac")):
+            self.assertFalse(hls.can_stream_copy("video.mp4"))
+
+    def package(self, *codecs):
+        def run(args, timeout=None):
+            directory = os.path.dirname(args[-1])
+            for filename in ("segment_00001.ts", "index.m3u8", "segment_00000.ts"):
+                open(os.path.join(directory, filename), "wb").close()
+
+        with self.probe(*codecs), \
+                mock.patch("logistic.service.ffmpeg.run", side_effect=run) as ffmpeg_run, \
+                mock.patch("logistic.service.ffmpeg.save_to_storage") as save:
+            name = hls.package("video.mp4", "hls/videos/1_abc_6s/index.m3u8", storage=None)
+        return name, ffmpeg_run.call_args.args[0], [c.args[1] for c in save.call_args_list]
+
+    def test_package_uploads_manifest_last(self):
+        name, args, saved = self.package(("video", "h264"))
+        self.assertEqual(name, "hls/videos/1_abc_6s/index.m3u8")
+        self.assertIn("copy", args)
+        self.assertEqual(args[args.index("-hls_time") + 1], "6")
+        self.assertEqual(saved[-1], name)
+        self.assertEqual(sorted(saved[:-1]), [
+            "hls/videos/1_abc_6s/segment_00000.ts", "hls/videos/1_abc_6s/segment_00001.ts",
+        ])
+
+    def test_package_transcodes_with_segment_keyframes(self):
+        _, args, _ = self.package(("video", "vp9"))
+        self.assertNotIn("copy", args)
+        self.assertIn("expr:gte(t,n_forced*6)", args)
+
+    def test_package_video_once(self):
+        video = create_video(file="videos/match.mp4")
+        with mock.patch("logistic.service.hls.package", side_effect=lambda source, manifest, storage: manifest) as package:
+            name = hls.package_video(video.pk)
+            self.assertIsNone(hls.package_video(video.pk))
+        package.assert_called_once()
+        video.refresh_from_db()
+        self.assertEqual(video.hls_manifest.name, name)
+        self.assertTrue(hls.is_current(video))
+
+
+class AnalyticsHistogramTests(SimpleTestCase):
+    def test_duration_bucket_and_error_class(self):
+        self.assertEqual(duration_bucket(None), DurationBucket.UNKNOWN)
+        self.assertEqual(duration_bucket(299), DurationBucket.SHORT)
+        self.assertEqual(duration_bucket(300), DurationBucket.MEDIUM)
+        self.assertEqual(duration_bucket(4 * 3600), DurationBucket.VERY_LONG)
+        self.assertEqual(error_class(""), "ml_reported")
+        self.assertEqual(error_class(REAPER_MESSAGE), "deadline")
+        self.assertEqual(error_class("Timeout: задача не завершилась за 60 сек"), "timeout")
+        self.assertEqual(error_class("503 Server Error: Service Unavailable"), "http_5xx")
+        self.assertEqual(error_class("что-то странное"), "other")
+
+    def test_percentiles_within_bucket_error(self):
+        values = np.arange(1, 1001, dtype=np.float64)
+        hist = histogram(values.tolist())
+        for q in PERCENTILES:
+            expected = np.percentile(values, q)
+            self.assertAlmostEqual(percentile(hist, q), expected, delta=expected * 0.06)
+        self.assertIsNone(percentile({}, 50))
+        self.assertEqual(histogram([]), {})
+
+    def test_histograms_add_up(self):
+        first, second = [0.05, 3, 40], [3.1, 900, 10 ** 7]
+        self.assertEqual(merge_histograms(histogram(first), histogram(second)), histogram(first + second))
+        # Значения за пределами корзин попадают в крайние.
+        self.assertEqual(percentile(histogram([0.01]), 50), 0.1)
+        self.assertEqual(percentile(histogram([10 ** 7]), 50), 7 * 24 * 3600)
+
+
+@override_settings(TASK_ROLLUP_LAG_SECONDS=60, TASK_ROLLUP_WINDOW_HOURS=1)
+class AnalyticsRollupTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now().replace(minute=30, second=0, microsecond=0)
+        self.short = create_video(duration=120)
+        self.long = create_video(duration=30 * 60)
+
+    def finished(self, video, finished_ago, wait, run, status=TaskStatus.SUCCESS, **fields):
+        finished_at = self.now - timedelta(seconds=finished_ago)
+        started_at = finished_at - timedelta(seconds=run) if run is not None else None
+        task = ConfigTask.create_batch([video], dispatch=False, status=status, **fields)[0]
+        ConfigTask.objects.filter(pk=task.pk).update(
+            created_at=(started_at or finished_at) - timedelta(seconds=wait),
+            started_at=started_at,
+            finished_at=finished_at,
+        )
+        return task
+
+    def test_incremental_rollups_and_summary(self):
+        self.finished(self.short, 3 * 3600, wait=10, run=100)
+        self.finished(self.short, 2 * 3600, wait=20, run=200, status=TaskStatus.FAILED, error_message=REAPER_MESSAGE)
+        self.finished(self.long, 3600, wait=30, run=None, status=TaskStatus.FAILED, error_message="Отброшено: ждало")
+        parent = self.finished(self.long, 3600, wait=0, run=50)
+        self.finished(self.long, 3600, wait=0, run=50, parent=parent, window_start=0, window_end=600)
+        # Завершилось в пределах задержки: попадёт в следующий запуск.
+        self.finished(self.short, 30, wait=5, run=5)
+
+        self.assertEqual(update_rollups(self.now), 4)
+        self.assertEqual(update_rollups(self.now), 0)
+        self.assertEqual(update_rollups(self.now + timedelta(minutes=5)), 1)
+
+        summary = summarize(self.now - timedelta(hours=4))
+        total = summary["total"]
+        self.assertEqual((total["finished"], total["failed"]), (5, 2))
+        self.assertEqual(total["failure_rate"], 0.4)
+        self.assertEqual(total["errors"], {"deadline": {"count": 1, "rate": 0.2}, "dropped": {"count": 1, "rate": 0.2}})
+        self.assertEqual((total["wait"]["count"], total["run"]["count"]), (5, 4))
+        self.assertAlmostEqual(total["wait"]["mean"], (10 + 20 + 30 + 0 + 5) / 5)
+        self.assertEqual(
+            [(g["duration_bucket"], g["finished"]) for g in summary["groups"]],
+            [(DurationBucket.LONG, 2), (DurationBucket.SHORT, 3)],
+        )
+        self.assertEqual(sum(h["finished"] for h in summary["throughput"]), 5)
+
+        slice_ = summarize(self.now - timedelta(hours=4), bucket=DurationBucket.SHORT)["total"]
+        self.assertEqual((slice_["finished"], slice_["failed"]), (3, 1))
+
+    def test_rebuild_matches_incremental(self):
+        self.finished(self.short, 3 * 3600, wait=10, run=100)
+        self.finished(self.long, 2 * 3600, wait=20, run=200)
+        update_rollups(self.now)
+        incremental = summarize(self.now - timedelta(hours=4))["total"]
+        with mock.patch("logistic.service.analytics.timezone.now", return_value=self.now):
+            self.assertEqual(rebuild_rollups(), 2)
+        self.assertEqual(summarize(self.now - timedelta(hours=4))["total"], incremental)
@@ -1,6 +1,12 @@
 from django.urls import path
 
-from logistic.views import ConfigTaskStatusView
+from logistic.views import (
+    ConfigTaskStatusView,
+    MLQueueStateView,
+    ProcessingRateView,
+    ReprocessProgressView,
+    TaskAnalyticsView,
+)
 
 urlpatterns = [
     path(
@@ -8,4 +14,24 @@ urlpatterns = [
         ConfigTaskStatusView.as_view(),
         name="config-task-status",
     ),
+    path(
+        "queue/",
+        MLQueueStateView.as_view(),
+        name="ml-queue-state",
+    ),
+    path(
+        "rates/",
+        ProcessingRateView.as_view(),
+        name="ml-processing-rates",
+    ),
+    path(
+        "analytics/",
+        TaskAnalyticsView.as_view(),
+        name="ml-task-analytics",
+    ),
+    path(
+        "reprocess/<str:task_id>/",
+        ReprocessProgressView.as_view(),
+        name="reprocess-progress",
+    ),
 ]
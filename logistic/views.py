@@ -1,20 +1,36 @@
+from datetime import timedelta
+
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from logistic.models import ConfigTask, TaskStatus
+from config import tracing
+from logistic.models import ConfigTask, DurationBucket, ProcessingRate, RateKind, TaskStatus
+from logistic.service.analytics import summarize
+from logistic.service.backpressure import get_queue_state
+from logistic.service.timeouts import get_rate, record_processing_time
+from logistic.tasks import reprocess_videos_task
+from main.models import video_status_cache_key
 
 
-class ConfigTaskStatusView(APIView):
+class ConfigTaskStatusView(AsyncAPIView):
 
     permission_classes = [permissions.AllowAny]
 
-    def patch(self, request, pk):
-        task = ConfigTask.objects.filter(pk=pk).first()
+    async def patch(self, request, pk):
+        task = await ConfigTask.objects.select_related("video").filter(pk=pk).afirst()
         if not task:
             return Response({"error": "Задание не найдено"}, status=404)
+        # Обратный вызов ML продолжает трассу, в которой создано задание.
+        with tracing.span("ml.callback status", parent=task.traceparent, task_id=task.pk):
+            return await self._update_status(request, task)
 
+    async def _update_status(self, request, task):
         valid_statuses = [c[0] for c in TaskStatus.choices]
         new_status = request.data.get("status")
         if not new_status or new_status not in valid_statuses:
@@ -26,12 +42,90 @@ class ConfigTaskStatusView(APIView):
         update_fields = ["status"]
         task.status = new_status
 
-        if new_status in (TaskStatus.SUCCESS, TaskStatus.FAILED):
+        finished = new_status in (TaskStatus.SUCCESS, TaskStatus.FAILED)
+        if finished:
             task.finished_at = timezone.now()
-            video = task.video
-            video.status = "processed"
             update_fields.append("finished_at")
-            video.save(update_fields=['status'])
-        task.save(update_fields=update_fields)
+            if not task.is_window:
+                video = task.video
+                video.status = "processed"
+                await video.asave(update_fields=['status'])
+                if getattr(settings, "VIDEO_STATUS_CACHE_SECONDS", 0):
+                    await cache.adelete(video_status_cache_key(video.pk))
+        await task.asave(update_fields=update_fields)
+        # Транзакции и постановка в очередь Celery остаются синхронными.
+        if new_status == TaskStatus.SUCCESS:
+            await sync_to_async(record_processing_time)(task)
+        if finished:
+            await sync_to_async(task.on_finished)()
 
         return Response({"id": task.pk, "status": task.status})
+
+
+class MLQueueStateView(APIView):
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        return Response(get_queue_state().as_dict())
+
+
+class ProcessingRateView(APIView):
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        learned = {r.kind: r for r in ProcessingRate.objects.all()}
+        rates = []
+        for kind, label in RateKind.choices:
+            rate = learned.get(kind)
+            rates.append({
+                "kind": kind,
+                "label": label,
+                "rate": get_rate(kind),
+                "samples": rate.samples if rate else 0,
+                "updated_at": rate.updated_at if rate else None,
+            })
+        return Response(rates)
+
+
+class TaskAnalyticsView(APIView):
+    """Ожидание и время обработки заданий ML (p50/p90/p99), поток и ошибки по сводкам."""
+
+    permission_classes = [permissions.AllowAny]
+    max_hours = 24 * 90
+
+    def get(self, request):
+        try:
+            hours = int(request.query_params.get("hours", 24))
+        except ValueError:
+            hours = 0
+        if not 1 <= hours <= self.max_hours:
+            return Response({"error": f"hours должен быть от 1 до {self.max_hours}"}, status=400)
+        kind = request.query_params.get("kind") or None
+        if kind and kind not in RateKind.values:
+            return Response({"error": f"Недопустимый kind. Допустимые: {RateKind.values}"}, status=400)
+        bucket = request.query_params.get("duration_bucket") or None
+        if bucket and bucket not in DurationBucket.values:
+            return Response(
+                {"error": f"Недопустимый duration_bucket. Допустимые: {DurationBucket.values}"},
+                status=400,
+            )
+        return Response(summarize(timezone.now() - timedelta(hours=hours), kind=kind, bucket=bucket))
+
+
+class ReprocessProgressView(APIView):
+    """Прогресс фоновой переобработки из бэкенда результатов Celery."""
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, task_id):
+        result = reprocess_videos_task.AsyncResult(task_id)
+        progress = {"id": task_id, "state": result.state}
+        if result.state == "PROGRESS" and isinstance(result.info, dict):
+            progress.update(result.info)
+        elif result.successful():
+            progress["done"] = result.result
+        elif result.failed():
+            progress["error"] = str(result.result)
+        return Response(progress)
@@ -3,8 +3,11 @@ import os
 from django.contrib import admin
 from django.contrib import messages
 from django.core.files.base import ContentFile
+from django.urls import reverse
+from django.utils.html import format_html
 
-from .models import Video, Highlight, HighlightFile
+from .models import Video, Highlight, HighlightFile, RequestProfile
+from .search import matching_ids
 from logistic.service.video_uploader import (
     VideoUploader,
     ResourceNotFoundError,
@@ -17,6 +20,33 @@ class VideoAdmin(admin.ModelAdmin):
     list_display = ("id", "title", "status", "created_at")
     search_fields = ("title", "source_url")
     list_filter = ("status", "created_at")
+    actions = ("reprocess", "reprocess_replace_highlights")
+
+    def _reprocess(self, request, queryset, replace_highlights):
+        from logistic.tasks import reprocess_videos_task
+
+        video_ids = list(queryset.values_list("pk", flat=True))
+        try:
+            result = reprocess_videos_task.delay(video_ids, replace_highlights=replace_highlights)
+        except Exception as e:
+            messages.error(request, f"Не удалось запустить переобработку: {e}")
+            return
+        messages.success(
+            request,
+            format_html(
+                'Переобработка {} видео запущена, <a href="{}">прогресс</a>',
+                len(video_ids),
+                reverse("reprocess-progress", args=[result.id]),
+            ),
+        )
+
+    @admin.action(description="Переобработать в ML")
+    def reprocess(self, request, queryset):
+        self._reprocess(request, queryset, replace_highlights=False)
+
+    @admin.action(description="Переобработать в ML с заменой хайлайтов")
+    def reprocess_replace_highlights(self, request, queryset):
+        self._reprocess(request, queryset, replace_highlights=True)
 
     def save_model(self, request, obj, form, change):
         source_url = form.cleaned_data.get("source_url")
@@ -30,6 +60,7 @@ class VideoAdmin(admin.ModelAdmin):
                     filename = os.path.basename(downloaded_path)
                     with open(downloaded_path, "rb") as f:
                         obj.file.save(filename, ContentFile(f.read()), save=False)
+                    obj.duration = uploader.duration
                 finally:
                     uploader.cleanup()
             except ResourceNotFoundError as e:
@@ -61,4 +92,38 @@ class HighlightAdmin(admin.ModelAdmin):
         "created_at",
     )
     list_filter = ("event_type", "created_at")
-    search_fields = ("description", "video__title")
+    search_fields = ("video__title",)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Описание ищется по полнотекстовому индексу вместо LIKE '%...%'.
+        by_title, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if not search_term:
+            return by_title, may_have_duplicates
+        by_description = queryset.filter(pk__in=matching_ids(search_term))
+        return by_title | by_description, may_have_duplicates
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "created_at",
+        "method",
+        "path",
+        "view",
+        "status_code",
+        "reason",
+        "duration_ms",
+        "query_count",
+        "query_time_ms",
+        "samples",
+        "profile_file",
+        "queries_file",
+    )
+    list_filter = ("reason", "view", "status_code", "created_at")
+    search_fields = ("path", "view")
+    date_hierarchy = "created_at"
+    readonly_fields = [f.name for f in RequestProfile._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
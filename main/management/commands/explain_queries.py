@@ -0,0 +1,151 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from main.models import HighlightFile, Video
+from main.views import HighlightSearchView, HighlightViewSet, VideoViewSet
+
+SQLITE_SCAN = re.compile(r"\bSCAN (?P<table>\w+)(?P<rest>.*)")
+POSTGRES_SCAN = re.compile(r"Seq Scan on (?P<table>\w+)")
+
+
+def _view_queryset(view_class, params, **attrs):
+    """Queryset представления для запроса GET с параметрами params."""
+    view = view_class(**attrs)
+    view.request = Request(APIRequestFactory().get("/", params))
+    view.format_kwarg = None
+    view.kwargs = {}
+    if view_class is HighlightViewSet:
+        # Список хайлайтов читается страницами: сортировка и limit задаются в get().
+        view.params = view.get_query_params()
+        return view.get_page_queryset(view.get_queryset())
+    return view.get_queryset()
+
+
+def view_queries(video_id):
+    """Запросы списков и фильтров main.views с примерными параметрами."""
+    highlight_params = {
+        "highlights: все": {},
+        "highlights: video_id": {"video_id": video_id},
+        "highlights: video_id + event_type": {"video_id": video_id, "event_type": "goal,shot"},
+        "highlights: video_id + интервал": {"video_id": video_id, "start": 600, "end": 900},
+        "highlights: video_id + min_confidence": {"video_id": video_id, "min_confidence": 0.8},
+        "highlights: video_id + top_k": {"video_id": video_id, "top_k": 5},
+        "highlights: event_type": {"event_type": "goal"},
+        "highlights: event_type + интервал": {"event_type": "goal", "start": 600, "end": 900},
+        "highlights: min_confidence": {"min_confidence": 0.95},
+        "highlights: top_k по каталогу": {"top_k": 3, "min_confidence": 0.5},
+        "highlights: ordering -confidence + limit": {"ordering": "-confidence", "limit": 100},
+    }
+    queries = {
+        name: _view_queryset(HighlightViewSet, params)
+        for name, params in highlight_params.items()
+    }
+    queries["search: q"] = _view_queryset(HighlightSearchView, {"q": "гол"})
+    queries["search: q + video_id"] = _view_queryset(HighlightSearchView, {"q": "гол", "video_id": video_id})
+    queries["videos: список"] = VideoViewSet.queryset.all()
+    queries["videos: по id"] = VideoViewSet.queryset.filter(pk=video_id)
+    queries["highlight files: zip"] = HighlightFile.objects.filter(video_id=video_id).order_by("created_at")
+    queries["highlight files: есть ли"] = HighlightFile.objects.filter(video_id=video_id)[:1]
+    return queries
+
+
+def explain(queryset) -> str:
+    """План запроса. Префикс EXPLAIN добавляется к готовому SQL: QuerySet.explain()
+    в SQLite ломается на запросах с фильтром по оконной функции (top_k)."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+        rows = cursor.fetchall()
+    if connection.vendor != "sqlite":
+        # PostgreSQL: строка плана уже с отступами.
+        return "\n".join(str(row[-1]) for row in rows)
+    # SQLite: (id, parent, notused, detail); вложенность передаётся отступом.
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return "\n".join(lines)
+
+
+def full_scans(plan: str, vendor: str, ignore=(), strict: bool = False, limited: bool = False):
+    """Таблицы, которые план читает целиком (без поиска по индексу).
+
+    Проход по всему индексу (SCAN ... USING INDEX) допустим только вне
+    подзапросов и при limited — у запроса есть LIMIT, а сортировка идёт по
+    индексу: тогда скан останавливается на первых строках. Внутри CO-ROUTINE и
+    MATERIALIZE (окна top_k, подзапросы) внешний LIMIT скан не прерывает.
+    В strict отмечается любой проход по всему индексу.
+    """
+    tables = []
+    subqueries = set()
+    # Отступы открытых узлов плана и признак «узел — подзапрос».
+    parents = []
+    full_sort = "USE TEMP B-TREE FOR ORDER BY" in plan
+    for line in plan.splitlines():
+        if vendor == "sqlite":
+            indent = len(line) - len(line.lstrip())
+            line = line.strip()
+            while parents and parents[-1][0] >= indent:
+                parents.pop()
+            is_subquery = line.startswith("CO-ROUTINE") or line.startswith("MATERIALIZE")
+            in_subquery = any(subquery for _, subquery in parents)
+            parents.append((indent, is_subquery))
+            if is_subquery:
+                subqueries.add(line.split()[-1])
+                continue
+            match = SQLITE_SCAN.search(line)
+            # Виртуальная таблица FTS и скан результата подзапроса — не скан таблицы.
+            if not match or "VIRTUAL TABLE" in line or match["table"] in subqueries:
+                continue
+            stops_early = limited and not full_sort and not in_subquery
+            if "USING" in match["rest"] and "INDEX" in match["rest"] and stops_early and not strict:
+                continue
+        elif vendor == "postgresql":
+            match = POSTGRES_SCAN.search(line)
+            if not match:
+                continue
+        else:
+            continue
+        if match["table"] not in ignore:
+            tables.append(match["table"] + (" (весь индекс)" if "USING" in line and "INDEX" in line else ""))
+    return tables
+
+
+class Command(BaseCommand):
+    help = "Выполняет EXPLAIN для запросов списков и фильтров main.views и отмечает полные сканы"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--video-id", type=int, help="Видео для запросов с video_id (по умолчанию первое)")
+        parser.add_argument("--ignore", nargs="+", default=[], help="Таблицы, скан которых допустим")
+        parser.add_argument("--strict", action="store_true", help="Отмечать и проход по всему индексу")
+        parser.add_argument("--verbose-plans", action="store_true", help="Печатать планы целиком")
+        parser.add_argument("--fail-on-scan", action="store_true", help="Код выхода 1 при полном скане")
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ("sqlite", "postgresql"):
+            self.stderr.write(f"Разбор планов для {vendor} не поддерживается, планы выводятся как есть")
+        video_id = options["video_id"] or Video.objects.values_list("id", flat=True).first() or 1
+
+        flagged = 0
+        for name, queryset in view_queries(video_id).items():
+            plan = explain(queryset)
+            limited = queryset.query.high_mark is not None
+            scans = full_scans(plan, vendor, options["ignore"], options["strict"], limited)
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"ПОЛНЫЙ СКАН  {name}: {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok           {name}"))
+            if options["verbose_plans"] or scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f"               {line}")
+
+        self.stdout.write(f"Запросов с полным сканом: {flagged}")
+        if flagged and options["fail_on_scan"]:
+            raise CommandError("Найдены запросы с полным сканом таблиц")
@@ -0,0 +1,176 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from logistic.models import ConfigTask, TaskStatus
+from main.models import Highlight, HighlightFile, Video, VideoStatus
+
+EVENT_TYPES = ("shot", "foul", "goal", "corner", "save", "card", "substitution", "offside")
+EVENT_WEIGHTS = (0.28, 0.2, 0.08, 0.14, 0.12, 0.08, 0.06, 0.04)
+DESCRIPTIONS = {
+    "shot": ("Удар по воротам с {n} метров", "Удар головой после подачи", "Дальний удар мимо ворот"),
+    "foul": ("Фол в центре поля", "Грубый подкат сзади", "Фол у штрафной"),
+    "goal": ("Гол после быстрой атаки", "Гол со стандарта", "Гол с пенальти на {n} минуте"),
+    "corner": ("Угловой, подача на ближнюю штангу", "Угловой розыгрыш"),
+    "save": ("Вратарь отражает удар в упор", "Сейв в прыжке"),
+    "card": ("Жёлтая карточка за срыв атаки", "Красная карточка"),
+    "substitution": ("Замена на {n} минуте",),
+    "offside": ("Гол отменён из-за офсайда", "Положение вне игры"),
+}
+TASK_STATUSES = (TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.PENDING, TaskStatus.RUNNING)
+TASK_WEIGHTS = (0.85, 0.1, 0.03, 0.02)
+PLACEHOLDER = "highlights/placeholder.mp4"
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """Отключает auto_now_add, чтобы сохранить сгенерированную историю."""
+    fields = [model._meta.get_field("created_at") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Генерирует синтетический каталог для проверки масштабирования (bulk-вставки)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--videos", type=int, default=1000, help="Число видео")
+        parser.add_argument("--highlights", type=int, default=40, help="Среднее число хайлайтов на видео")
+        parser.add_argument("--tasks", type=float, default=1.3, help="Среднее число заданий ML на видео")
+        parser.add_argument("--files", type=float, default=3, help="Среднее число вырезок на видео")
+        parser.add_argument("--days", type=int, default=180, help="Глубина истории в днях")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Видео в одной транзакции")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--unique-files",
+            action="store_true",
+            help="Отдельный крошечный объект в хранилище на каждую вырезку (медленнее)",
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        self.now = timezone.now()
+        if not options["unique_files"] and not default_storage.exists(PLACEHOLDER):
+            default_storage.save(PLACEHOLDER, ContentFile(b"\x00" * 16))
+
+        started = time.perf_counter()
+        totals = dict.fromkeys(("videos", "highlights", "tasks", "files"), 0)
+        remaining = options["videos"]
+        with explicit_created_at(Video, Highlight, HighlightFile, ConfigTask):
+            while remaining > 0:
+                size = min(options["batch_size"], remaining)
+                for key, count in self.generate_batch(rng, size, options).items():
+                    totals[key] += count
+                remaining -= size
+                elapsed = time.perf_counter() - started
+                rows = sum(totals.values())
+                self.stdout.write(f"Видео {totals['videos']}/{options['videos']}, строк {rows}, {rows / elapsed:.0f} строк/с")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано за {elapsed:.1f} с: " + ", ".join(f"{k} {v}" for k, v in totals.items())
+        ))
+
+    def generate_batch(self, rng, size, options):
+        days = options["days"]
+        # Длительность: логнормальное распределение с медианой ~40 минут.
+        durations = np.clip(rng.lognormal(np.log(40 * 60), 0.6, size), 60, 3 * 60 * 60).astype(int)
+        ages = rng.uniform(0, days * 86400, size)
+        video_created = [self.now - timedelta(seconds=float(a)) for a in ages]
+        task_counts = rng.poisson(options["tasks"], size)
+        # Хайлайты пропорциональны длительности, у необработанных видео их нет.
+        highlight_counts = rng.poisson(options["highlights"] * durations / durations.mean())
+        file_counts = rng.poisson(options["files"], size)
+        highlight_counts[task_counts == 0] = 0
+        file_counts[task_counts == 0] = 0
+
+        with transaction.atomic():
+            videos = Video.objects.bulk_create([
+                Video(
+                    title=f"Матч #{int(rng.integers(1, 10 ** 6))}",
+                    file=f"videos/synthetic_{int(rng.integers(1, 10 ** 12))}.mp4",
+                    duration=int(durations[i]),
+                    status=VideoStatus.PROCESSED if task_counts[i] else VideoStatus.NOT_PROCESSED,
+                    created_at=video_created[i],
+                )
+                for i in range(size)
+            ])
+            tasks = self.build_tasks(rng, videos, task_counts)
+            ConfigTask.objects.bulk_create(tasks, batch_size=1000)
+            highlights = self.build_highlights(rng, videos, highlight_counts)
+            Highlight.objects.bulk_create(highlights, batch_size=1000)
+            files = self.build_files(rng, videos, file_counts, options["unique_files"])
+            HighlightFile.objects.bulk_create(files, batch_size=1000)
+        return {"videos": len(videos), "highlights": len(highlights), "tasks": len(tasks), "files": len(files)}
+
+    def build_tasks(self, rng, videos, counts):
+        tasks = []
+        for video, count in zip(videos, counts):
+            created = video.created_at
+            for n in range(count):
+                created = created + timedelta(minutes=float(rng.exponential(60 * 24)) if n else 1)
+                status = TASK_STATUSES[rng.choice(len(TASK_STATUSES), p=TASK_WEIGHTS)]
+                started = created + timedelta(seconds=float(rng.exponential(30)))
+                finished = started + timedelta(seconds=float(video.duration / rng.uniform(0.5, 3)))
+                tasks.append(ConfigTask(
+                    video=video,
+                    status=status,
+                    promt="Найди все моменты с вратарём" if rng.random() < 0.05 else None,
+                    created_at=min(created, self.now),
+                    started_at=started if status != TaskStatus.PENDING else None,
+                    finished_at=finished if status in (TaskStatus.SUCCESS, TaskStatus.FAILED) else None,
+                    error_message="Timeout: задача не завершилась" if status == TaskStatus.FAILED else "",
+                ))
+        return tasks
+
+    def build_highlights(self, rng, videos, counts):
+        total = int(counts.sum())
+        if not total:
+            return []
+        types = rng.choice(len(EVENT_TYPES), size=total, p=EVENT_WEIGHTS)
+        lengths = np.clip(rng.gamma(2.0, 4.0, total), 2, 60).astype(int)
+        confidences = rng.beta(5, 2, total).round(3)
+        custom = rng.random(total) < 0.05
+        highlights = []
+        i = 0
+        for video, count in zip(videos, counts):
+            starts = rng.integers(0, max(video.duration - 60, 1), count)
+            for start in starts:
+                event_type = EVENT_TYPES[types[i]]
+                templates = DESCRIPTIONS[event_type]
+                highlights.append(Highlight(
+                    video=video,
+                    is_custom=bool(custom[i]),
+                    event_type=event_type,
+                    start_time=int(start),
+                    end_time=int(start + lengths[i]),
+                    confidence=float(confidences[i]),
+                    description=templates[i % len(templates)].format(n=int(start) // 60 + 1),
+                    created_at=video.created_at + timedelta(minutes=30),
+                ))
+                i += 1
+        return highlights
+
+    def build_files(self, rng, videos, counts, unique):
+        files = []
+        for video, count in zip(videos, counts):
+            for n in range(count):
+                name = PLACEHOLDER
+                if unique:
+                    name = default_storage.save(
+                        f"highlights/synthetic_{video.pk}_{n}.mp4", ContentFile(b"\x00" * 16),
+                    )
+                files.append(HighlightFile(video=video, file=name, created_at=video.created_at + timedelta(hours=1)))
+        return files
@@ -0,0 +1,209 @@
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from logistic.models import ConfigTask
+from logistic.service.backpressure import get_queue_state
+from logistic.service.pipeline import dispatch_media_tasks
+from logistic.service.video_uploader import VideoUploader
+from main.models import Video
+
+
+def _download(url):
+    """Скачивает видео и кладёт его в хранилище. Выполняется в потоке пула."""
+    uploader = VideoUploader(url, low_resolution=True)
+    try:
+        downloaded_path = uploader.upload()
+        size = os.path.getsize(downloaded_path)
+        name = Video._meta.get_field("file").generate_filename(
+            None, os.path.basename(downloaded_path)
+        )
+        with open(downloaded_path, "rb") as f:
+            name = default_storage.save(name, File(f))
+        return name, uploader.duration, size
+    finally:
+        uploader.cleanup()
+
+
+class Command(BaseCommand):
+    help = "Массовая загрузка видео по списку URL (файл или '-' для stdin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Файл со ссылками, по одной на строку, или '-'")
+        parser.add_argument("--workers", type=int, default=4, help="Параллельных загрузок")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Сколько видео сохранять и ставить в очередь ML за раз",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="Файл прогресса (по умолчанию <source>.checkpoint)",
+        )
+        parser.add_argument(
+            "--no-wait-queue",
+            action="store_true",
+            help="Не ждать освобождения очереди ML перед постановкой заданий",
+        )
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        checkpoint = options["checkpoint"]
+        if not checkpoint:
+            if source == "-":
+                raise CommandError("Для stdin укажите --checkpoint")
+            checkpoint = f"{source}.checkpoint"
+        self.batch_size = options["batch_size"]
+        self.wait_queue = not options["no_wait_queue"]
+
+        urls = self._read_urls(source)
+        done = self._read_checkpoint(checkpoint)
+        todo, skipped = self._deduplicate(urls, done)
+        self.stdout.write(
+            f"Ссылок: {len(urls)}, к загрузке: {len(todo)}, пропущено дубликатов: {skipped}"
+        )
+
+        self.failures = Counter()
+        self.ingested = 0
+        self.bytes = 0
+        self.pending = []
+        started = time.monotonic()
+        with open(checkpoint, "a", encoding="utf-8") as self.checkpoint:
+            self._run(todo, options["workers"])
+            self._flush()
+        elapsed = time.monotonic() - started
+
+        self._report(len(todo), skipped, elapsed)
+
+    def _read_urls(self, source):
+        stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+        try:
+            return [
+                line.strip() for line in stream
+                if line.strip() and not line.lstrip().startswith("#")
+            ]
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def _read_checkpoint(self, path):
+        done = set()
+        if not os.path.exists(path):
+            return done
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("status") == "ok":
+                    done.add(entry["url"])
+        return done
+
+    def _deduplicate(self, urls, done):
+        seen = set(done)
+        unique = []
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+                unique.append(url)
+
+        existing = set()
+        for i in range(0, len(unique), 500):
+            existing.update(
+                Video.objects.filter(source_url__in=unique[i:i + 500])
+                .values_list("source_url", flat=True)
+            )
+        todo = [url for url in unique if url not in existing]
+        return todo, len(urls) - len(todo)
+
+    def _run(self, urls, workers):
+        urls = iter(urls)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Ограничиваем число задач в пуле, чтобы не держать в памяти весь список.
+            in_flight = {}
+            for url in urls:
+                in_flight[pool.submit(_download, url)] = url
+                if len(in_flight) >= workers * 2:
+                    break
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._collect(in_flight.pop(future), future)
+                    url = next(urls, None)
+                    if url is not None:
+                        in_flight[pool.submit(_download, url)] = url
+
+    def _collect(self, url, future):
+        try:
+            name, duration, size = future.result()
+        except Exception as e:
+            reason = f"{e.__class__.__name__}: {e}"
+            self.failures[reason] += 1
+            self._checkpoint(url, "failed", reason)
+            self.stderr.write(f"Ошибка {url}: {reason}")
+            return
+        self.bytes += size
+        self.pending.append(
+            Video(
+                title=os.path.splitext(os.path.basename(name))[0],
+                file=name,
+                source_url=url,
+                duration=duration,
+            )
+        )
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        if self.wait_queue:
+            while get_queue_state().queue_saturated:
+                time.sleep(5)
+
+        # bulk_create не вызывает post_save, поэтому задания создаём сами одной пачкой.
+        with transaction.atomic():
+            videos = Video.objects.bulk_create(self.pending)
+            tasks = ConfigTask.create_batch(videos, dispatch=False)
+        for task in tasks:
+            task.dispatch()
+        for video in videos:
+            dispatch_media_tasks(video)
+
+        for video in videos:
+            self._checkpoint(video.source_url, "ok")
+        self.checkpoint.flush()
+        self.ingested += len(videos)
+        self.pending = []
+        self.stdout.write(f"Загружено: {self.ingested}")
+
+    def _checkpoint(self, url, status, reason=None):
+        entry = {"url": url, "status": status}
+        if reason:
+            entry["reason"] = reason
+        self.checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _report(self, total, skipped, elapsed):
+        failed = sum(self.failures.values())
+        elapsed = max(elapsed, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {elapsed:.1f} сек: загружено {self.ingested}, "
+            f"ошибок {failed}, пропущено {skipped}"
+        ))
+        self.stdout.write(
+            f"Пропускная способность: {total / elapsed:.2f} URL/сек, "
+            f"{self.bytes / elapsed / 1024 / 1024:.2f} МБ/сек"
+        )
+        for reason, count in self.failures.most_common():
+            self.stdout.write(f"  {count} × {reason}")
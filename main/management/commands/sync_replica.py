@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_sqlite(source: str, target: str) -> None:
+    """Копирует базу SQLite source в target (алиасы DATABASES) через backup API.
+
+    Читатели реплики не видят половину копии. Работает и с базами в памяти,
+    которые Django создаёт для тестов.
+    """
+    for alias in (source, target):
+        connections[alias].ensure_connection()
+    connections[source].connection.backup(connections[target].connection)
+
+
+class Command(BaseCommand):
+    help = "Копирует локальную базу SQLite в реплики из DATABASE_REPLICAS (config.settings_replica)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Повторять каждые N секунд: имитация отставания реплики",
+        )
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if not replicas:
+            raise CommandError("DATABASE_REPLICAS пуст: реплики не настроены")
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        for alias in replicas:
+            engines = {primary["ENGINE"], settings.DATABASES[alias]["ENGINE"]}
+            if engines != {"django.db.backends.sqlite3"}:
+                raise CommandError(f"{alias}: копируются только SQLite; реплики Postgres ведёт сервер")
+
+        while True:
+            started = time.perf_counter()
+            for alias in replicas:
+                copy_sqlite(DEFAULT_DB_ALIAS, alias)
+            self.stdout.write(f"Реплики {', '.join(replicas)} обновлены за {time.perf_counter() - started:.2f} с")
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
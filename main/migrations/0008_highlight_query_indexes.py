@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:27
+
+import main.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_increase_file_field_max_length'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='highlightfile',
+            name='file',
+            field=models.FileField(help_text='Файл вырезки', max_length=255, upload_to=main.models._highlights_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='file',
+            field=models.FileField(blank=True, help_text='Загружаемый файл', max_length=255, upload_to=main.models._videos_upload_to),
+        ),
+        migrations.AddIndex(
+            model_name='highlight',
+            index=models.Index(fields=['video', 'event_type', 'start_time'], name='highlight_video_type_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='highlight',
+            index=models.Index(fields=['video', 'confidence'], name='highlight_video_conf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='highlight',
+            index=models.Index(fields=['event_type', 'start_time'], name='highlight_type_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='highlight',
+            index=models.Index(fields=['confidence'], name='highlight_conf_idx'),
+        ),
+    ]
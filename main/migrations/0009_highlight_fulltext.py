@@ -0,0 +1,69 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS main_highlight_fts USING fts5(
+        description,
+        content='main_highlight',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_highlight_fts_ai AFTER INSERT ON main_highlight BEGIN
+        INSERT INTO main_highlight_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_highlight_fts_ad AFTER DELETE ON main_highlight BEGIN
+        INSERT INTO main_highlight_fts(main_highlight_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_highlight_fts_au AFTER UPDATE OF description ON main_highlight BEGIN
+        INSERT INTO main_highlight_fts(main_highlight_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO main_highlight_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    "INSERT INTO main_highlight_fts(main_highlight_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS main_highlight_fts_au",
+    "DROP TRIGGER IF EXISTS main_highlight_fts_ad",
+    "DROP TRIGGER IF EXISTS main_highlight_fts_ai",
+    "DROP TABLE IF EXISTS main_highlight_fts",
+]
+
+# Конфигурация 'simple' должна совпадать с main.search.POSTGRES_SEARCH_CONFIG.
+POSTGRES_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS highlight_description_fts_idx "
+    "ON main_highlight USING GIN (to_tsvector('simple', description))",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS highlight_description_fts_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0008_highlight_query_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_highlight_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='proxy_file',
+            field=models.FileField(blank=True, help_text='Облегчённая копия видео для ML', max_length=255, upload_to='proxies/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_video_proxy_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='keyframes_file',
+            field=models.FileField(blank=True, help_text='Индекс ключевых кадров (рядом с файлом видео)', max_length=255, upload_to='videos/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_video_keyframes_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='highlight',
+            name='thumbnail',
+            field=models.FileField(blank=True, help_text='Кадр-превью хайлайта', max_length=255, upload_to='thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='sprite_file',
+            field=models.FileField(blank=True, help_text='Спрайт-лист превью через равные интервалы', max_length=255, upload_to='sprites/'),
+        ),
+    ]
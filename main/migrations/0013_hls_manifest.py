@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_previews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='highlightfile',
+            name='hls_manifest',
+            field=models.FileField(blank=True, help_text='Плейлист HLS', max_length=255, upload_to='hls/'),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='hls_manifest',
+            field=models.FileField(blank=True, help_text='Плейлист HLS', max_length=255, upload_to='hls/'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_hls_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=8)),
+                ('path', models.CharField(max_length=255)),
+                ('view', models.CharField(blank=True, help_text='Представление DRF', max_length=128)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('reason', models.CharField(choices=[('header', 'Запрошен заголовком'), ('sampled', 'Случайная выборка'), ('slow', 'Медленный запрос')], help_text='Почему запрос профилирован', max_length=16)),
+                ('duration_ms', models.FloatField(help_text='Время обработки запроса, мс')),
+                ('samples', models.PositiveIntegerField(default=0, help_text='Снято стеков')),
+                ('query_count', models.PositiveIntegerField(default=0, help_text='SQL-запросов')),
+                ('query_time_ms', models.FloatField(default=0, help_text='Суммарное время SQL, мс')),
+                ('profile_file', models.FileField(blank=True, help_text='Стеки в свёрнутом формате (flamegraph.pl, speedscope)', max_length=255, upload_to='profiles/')),
+                ('queries_file', models.FileField(blank=True, help_text='Журнал SQL-запросов в JSON', max_length=255, upload_to='profiles/')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['view', 'created_at'], name='profile_view_created_idx')],
+            },
+        ),
+    ]
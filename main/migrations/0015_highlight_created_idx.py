@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_request_profile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='highlight',
+            index=models.Index(fields=['-created_at'], name='highlight_created_idx'),
+        ),
+    ]
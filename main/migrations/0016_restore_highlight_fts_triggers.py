@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# AddField в 0012_previews пересоздаёт main_highlight в SQLite, и триггеры FTS
+# из 0009_highlight_fulltext удаляются вместе со старой таблицей.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS main_highlight_fts USING fts5(
+        description,
+        content='main_highlight',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_highlight_fts_ai AFTER INSERT ON main_highlight BEGIN
+        INSERT INTO main_highlight_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_highlight_fts_ad AFTER DELETE ON main_highlight BEGIN
+        INSERT INTO main_highlight_fts(main_highlight_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_highlight_fts_au AFTER UPDATE OF description ON main_highlight BEGIN
+        INSERT INTO main_highlight_fts(main_highlight_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO main_highlight_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    # Строки, добавленные без триггеров, попадают в индекс.
+    "INSERT INTO main_highlight_fts(main_highlight_fts) VALUES ('rebuild')",
+]
+
+
+def restore_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in SQLITE_FORWARD:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    """Восстанавливает триггеры FTS, удалённые пересозданием таблицы в 0012."""
+
+    dependencies = [
+        ("main", "0015_highlight_created_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
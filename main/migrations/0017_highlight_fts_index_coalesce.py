@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# SearchVector оборачивает поле в COALESCE: индекс из 0009 по
+# to_tsvector('simple', description) планировщик с ним не сопоставляет.
+# Конфигурация 'simple' должна совпадать с main.search.POSTGRES_SEARCH_CONFIG.
+POSTGRES_FORWARD = [
+    "DROP INDEX IF EXISTS highlight_description_fts_idx",
+    "CREATE INDEX highlight_description_fts_idx ON main_highlight "
+    "USING GIN (to_tsvector('simple'::regconfig, COALESCE(description, '')))",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS highlight_description_fts_idx",
+    "CREATE INDEX highlight_description_fts_idx "
+    "ON main_highlight USING GIN (to_tsvector('simple', description))",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0016_restore_highlight_fts_triggers"),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(POSTGRES_FORWARD), _run(POSTGRES_BACKWARD)),
+    ]
@@ -36,6 +36,11 @@ def _highlights_upload_to(instance, filename: str) -> str:
     return f"{prefix}{base}{ext}"
 
 
+def video_status_cache_key(video_id) -> str:
+    """Ключ кэша статуса видео, который опрашивают клиенты (VideoStatusView)."""
+    return f"video-status:{video_id}"
+
+
 class VideoStatus(models.TextChoices):
     NOT_PROCESSED = "not_processed", "Не обработан"
     DOWNLOADING = "downloading", "Идёт загрузка"
@@ -72,6 +77,30 @@ class Video(models.Model):
         blank=True,
         help_text="Длительность видео в секундах",
     )
+    proxy_file = models.FileField(
+        upload_to="proxies/",
+        max_length=255,
+        blank=True,
+        help_text="Облегчённая копия видео для ML",
+    )
+    keyframes_file = models.FileField(
+        upload_to="videos/",
+        max_length=255,
+        blank=True,
+        help_text="Индекс ключевых кадров (рядом с файлом видео)",
+    )
+    sprite_file = models.FileField(
+        upload_to="sprites/",
+        max_length=255,
+        blank=True,
+        help_text="Спрайт-лист превью через равные интервалы",
+    )
+    hls_manifest = models.FileField(
+        upload_to="hls/",
+        max_length=255,
+        blank=True,
+        help_text="Плейлист HLS",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -95,12 +124,17 @@ class Video(models.Model):
 @receiver(post_save, sender=Video)
 def first_standart_task(sender, instance, created, **kwargs):
     if created:
+        from logistic.service.pipeline import dispatch_media_tasks
+
         instance.create_task()
+        dispatch_media_tasks(instance)
 
 
 
 
 class Highlight(models.Model):
+    # Полнотекстовый индекс описаний в SQLite держится триггерами (main.search):
+    # миграция, пересоздающая эту таблицу, должна восстановить их, как 0016.
     video = models.ForeignKey(
         Video,
         on_delete=models.CASCADE,
@@ -128,12 +162,27 @@ class Highlight(models.Model):
         blank=True,
         help_text="Краткое текстовое описание события",
     )
+    thumbnail = models.FileField(
+        upload_to="thumbnails/",
+        max_length=255,
+        blank=True,
+        help_text="Кадр-превью хайлайта",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Хайлайт"
         verbose_name_plural = "Хайлайты"
+        indexes = [
+            models.Index(fields=["video", "event_type", "start_time"], name="highlight_video_type_start_idx"),
+            models.Index(fields=["video", "confidence"], name="highlight_video_conf_idx"),
+            # Запросы по всему каталогу без video_id
+            models.Index(fields=["event_type", "start_time"], name="highlight_type_start_idx"),
+            models.Index(fields=["confidence"], name="highlight_conf_idx"),
+            # Список по каталогу без фильтров читает первые строки порядка по умолчанию.
+            models.Index(fields=["-created_at"], name="highlight_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.video} [{self.start_time}-{self.end_time}]"
@@ -153,6 +202,12 @@ class HighlightFile(models.Model):
         max_length=255,
         help_text="Файл вырезки",
     )
+    hls_manifest = models.FileField(
+        upload_to="hls/",
+        max_length=255,
+        blank=True,
+        help_text="Плейлист HLS",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -162,3 +217,51 @@ class HighlightFile(models.Model):
 
     def __str__(self) -> str:
         return f"{self.video} — {self.file.name}"
+
+
+class ProfileReason(models.TextChoices):
+    HEADER = "header", "Запрошен заголовком"
+    SAMPLED = "sampled", "Случайная выборка"
+    SLOW = "slow", "Медленный запрос"
+
+
+class RequestProfile(models.Model):
+    """Профиль HTTP-запроса: стеки сэмплирующего профилировщика и журнал SQL (config.profiling)."""
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=8)
+    path = models.CharField(max_length=255)
+    view = models.CharField(max_length=128, blank=True, help_text="Представление DRF")
+    status_code = models.PositiveSmallIntegerField()
+    reason = models.CharField(
+        max_length=16,
+        choices=ProfileReason.choices,
+        help_text="Почему запрос профилирован",
+    )
+    duration_ms = models.FloatField(help_text="Время обработки запроса, мс")
+    samples = models.PositiveIntegerField(default=0, help_text="Снято стеков")
+    query_count = models.PositiveIntegerField(default=0, help_text="SQL-запросов")
+    query_time_ms = models.FloatField(default=0, help_text="Суммарное время SQL, мс")
+    profile_file = models.FileField(
+        upload_to="profiles/",
+        max_length=255,
+        blank=True,
+        help_text="Стеки в свёрнутом формате (flamegraph.pl, speedscope)",
+    )
+    queries_file = models.FileField(
+        upload_to="profiles/",
+        max_length=255,
+        blank=True,
+        help_text="Журнал SQL-запросов в JSON",
+    )
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+        indexes = [
+            models.Index(fields=["view", "created_at"], name="profile_view_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.method} {self.path} {self.duration_ms:.0f} мс"
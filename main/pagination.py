@@ -0,0 +1,68 @@
+"""Keyset-пагинация списка хайлайтов.
+
+Курсор хранит поля сортировки и их значения у последней строки страницы.
+Следующая страница продолжается условием «строго после этих значений» по
+индексу, без OFFSET, и не сдвигается, если между запросами добавились
+хайлайты. Ссылка на неё отдаётся в заголовке Link (rel="next"), а тело
+ответа остаётся списком.
+"""
+import base64
+from functools import reduce
+from operator import or_
+
+import orjson
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+CURSOR_PARAM = "cursor"
+INVALID_CURSOR = "Некорректный курсор"
+
+
+def with_tiebreak(ordering):
+    """Дополняет сортировку полем id, чтобы порядок строк был полным."""
+    ordering = list(ordering)
+    if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+        ordering.append("-id" if ordering and ordering[-1].startswith("-") else "id")
+    return ordering
+
+
+def keyset_filter(ordering, values) -> Q:
+    """Условие «строка идёт после values» для полной сортировки ordering."""
+    names = [field.lstrip("-") for field in ordering]
+    conditions = []
+    for i, field in enumerate(ordering):
+        lookup = "lt" if field.startswith("-") else "gt"
+        # Первые i полей совпадают, i-е — строго дальше в порядке сортировки.
+        equal = dict(zip(names[:i], values[:i]))
+        conditions.append(Q(**equal, **{f"{names[i]}__{lookup}": values[i]}))
+    return reduce(or_, conditions)
+
+
+def encode_cursor(ordering, values) -> str:
+    payload = orjson.dumps({"o": list(ordering), "v": list(values)})
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor: str, ordering, model) -> list:
+    """Значения полей из курсора, приведённые к типам полей модели.
+
+    Курсор другой сортировки или повреждённый курсор — ошибка 400.
+    """
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if payload["o"] != list(ordering) or len(payload["v"]) != len(ordering):
+            raise ValueError(cursor)
+        return [
+            model._meta.get_field(field.lstrip("-")).to_python(value)
+            for field, value in zip(ordering, payload["v"])
+        ]
+    except (ValueError, TypeError, KeyError, DjangoValidationError):
+        raise ValidationError({CURSOR_PARAM: INVALID_CURSOR})
+
+
+def next_link(request, cursor: str) -> str:
+    """Значение заголовка Link со ссылкой на следующую страницу."""
+    url = replace_query_param(request.build_absolute_uri(), CURSOR_PARAM, cursor)
+    return f'<{url}>; rel="next"'
@@ -0,0 +1,72 @@
+"""Полнотекстовый поиск по Highlight.description.
+
+SQLite: внешняя таблица FTS5 main_highlight_fts, синхронизируется триггерами
+(в том числе при bulk_create). PostgreSQL: GIN-индекс по to_tsvector и
+django.contrib.postgres.search. В обоих слова ищутся по префиксу.
+Остальные СУБД: icontains без ранжирования.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from main.models import Highlight
+
+FTS_TABLE = "main_highlight_fts"
+# Должна совпадать с конфигурацией в индексе миграции 0017_highlight_fts_index_coalesce.
+POSTGRES_SEARCH_CONFIG = "simple"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Триггеры FTS5 (миграции 0009 и 0016), которые держат индекс в согласии с main_highlight.
+SQLITE_FTS_TRIGGERS = (f"{FTS_TABLE}_ai", f"{FTS_TABLE}_ad", f"{FTS_TABLE}_au")
+
+
+def _fts5_query(query: str) -> str:
+    """Пользовательский текст -> выражение FTS5: все слова, с поиском по префиксу."""
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+
+def _tsquery(query: str) -> str:
+    """Пользовательский текст -> to_tsquery: все слова с поиском по префиксу, как в FTS5."""
+    return " & ".join(f"{token}:*" for token in _TOKEN_RE.findall(query))
+
+
+def search_highlights(query: str, queryset=None):
+    """Хайлайты, описание которых совпадает с запросом, по убыванию релевантности."""
+    queryset = Highlight.objects.all() if queryset is None else queryset
+    if not _TOKEN_RE.search(query or ""):
+        return queryset.none()
+
+    if connection.vendor == "sqlite":
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = main_highlight.id", f"{FTS_TABLE} MATCH %s"],
+            params=[_fts5_query(query)],
+            # bm25 в FTS5 отрицателен: чем меньше, тем релевантнее.
+            select={"search_rank": f"-{FTS_TABLE}.rank"},
+        ).order_by("-search_rank", "-id")
+
+    if connection.vendor == "postgresql":
+        vector = SearchVector("description", config=POSTGRES_SEARCH_CONFIG)
+        search_query = SearchQuery(_tsquery(query), config=POSTGRES_SEARCH_CONFIG, search_type="raw")
+        return queryset.alias(search_vector=vector).filter(
+            search_vector=search_query,
+        ).annotate(
+            search_rank=SearchRank(vector, search_query),
+        ).order_by("-search_rank", "-id")
+
+    return queryset.filter(description__icontains=query).extra(
+        select={"search_rank": "0"},
+    ).order_by("-id")
+
+
+def matching_ids(query: str):
+    """Подзапрос id совпавших хайлайтов, чтобы комбинировать с другими фильтрами."""
+    if connection.vendor == "sqlite" and _TOKEN_RE.search(query or ""):
+        return RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [_fts5_query(query)],
+        )
+    return search_highlights(query).order_by().values("pk")
@@ -1,7 +1,10 @@
 # Serializers для основного приложения
 
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
+from logistic.service.previews import sprite_is_current, sprite_params
 from logistic.utils import get_public_media_url
 from main.models import Video, Highlight, HighlightFile
 
@@ -10,12 +13,23 @@ class VideoSerializer(serializers.ModelSerializer):
     highlights_count = serializers.SerializerMethodField()
 
     def get_highlights_count(self, instance):
+        # VideoViewSet аннотирует число хайлайтов: без запроса на каждую строку.
+        if hasattr(instance, "highlights_count"):
+            return instance.highlights_count
         return instance.highlights.count() if hasattr(instance, "highlights") else 0
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
         if instance.file and data.get("file"):
             data["file"] = get_public_media_url(instance.file.url)
+        data["hls"] = get_public_media_url(instance.hls_manifest.url) if instance.hls_manifest else None
+        data["sprite"] = None
+        if sprite_is_current(instance):
+            # Кадр i находится в ячейке (i % columns, i // columns) и показывает момент i * interval.
+            data["sprite"] = {
+                "url": get_public_media_url(instance.sprite_file.url),
+                **sprite_params(),
+            }
         return data
 
     class Meta:
@@ -31,9 +45,16 @@ class VideoSerializer(serializers.ModelSerializer):
             "created_at",
         ]
         read_only_fields = ["id", "created_at", "status", "duration", "highlights_count"]
+        # URL файла строится один раз в to_representation, а не ещё и полем DRF.
+        extra_kwargs = {"file": {"use_url": False}}
 
 
 class HighlightSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["thumbnail"] = get_public_media_url(instance.thumbnail.url) if instance.thumbnail else None
+        return data
+
     class Meta:
         model = Highlight
         fields = [
@@ -50,17 +71,116 @@ class HighlightSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at"]
 
 
+# Поля Highlight для values_list в highlight_list_data, в порядке HighlightSerializer.
+HIGHLIGHT_LIST_FIELDS = (
+    "id",
+    "video_id",
+    "event_type",
+    "start_time",
+    "end_time",
+    "confidence",
+    "description",
+    "created_at",
+    "is_custom",
+    "thumbnail",
+)
+
+
+def _datetime(value, tz):
+    """Дата и время как у DateTimeField DRF (ISO 8601, «Z» для UTC)."""
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def highlight_list_data(rows) -> list:
+    """То же, что HighlightSerializer(many=True).data, из кортежей values_list(*HIGHLIGHT_LIST_FIELDS).
+
+    Быстрый путь для больших списков только на чтение: без экземпляров модели
+    и обхода полей сериализатора на каждую строку.
+    """
+    tz = timezone.get_current_timezone()
+    storage = Highlight._meta.get_field("thumbnail").storage
+    return [
+        {
+            "id": pk,
+            "video": video_id,
+            "event_type": event_type,
+            "start_time": start_time,
+            "end_time": end_time,
+            "confidence": confidence,
+            "description": description,
+            "created_at": _datetime(created_at, tz),
+            "is_custom": is_custom,
+            "thumbnail": get_public_media_url(storage.url(thumbnail)) if thumbnail else None,
+        }
+        for (
+            pk, video_id, event_type, start_time, end_time,
+            confidence, description, created_at, is_custom, thumbnail,
+        ) in rows
+    ]
+
+
+class HighlightQuerySerializer(serializers.Serializer):
+    """Параметры выборки хайлайтов: тип, интервал, уверенность, top-k, страница."""
+
+    ORDERING_CHOICES = ("-created_at", "start_time", "-confidence")
+
+    video_id = serializers.IntegerField(required=False)
+    event_type = serializers.CharField(required=False)
+    start = serializers.IntegerField(required=False, min_value=0)
+    end = serializers.IntegerField(required=False, min_value=0)
+    min_confidence = serializers.FloatField(required=False)
+    top_k = serializers.IntegerField(required=False, min_value=1)
+    ordering = serializers.ChoiceField(choices=ORDERING_CHOICES, required=False)
+    limit = serializers.IntegerField(required=False, min_value=1)
+    cursor = serializers.CharField(required=False)
+    merged = serializers.BooleanField(required=False, default=False)
+
+    def validate_event_type(self, value):
+        return [v.strip() for v in value.split(",") if v.strip()]
+
+    def validate_top_k(self, value):
+        max_top_k = getattr(settings, "HIGHLIGHT_TOP_K_MAX", 100)
+        if value > max_top_k:
+            raise serializers.ValidationError(f"top_k не больше {max_top_k}")
+        return value
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"end": "end должен быть не меньше start"})
+        filters = ("video_id", "event_type", "start", "end", "min_confidence")
+        if attrs.get("top_k") and not any(attrs.get(name) not in (None, []) for name in filters):
+            # Ранжирование по всему каталогу без фильтра — полный проход по таблице:
+            # окно нумерует все строки раньше, чем срабатывает limit.
+            raise serializers.ValidationError({"top_k": "top_k по всему каталогу требует фильтра"})
+        return attrs
+
+
+class KeyframeRangeQuerySerializer(serializers.Serializer):
+    """Интервал в секундах, который нужно выровнять по ключевым кадрам."""
+
+    start = serializers.FloatField(required=False, min_value=0, default=0)
+    end = serializers.FloatField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        if "end" in attrs and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"end": "end должен быть не меньше start"})
+        return attrs
+
+
 class HighlightFileSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
         if instance.file and data.get("file"):
             data["file"] = get_public_media_url(instance.file.url)
+        data["hls"] = get_public_media_url(instance.hls_manifest.url) if instance.hls_manifest else None
         return data
 
     class Meta:
         model = HighlightFile
         fields = ["id", "video", "file", "created_at"]
         read_only_fields = ["id", "created_at"]
+        extra_kwargs = {"file": {"use_url": False}}
 
 
 class HighlightFileUploadSerializer(serializers.Serializer):
@@ -1,3 +1,660 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram
+from rest_framework.renderers import JSONRenderer
+
+from config import metrics, tracing
+from config.db_router import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from config.profiling import ProfilingMiddleware, Recording
+from config.renderers import FastJSONRenderer
+from logistic.models import ConfigTask, TaskStatus
+from logistic.service.audio_peaks import AUDIO_EVENT_TYPE
+from logistic.service.backpressure import get_queue_state
+from main.admin import HighlightAdmin
+from main.management.commands.explain_queries import full_scans
+from main.management.commands.sync_replica import copy_sqlite
+from main.models import Highlight, ProfileReason, RequestProfile, Video, VideoStatus
+from main.pagination import encode_cursor
+from main.search import SQLITE_FTS_TRIGGERS, _fts5_query, _tsquery, search_highlights
+from main.serializers import HIGHLIGHT_LIST_FIELDS, HighlightSerializer, highlight_list_data
+
+
+class HighlightSearchSyncTests(TestCase):
+    """Индекс полнотекстового поиска следует за вставкой, изменением и удалением хайлайтов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Задание, созданное сигналом при сохранении видео, не уходит в брокер.
+        with mock.patch("logistic.models.ConfigTask.dispatch"):
+            cls.video = Video.objects.create(title="Матч", duration=600)
+
+    def fields(self, description, start_time=0):
+        return {
+            "video": self.video,
+            "event_type": "goal",
+            "start_time": start_time,
+            "end_time": start_time + 10,
+            "confidence": 0.5,
+            "description": description,
+        }
+
+    def highlight(self, description, start_time=0):
+        return Highlight(**self.fields(description, start_time))
+
+    def found(self, query):
+        return set(search_highlights(query).values_list("pk", flat=True))
+
+    def admin_found(self, query):
+        model_admin = HighlightAdmin(Highlight, admin.site)
+        queryset, _ = model_admin.get_search_results(RequestFactory().get("/"), Highlight.objects.all(), query)
+        return set(queryset.values_list("pk", flat=True))
+
+    def test_triggers_exist_after_migrations(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("триггеры FTS есть только в SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            triggers = {row[0] for row in cursor.fetchall()}
+        self.assertLessEqual(set(SQLITE_FTS_TRIGGERS), triggers)
+
+    def test_insert_single_and_bulk(self):
+        single = Highlight.objects.create(**self.fields("Гол головой"))
+        bulk = Highlight.objects.bulk_create([
+            self.highlight("Гол со штрафного", start_time=20),
+            self.highlight("Удар мимо ворот", start_time=40),
+        ])
+        self.assertEqual(self.found("гол"), {single.pk, bulk[0].pk})
+        self.assertEqual(self.found("ворот"), {bulk[1].pk})
+        self.assertEqual(self.admin_found("гол"), {single.pk, bulk[0].pk})
+
+    def test_update_replaces_indexed_text(self):
+        highlight = Highlight.objects.bulk_create([self.highlight("Жёлтая карточка")])[0]
+        highlight.description = "Красная карточка"
+        highlight.save(update_fields=["description"])
+        Highlight.objects.filter(pk=highlight.pk).update(description="Удаление с поля")
+
+        self.assertEqual(self.found("карточка"), set())
+        self.assertEqual(self.found("удаление"), {highlight.pk})
+        self.assertEqual(self.admin_found("красная"), set())
+
+    def test_delete_removes_from_index(self):
+        kept, deleted, bulk_deleted = Highlight.objects.bulk_create([
+            self.highlight("Сейв вратаря"),
+            self.highlight("Сейв в прыжке", start_time=20),
+            self.highlight("Сейв ногой", start_time=40),
+        ])
+        deleted.delete()
+        Highlight.objects.filter(pk=bulk_deleted.pk).delete()
+
+        self.assertEqual(self.found("сейв"), {kept.pk})
+        self.assertEqual(self.admin_found("сейв"), {kept.pk})
+
+
+class SearchQueryTests(SimpleTestCase):
+    def test_prefix_search_is_the_same_on_both_backends(self):
+        query = "Гол  в-ворота!"
+        self.assertEqual(_fts5_query(query), '"Гол"* "в"* "ворота"*')
+        self.assertEqual(_tsquery(query), "Гол:* & в:* & ворота:*")
+        self.assertEqual(_tsquery("!!!"), "")
+
+
+class ReplaceHighlightsTests(TestCase):
+    """Переобработка с заменой не трогает пики звука этапа подготовки."""
+
+    def test_audio_peaks_survive_replacement(self):
+        with mock.patch("logistic.models.ConfigTask.dispatch"):
+            video = Video.objects.create(title="Матч", duration=600)
+            task = ConfigTask.objects.create(video=video, replace_highlights=True)
+        old, peak = Highlight.objects.bulk_create([
+            Highlight(video=video, event_type="goal", start_time=0, end_time=10, confidence=0.9),
+            Highlight(video=video, event_type=AUDIO_EVENT_TYPE, start_time=30, end_time=40, confidence=0.3),
+        ])
+        Highlight.objects.filter(pk__in=[old.pk, peak.pk]).update(created_at=task.created_at - timedelta(minutes=1))
+
+        response = self.client.post(
+            "/api/highlights/bulk/",
+            [{"task_id": task.pk, "event_type": "goal", "time_start": 60, "time_duration": 10, "confidence": 0.8}],
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        remaining = set(Highlight.objects.filter(video=video).values_list("event_type", "start_time"))
+        self.assertEqual(remaining, {("goal", 60), (AUDIO_EVENT_TYPE, 30)})
+
+
+def create_video(**fields):
+    # Задание, созданное сигналом при сохранении видео, не уходит в брокер.
+    with mock.patch("logistic.models.ConfigTask.dispatch"):
+        return Video.objects.create(**{"title": "Матч", "duration": 600, **fields})
+
+
+@override_settings(ML_QUEUE_HIGH_WATERMARK=2, ML_RETRY_AFTER_SECONDS=30)
+class MLCapacityTests(TestCase):
+    """Загрузка видео отвечает 429 с Retry-After, пока очередь ML переполнена."""
+
+    def test_upload_throttled_when_queue_is_full(self):
+        # Каждое видео ставит стандартное задание: два задания в очереди.
+        create_video()
+        create_video()
+
+        response = self.client.post("/api/video/", {"title": "Ещё матч"})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(Video.objects.count(), 2)
+
+    def test_upload_accepted_below_watermark(self):
+        create_video()
+        with mock.patch("logistic.models.ConfigTask.dispatch"):
+            response = self.client.post("/api/video/", {"title": "Ещё матч"})
+        self.assertEqual(response.status_code, 201)
+
+    def test_pending_windows_do_not_count(self):
+        video = create_video(duration=1500)
+        parent = ConfigTask.objects.get(video=video)
+        ConfigTask.objects.filter(pk=parent.pk).update(status=TaskStatus.RUNNING, is_split=True)
+        ConfigTask.objects.bulk_create([
+            ConfigTask(video=video, parent=parent, window_start=start, window_end=start + 600)
+            for start in (0, 570, 1140)
+        ])
+        self.assertEqual(get_queue_state().pending, 0)
+        with mock.patch("logistic.models.ConfigTask.dispatch"):
+            response = self.client.post("/api/video/", {"title": "Ещё матч"})
+        self.assertEqual(response.status_code, 201)
+
+
+@override_settings(HIGHLIGHT_QUERY_MAX_LIMIT=1000, HIGHLIGHT_TOP_K_MAX=100)
+class HighlightListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = create_video()
+        cls.second = create_video()
+        rows = [
+            (cls.first, "goal", 0, 10, 0.9),
+            (cls.first, "goal", 100, 110, 0.5),
+            (cls.first, "foul", 200, 210, 0.7),
+            (cls.first, "shot", 300, 310, 0.2),
+            (cls.second, "goal", 0, 10, 0.8),
+            (cls.second, "shot", 50, 60, 0.6),
+        ]
+        cls.highlights = Highlight.objects.bulk_create([
+            Highlight(video=video, event_type=event_type, start_time=start, end_time=end, confidence=confidence)
+            for video, event_type, start, end, confidence in rows
+        ])
+
+    def get(self, **params):
+        response = self.client.get("/api/highlights/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, **params):
+        return [item["id"] for item in self.get(**params)]
+
+    def pks(self, *indexes):
+        return [self.highlights[i].pk for i in indexes]
+
+    def test_filters(self):
+        self.assertEqual(set(self.ids(video_id=self.first.pk)), set(self.pks(0, 1, 2, 3)))
+        self.assertEqual(set(self.ids(event_type="goal, foul", video_id=self.first.pk)), set(self.pks(0, 1, 2)))
+        # Пересечение с интервалом: [105, 205] задевает 100–110 и 200–210.
+        self.assertEqual(set(self.ids(video_id=self.first.pk, start=105, end=205)), set(self.pks(1, 2)))
+        self.assertEqual(set(self.ids(min_confidence=0.7)), set(self.pks(0, 2, 4)))
+        # Имена параметров без учёта регистра.
+        self.assertEqual(set(self.ids(VIDEO_ID=self.second.pk)), set(self.pks(4, 5)))
+
+    def test_ordering_and_limit(self):
+        self.assertEqual(self.ids(video_id=self.first.pk, ordering="-confidence"), self.pks(0, 2, 1, 3))
+        self.assertEqual(self.ids(ordering="-confidence", limit=2), self.pks(0, 4))
+        with override_settings(HIGHLIGHT_QUERY_MAX_LIMIT=3):
+            self.assertEqual(len(self.ids()), 3)
+            self.assertEqual(len(self.ids(limit=5)), 3)
+
+    def test_top_k_per_video(self):
+        self.assertEqual(self.ids(top_k=2, min_confidence=0), self.pks(0, 2, 4, 5))
+        self.assertEqual(self.ids(top_k=1, video_id=self.first.pk), self.pks(0))
+        self.assertEqual(self.ids(top_k=2, min_confidence=0, ordering="start_time"), self.pks(0, 4, 5, 2))
+        self.assertEqual(len(self.ids(top_k=2, min_confidence=0, limit=3)), 3)
+
+    def test_top_k_validation(self):
+        for params in ({"top_k": 2}, {"top_k": 2, "limit": 10}):
+            response = self.client.get("/api/highlights/", params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("top_k", response.json())
+        response = self.client.get("/api/highlights/", {"top_k": 101, "video_id": self.first.pk})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/highlights/", {"start": 20, "end": 10})
+        self.assertEqual(response.status_code, 400)
+
+    def pages(self, **params):
+        """Все страницы по ссылкам из заголовка Link."""
+        pages = []
+        response = self.client.get("/api/highlights/", params)
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            pages.append(response.json())
+            if "Link" not in response.headers:
+                return pages
+            url = re.fullmatch(r'<(.+)>; rel="next"', response.headers["Link"]).group(1)
+            response = self.client.get(url)
+
+    def test_cursor_pages_cover_the_list_once(self):
+        for params in ({}, {"ordering": "-confidence"}, {"ordering": "start_time"}, {"top_k": 2, "min_confidence": 0}):
+            expected = self.ids(**params)
+            pages = self.pages(limit=2, **params)
+            self.assertEqual([len(page) for page in pages], [2] * (len(expected) // 2) + ([1] if len(expected) % 2 else []))
+            self.assertEqual([item["id"] for page in pages for item in page], expected, params)
+
+    def test_cursor_survives_new_rows(self):
+        first_page = self.client.get("/api/highlights/", {"ordering": "-confidence", "limit": 3})
+        Highlight.objects.create(video=self.first, event_type="goal", start_time=0, end_time=5, confidence=0.95)
+        url = re.fullmatch(r'<(.+)>; rel="next"', first_page.headers["Link"]).group(1)
+        self.assertEqual([item["id"] for item in self.client.get(url).json()], self.pks(5, 1, 3))
+
+    def test_invalid_cursor(self):
+        cursor = encode_cursor(["-created_at", "-id"], ["2026-01-01T00:00:00+00:00", 1])
+        for value in ("garbage", cursor):
+            response = self.client.get("/api/highlights/", {"cursor": value, "ordering": "start_time"})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("cursor", response.json())
+
+    def test_merged_pages_keep_videos_whole(self):
+        Highlight.objects.create(video=self.first, event_type="goal", start_time=5, end_time=20, confidence=0.3)
+        merged = self.get(merged="true")
+        pages = self.pages(merged="true", limit=3)
+        # Пять отрезков первого видео больше страницы: оно отдаётся целиком.
+        self.assertEqual([{item["video"] for item in page} for page in pages], [{self.first.pk}, {self.second.pk}])
+        self.assertEqual([item for page in pages for item in page], merged)
+        goal = next(item for item in merged if item["video"] == self.first.pk and item["start_time"] == 0)
+        self.assertEqual(goal["end_time"], 20)
+        self.assertEqual(len(goal["highlight_ids"]), 2)
+
+    def test_list_data_matches_serializer(self):
+        Highlight.objects.filter(pk=self.highlights[0].pk).update(
+            thumbnail="thumbnails/1.jpg", description="Гол", is_custom=True,
+        )
+        queryset = Highlight.objects.order_by("pk")
+        expected = HighlightSerializer(queryset, many=True).data
+        actual = highlight_list_data(queryset.values_list(*HIGHLIGHT_LIST_FIELDS))
+        self.assertEqual(json.loads(FastJSONRenderer().render(actual)), json.loads(JSONRenderer().render(expected)))
+        self.assertEqual(actual[0]["thumbnail"], expected[0]["thumbnail"])
+        self.assertIsNotNone(actual[0]["thumbnail"])
+
+
+@override_settings(DATABASE_REPLICAS=["replica_a", "replica_b"])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Решения маршрутизатора внутри ReplicaRoutingMiddleware."""
+
+    router = PrimaryReplicaRouter()
+
+    def route(self, request, during=None):
+        seen = []
+
+        def view(request):
+            seen.append({self.router.db_for_read(Video) for _ in range(10)})
+            if during:
+                during()
+                seen.append({self.router.db_for_read(Video)})
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_request_reads_one_replica(self):
+        seen, response = self.route(RequestFactory().get("/"))
+        self.assertEqual(len(seen[0]), 1)
+        self.assertLessEqual(seen[0], {"replica_a", "replica_b"})
+        self.assertNotIn("db_pin", response.cookies)
+
+    def test_write_switches_to_primary_and_pins(self):
+        seen, response = self.route(RequestFactory().get("/"), during=lambda: self.router.db_for_write(Video))
+        self.assertEqual(seen[1], {"default"})
+        self.assertIn("db_pin", response.cookies)
+        self.assertEqual(response.cookies["db_pin"]["max-age"], 5)
+
+    def test_unsafe_and_pinned_requests_read_primary(self):
+        seen, _ = self.route(RequestFactory().post("/"))
+        self.assertEqual(seen[0], {"default"})
+        request = RequestFactory().get("/")
+        request.COOKIES["db_pin"] = str(time.time() + 5)
+        seen, _ = self.route(request)
+        self.assertEqual(seen[0], {"default"})
+        request.COOKIES["db_pin"] = str(time.time() - 1)
+        seen, _ = self.route(request)
+        self.assertNotEqual(seen[0], {"default"})
+
+    def test_outside_requests_and_transactions_read_primary(self):
+        self.assertEqual(self.router.db_for_read(Video), "default")
+        with mock.patch.object(connections["default"], "in_atomic_block", True):
+            seen, _ = self.route(RequestFactory().get("/"))
+        self.assertEqual(seen[0], {"default"})
+
+
+@skipUnless("replica" in settings.DATABASES, "нужна вторая база: --settings=config.settings_replica")
+@override_settings(
+    DATABASE_REPLICAS=["replica"],
+    VIDEO_STATUS_CACHE_SECONDS=0,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class ReplicaPinningTests(TransactionTestCase):
+    """Две базы SQLite: реплика отстаёт, закреплённая сессия читает основную."""
+
+    # Без второй базы класс пропускается, но набор баз тест-раннер читает всё равно.
+    databases = {"default", "replica"} & set(settings.DATABASES)
+
+    def test_session_reads_own_writes(self):
+        video = create_video(status=VideoStatus.PROCESSING)
+        task = ConfigTask.create_batch([video], dispatch=False, status=TaskStatus.RUNNING)[0]
+        copy_sqlite("default", "replica")
+        fresh = create_video()
+        status_url = f"/api/video/{video.pk}/status/"
+
+        # Реплика не знает о видео, созданном после копирования.
+        self.assertEqual(self.client.get(f"/api/video/{fresh.pk}/status/").status_code, 404)
+
+        response = self.client.patch(
+            f"/api/logistic/tasks/{task.pk}/status/", {"status": "success"}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("db_pin", response.cookies)
+
+        # Эта сессия видит свою запись, другая пока читает отставшую реплику.
+        self.assertEqual(self.client.get(status_url).json()["status"], VideoStatus.PROCESSED)
+        self.assertEqual(self.client_class().get(status_url).json()["status"], VideoStatus.PROCESSING)
+
+        copy_sqlite("default", "replica")
+        self.assertEqual(self.client_class().get(status_url).json()["status"], VideoStatus.PROCESSED)
+
+
+class FullScansTests(SimpleTestCase):
+    TOP_K_PLAN = "\n".join([
+        "SEARCH main_highlight USING INTEGER PRIMARY KEY (rowid=?)",
+        "LIST SUBQUERY 3",
+        "  CO-ROUTINE qualify",
+        "    CO-ROUTINE (subquery-5)",
+        "      SCAN U0 USING COVERING INDEX highlight_video_conf_idx",
+        "    SCAN (subquery-5)",
+        "  SCAN qualify",
+        "USE TEMP B-TREE FOR ORDER BY",
+    ])
+
+    def test_index_scan_inside_subquery_is_flagged(self):
+        self.assertEqual(full_scans(self.TOP_K_PLAN, "sqlite", limited=True), ["U0 (весь индекс)"])
+        searched = self.TOP_K_PLAN.replace("highlight_video_conf_idx", "highlight_video_conf_idx (video_id=?)")
+        self.assertEqual(full_scans(searched.replace("SCAN U0", "SEARCH U0"), "sqlite", limited=True), [])
+
+    def test_index_scan_needs_limit_and_index_order(self):
+        plan = "SCAN main_highlight USING INDEX highlight_conf_idx"
+        self.assertEqual(full_scans(plan, "sqlite", limited=True), [])
+        self.assertEqual(full_scans(plan, "sqlite"), ["main_highlight (весь индекс)"])
+        self.assertEqual(full_scans(plan, "sqlite", limited=True, strict=True), ["main_highlight (весь индекс)"])
+        sorted_plan = plan + "\nUSE TEMP B-TREE FOR ORDER BY"
+        self.assertEqual(full_scans(sorted_plan, "sqlite", limited=True), ["main_highlight (весь индекс)"])
+        partial_sort = plan + "\nUSE TEMP B-TREE FOR RIGHT PART OF ORDER BY"
+        self.assertEqual(full_scans(partial_sort, "sqlite", limited=True), [])
+
+    def test_table_scans(self):
+        plan = "SCAN main_video\nSCAN main_highlight_fts VIRTUAL TABLE INDEX 0:M1"
+        self.assertEqual(full_scans(plan, "sqlite", limited=True), ["main_video"])
+        self.assertEqual(full_scans(plan, "sqlite", ignore=["main_video"]), [])
+        self.assertEqual(full_scans("Seq Scan on main_video  (cost=0.00..1.01 rows=1)", "postgresql"), ["main_video"])
+
+
+class IngestUrlsTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = os.path.join(tmp.name, "urls.txt")
+        self.checkpoint = f"{self.source}.checkpoint"
+
+    def ingest(self, *urls):
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write("\n".join(urls) + "\n")
+
+        def download(url):
+            if "broken" in url:
+                raise ValueError("не видео")
+            return f"videos/{url.rsplit('/', 1)[-1]}.mp4", 90, 1024
+
+        with mock.patch("main.management.commands.ingest_urls._download", side_effect=download), \
+                mock.patch("logistic.models.ConfigTask.dispatch") as dispatch, \
+                mock.patch("main.management.commands.ingest_urls.dispatch_media_tasks"):
+            call_command("ingest_urls", self.source, "--batch-size", "2", "--no-wait-queue", stdout=io.StringIO(), stderr=io.StringIO())
+        return dispatch.call_count
+
+    def checkpoint_entries(self):
+        with open(self.checkpoint, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_ingest_deduplicates_and_checkpoints(self):
+        create_video(source_url="https://example.com/old")
+        dispatched = self.ingest(
+            "# комментарий", "https://example.com/a", "https://example.com/a",
+            "https://example.com/old", "https://example.com/b", "https://example.com/c", "https://example.com/broken",
+        )
+
+        videos = Video.objects.exclude(source_url="https://example.com/old")
+        self.assertEqual(sorted(videos.values_list("source_url", flat=True)), [
+            "https://example.com/a", "https://example.com/b", "https://example.com/c",
+        ])
+        self.assertEqual(videos.get(source_url="https://example.com/a").file.name, "videos/a.mp4")
+        self.assertEqual(ConfigTask.objects.filter(video__in=videos).count(), 3)
+        self.assertEqual(dispatched, 3)
+        entries = self.checkpoint_entries()
+        self.assertEqual(sorted(e["url"] for e in entries if e["status"] == "ok"), [
+            "https://example.com/a", "https://example.com/b", "https://example.com/c",
+        ])
+        self.assertEqual([e["reason"] for e in entries if e["status"] == "failed"], ["ValueError: не видео"])
+
+    def test_rerun_skips_done_urls(self):
+        self.ingest("https://example.com/a", "https://example.com/broken")
+        self.assertEqual(self.ingest("https://example.com/a", "https://example.com/broken", "https://example.com/b"), 1)
+        self.assertEqual(Video.objects.count(), 2)
+        self.assertEqual([e["status"] for e in self.checkpoint_entries()], ["failed", "ok", "failed", "ok"])
+
+
+class MetricsTests(TestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_timed_counts_errors_by_type(self):
+        registry = CollectorRegistry()
+        histogram = Histogram("test_op_seconds", "", ["operation"], registry=registry)
+        errors = Counter("test_op_errors", "", ["operation", "error"], registry=registry)
+        with metrics.timed(histogram, errors, operation="save"):
+            pass
+        with self.assertRaises(KeyError), metrics.timed(histogram, errors, operation="save"):
+            raise KeyError("x")
+        self.assertEqual(registry.get_sample_value("test_op_seconds_count", {"operation": "save"}), 2)
+        self.assertEqual(registry.get_sample_value("test_op_errors_total", {"operation": "save", "error": "KeyError"}), 1)
+
+    def test_nested_counters_count_each_query(self):
+        with metrics.counting_queries() as outer:
+            Video.objects.count()
+            with metrics.counting_queries() as inner:
+                Video.objects.count()
+        self.assertEqual((outer.count, inner.count), (2, 1))
+
+    def test_middleware_observes_view_latency_and_queries(self):
+        labels = {"view": "HighlightViewSet", "method": "GET", "status": "2xx"}
+        before = self.sample("http_request_duration_seconds_count", **labels)
+        queries_before = self.sample("http_request_db_queries_sum", view="HighlightViewSet")
+        self.assertEqual(self.client.get("/api/highlights/").status_code, 200)
+        self.assertEqual(self.sample("http_request_duration_seconds_count", **labels), before + 1)
+        self.assertGreaterEqual(self.sample("http_request_db_queries_sum", view="HighlightViewSet"), queries_before + 1)
+
+    def test_view_name(self):
+        request = RequestFactory().get("/api/highlights/")
+        self.assertEqual(metrics.view_name(request), "unmatched")
+        request.resolver_match = resolve("/api/highlights/")
+        self.assertEqual(metrics.view_name(request), "HighlightViewSet")
+
+    def test_task_wait_counts_from_eta(self):
+        task = mock.Mock()
+        task.name = "test.wait"
+        now = time.time()
+        task.request.get.return_value = now - 100
+        task.request.eta = datetime.fromtimestamp(now - 40, tz=dt_timezone.utc).isoformat()
+        before = self.sample("celery_task_wait_seconds_sum", task="test.wait")
+        runs = self.sample("celery_task_run_seconds_count", task="test.wait", state="SUCCESS")
+        metrics._task_prerun(task_id="t1", task=task)
+        metrics._task_postrun(task_id="t1", task=task, state="SUCCESS")
+        self.assertAlmostEqual(self.sample("celery_task_wait_seconds_sum", task="test.wait") - before, 40, delta=1)
+        self.assertEqual(self.sample("celery_task_run_seconds_count", task="test.wait", state="SUCCESS"), runs + 1)
+
+    def test_cache_hits_and_misses(self):
+        class InstrumentedLocMemCache(metrics.CacheMetricsMixin, LocMemCache):
+            pass
+
+        cache = InstrumentedLocMemCache("metrics-test", {})
+        cache.set("key", None)
+        self.assertIsNone(cache.get("key", "default"))
+        self.assertEqual(cache.get("missing", "default"), "default")
+        self.assertEqual(self.sample("cache_requests_total", cache="InstrumentedLocMemCache", result="hit"), 1)
+        self.assertEqual(self.sample("cache_requests_total", cache="InstrumentedLocMemCache", result="miss"), 1)
+
+
+@override_settings(TRACING_ENABLED=True)
+class TracingTests(TestCase):
+    def setUp(self):
+        export = mock.patch("config.tracing.export")
+        self.exported = export.start().call_args_list
+        self.addCleanup(export.stop)
+
+    def spans(self):
+        return {c.args[0].name: c.args[0] for c in self.exported}
+
+    def test_parse_traceparent(self):
+        trace_id, span_id = "a" * 32, "b" * 16
+        self.assertEqual(tracing.parse_traceparent(f" 00-{trace_id.upper()}-{span_id}-01 "), (trace_id, span_id))
+        for value in (None, "", "01-" + trace_id + "-" + span_id + "-01", f"00-{trace_id}-{span_id[:-1]}-01"):
+            self.assertIsNone(tracing.parse_traceparent(value))
+
+    def test_nested_spans_share_the_trace(self):
+        with tracing.span("outer") as outer:
+            with tracing.span("inner") as inner:
+                self.assertEqual(tracing.current_traceparent(), inner.traceparent)
+        self.assertEqual(tracing.current_traceparent(), "")
+        self.assertEqual(inner.trace_id, outer.trace_id)
+        self.assertEqual(inner.parent_id, outer.span_id)
+        self.assertIsNone(outer.parent_id)
+        self.assertEqual(list(self.spans()), ["inner", "outer"])
+
+    def test_remote_parent_and_errors(self):
+        remote = f"00-{'c' * 32}-{'d' * 16}-01"
+        with self.assertRaises(ValueError), tracing.span("outer") as outer:
+            with tracing.span("callback", parent=remote) as callback:
+                raise ValueError("сбой")
+        self.assertEqual((callback.trace_id, callback.parent_id), ("c" * 32, "d" * 16))
+        # Текущая трасса другая: она сохраняется ссылкой.
+        self.assertEqual(callback.attributes["link"], outer.traceparent)
+        self.assertEqual((callback.status, callback.attributes["error"]), ("error", "ValueError: сбой"))
+        self.assertEqual(outer.status, "error")
+
+    def test_context_travels_through_celery_headers_and_tasks(self):
+        with tracing.span("http") as http:
+            headers = {}
+            tracing._before_task_publish(headers=headers)
+            with mock.patch("logistic.models.ConfigTask.dispatch"):
+                video = Video.objects.create(title="Матч", duration=600)
+        self.assertEqual(headers["traceparent"], http.traceparent)
+        self.assertEqual(ConfigTask.objects.get(video=video).traceparent, http.traceparent)
+
+        task = mock.Mock()
+        task.name = "logistic.tasks.run_ml_task"
+        task.request.get.side_effect = lambda key, default=None: headers.get(key, default)
+        tracing._task_prerun(task_id="t1", task=task)
+        tracing._task_postrun(task_id="t1", state="SUCCESS")
+        worker = self.spans()["celery logistic.tasks.run_ml_task"]
+        self.assertEqual((worker.trace_id, worker.parent_id), (http.trace_id, http.span_id))
+        self.assertEqual(worker.attributes["state"], "SUCCESS")
+
+    def test_middleware_continues_client_trace(self):
+        client_parent = f"00-{'e' * 32}-{'f' * 16}-01"
+        seen = []
+        middleware = tracing.TracingMiddleware(lambda request: seen.append(tracing.current_traceparent()) or HttpResponse())
+        response = middleware(RequestFactory().get("/api/highlights/", HTTP_TRACEPARENT=client_parent))
+        self.assertEqual(response["traceparent"], seen[0])
+        self.assertEqual(tracing.parse_traceparent(response["traceparent"])[0], "e" * 32)
+        self.assertEqual(self.spans()["http unmatched"].parent_id, "f" * 16)
+
+
+@override_settings(PROFILER_ENABLED=True, PROFILER_TOKEN="secret", PROFILER_SAMPLE_RATE=0.0, PROFILER_SLOW_MS=None, PROFILER_INTERVAL_MS=1)
+class ProfilerTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        storage = FileSystemStorage(tmp.name)
+        for name in ("profile_file", "queries_file"):
+            patcher = mock.patch.object(RequestProfile._meta.get_field(name), "storage", storage)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def view(request):
+        Video.objects.count()
+        # Несколько интервалов семплера, чтобы в профиль попали стеки.
+        time.sleep(0.05)
+        return HttpResponse()
+
+    def request(self, **headers):
+        return ProfilingMiddleware(self.view)(RequestFactory().get("/api/video/", headers=headers))
+
+    def test_header_token_saves_profile(self):
+        response = self.request(**{"X-Profile": "secret"})
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual((profile.reason, profile.method, profile.path), (ProfileReason.HEADER, "GET", "/api/video/"))
+        self.assertEqual(profile.query_count, 1)
+        self.assertGreater(profile.samples, 0)
+        with profile.profile_file.open("rb") as f:
+            self.assertIn(b"view (main/tests.py:", f.read())
+        with profile.queries_file.open("rb") as f:
+            self.assertIn("main_video", json.loads(f.read())[0]["sql"])
+
+    def test_unselected_requests_are_not_profiled(self):
+        self.assertNotIn("X-Profile-Id", self.request(**{"X-Profile": "wrong"}))
+        self.assertNotIn("X-Profile-Id", self.request())
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_sampled_and_slow_requests(self):
+        with override_settings(PROFILER_SAMPLE_RATE=0.5), mock.patch("config.profiling.random.random", return_value=0.1):
+            sampled = self.request()
+        with override_settings(PROFILER_SLOW_MS=10):
+            slow = self.request()
+        reasons = [RequestProfile.objects.get(pk=r["X-Profile-Id"]).reason for r in (sampled, slow)]
+        self.assertEqual(reasons, [ProfileReason.SAMPLED, ProfileReason.SLOW])
+
+    def test_async_requests_log_queries_from_threads(self):
+        async def view(request):
+            await Video.objects.acount()
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(view)
+        request = RequestFactory().get("/api/video/", headers={"X-Profile": "secret"})
+        response = async_to_sync(middleware)(request)
+        self.assertEqual(RequestProfile.objects.get(pk=response["X-Profile-Id"]).query_count, 1)
+
+    def test_recording_caps_query_log(self):
+        recording = Recording(max_queries=1)
+        for _ in range(3):
+            recording.log_query(lambda *args: None, "SELECT 1", None, False, {})
+        self.assertEqual((recording.query_count, len(recording.queries)), (3, 1))
+        code = self.view.__code__
+        recording.stacks[(code, code)] += 2
+        self.assertRegex(recording.folded(), r"^view \(main/tests\.py:\d+\);view \(main/tests\.py:\d+\) 2\n$")
@@ -10,11 +10,14 @@ from drf_spectacular.views import (
 )
 from rest_framework.routers import DefaultRouter
 
+from config.metrics import metrics_view
+
 from .views import (
     health_check,
     VideoViewSet,
     VideoStatusView,
     HighlightViewSet,
+    HighlightSearchView,
     HighlightBulkCreateView,
     HighlightFileUploadView,
     HighlightFileZipView,
@@ -28,6 +31,7 @@ urlpatterns = [
     
     # Health check
     path("api/health/", health_check, name="health-check"),
+    path("metrics", metrics_view, name="metrics"),
     
     # API документация
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -46,6 +50,11 @@ urlpatterns = [
         HighlightViewSet.as_view(),
         name="highlights",
     ),
+    path(
+        "api/highlights/search/",
+        HighlightSearchView.as_view(),
+        name="highlight-search",
+    ),
     path(
         "api/highlights/bulk/",
         HighlightBulkCreateView.as_view(),
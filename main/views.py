@@ -2,26 +2,49 @@ import io
 import os
 import zipfile
 
+from adrf.decorators import api_view as async_api_view
+from adrf.generics import ListAPIView as AsyncListAPIView, aget_object_or_404
+from adrf.views import APIView as AsyncAPIView
+from django.core.cache import cache
 from django.core.files.storage import default_storage
-from django.db.models import Count
-from django.http import HttpResponse
+from django.db import transaction
+from django.conf import settings
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404, HttpResponse
 from django.core.files.base import ContentFile
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions, serializers
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import viewsets
 
+from config import tracing
 from logistic.models import ConfigTask
-from main.models import Video, Highlight, HighlightFile
+from logistic.service.audio_peaks import AUDIO_EVENT_TYPE
+from logistic.service.backpressure import ensure_ml_capacity
+from logistic.service.highlight_merge import merge_items
+from logistic.service.keyframes import load_index
+from logistic.service.pipeline import dispatch_media_tasks
+from logistic.service.windows import owns
+from logistic.tasks import package_highlight_file_task
+from logistic.utils import get_public_media_url
+from main.models import Video, Highlight, HighlightFile, video_status_cache_key
+from main.pagination import decode_cursor, encode_cursor, keyset_filter, next_link, with_tiebreak
+from main.search import search_highlights
 from main.serializers import (
     VideoSerializer,
     HighlightSerializer,
     HighlightBulkCreateItemSerializer,
     HighlightFileSerializer,
     HighlightFileUploadSerializer,
+    HighlightQuerySerializer,
+    KeyframeRangeQuerySerializer,
+    HIGHLIGHT_LIST_FIELDS,
+    highlight_list_data,
 )
 from logistic.service.video_uploader import (
     VideoUploader,
@@ -30,26 +53,173 @@ from logistic.service.video_uploader import (
 )
 
 
-@api_view(["GET"])
-def health_check(request):
+@async_api_view(["GET"])
+async def health_check(request):
     return Response({"status": "ok", "message": "API работает корректно"})
 
 
-class HighlightViewSet(ListAPIView):
+class HighlightViewSet(AsyncListAPIView):
+    """Хайлайты одного видео или всего каталога.
+
+    Фильтры: event_type (через запятую), пересечение с интервалом [start, end],
+    min_confidence, top_k лучших по уверенности на каждое видео.
+    merged=true возвращает слитые пересекающиеся отрезки одного типа.
+    Страница не длиннее limit (по умолчанию и максимум — HIGHLIGHT_QUERY_MAX_LIMIT),
+    ссылка на следующую отдаётся в заголовке Link.
+    """
+
     queryset = Highlight.objects.all()
     serializer_class = HighlightSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_query_params(self):
+        # Имена параметров принимаются без учёта регистра (videoId, VIDEO_ID).
+        params = {k.lower(): v for k, v in self.request.query_params.items()}
+        serializer = HighlightQuerySerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def get_page_size(self):
+        max_limit = getattr(settings, "HIGHLIGHT_QUERY_MAX_LIMIT", 1000)
+        return min(self.params.get("limit") or max_limit, max_limit)
+
+    def get_ordering(self):
+        if self.params.get("ordering"):
+            ordering = [self.params["ordering"]]
+        elif self.params.get("top_k"):
+            ordering = ["video_id", "-confidence"]
+        else:
+            ordering = Highlight._meta.ordering
+        return with_tiebreak(ordering)
+
     def get_queryset(self):
         queryset = super().get_queryset()
-        video_id = next(
-            (self.request.query_params[k] for k in self.request.query_params if k.lower() == "video_id"),
-            None,
-        )
+        params = self.params
+
+        video_id = params.get("video_id")
         if video_id is not None:
-            queryset = queryset.filter(video__id=video_id)
+            queryset = queryset.filter(video_id=video_id)
+        event_types = params.get("event_type")
+        if event_types:
+            queryset = queryset.filter(event_type__in=event_types)
+        # Пересечение [start_time, end_time] с [start, end]
+        if "end" in params:
+            queryset = queryset.filter(start_time__lte=params["end"])
+        if "start" in params:
+            queryset = queryset.filter(end_time__gte=params["start"])
+        if "min_confidence" in params:
+            queryset = queryset.filter(confidence__gte=params["min_confidence"])
+
+        top_k = params.get("top_k")
+        if top_k:
+            ranked = queryset.annotate(
+                confidence_rank=Window(
+                    RowNumber(),
+                    partition_by=F("video_id"),
+                    order_by=[F("confidence").desc(), F("id").desc()],
+                )
+            ).filter(confidence_rank__lte=top_k)
+            # Условие курсора не должно попасть внутрь ранжирования:
+            # страница выбирается уже из отобранных строк.
+            queryset = Highlight.objects.filter(pk__in=ranked.values("pk"))
         return queryset
 
+    def get_page_queryset(self, queryset):
+        """Строки страницы: после курсора, в полной сортировке, limit + 1 строка
+        (лишняя показывает, что есть следующая страница)."""
+        ordering = self.get_ordering()
+        if self.params.get("cursor"):
+            queryset = queryset.filter(keyset_filter(ordering, decode_cursor(self.params["cursor"], ordering, Highlight)))
+        return queryset.order_by(*ordering)[:self.get_page_size() + 1]
+
+    async def get(self, request, *args, **kwargs):
+        # Параметры проверяются один раз; запрос строится синхронно
+        # (без обращения к БД), выполняется асинхронно.
+        self.params = self.get_query_params()
+        queryset = self.get_queryset()
+        if self.params.get("merged"):
+            return await self.get_merged(queryset)
+
+        # Список только на чтение: кортежи values_list вместо моделей и ModelSerializer.
+        rows = [row async for row in self.get_page_queryset(queryset).values_list(*HIGHLIGHT_LIST_FIELDS)]
+        page_size = self.get_page_size()
+        headers = {}
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            ordering = self.get_ordering()
+            positions = [HIGHLIGHT_LIST_FIELDS.index(field.lstrip("-")) for field in ordering]
+            cursor = encode_cursor(ordering, [rows[-1][i] for i in positions])
+            headers["Link"] = next_link(request, cursor)
+        return Response(highlight_list_data(rows), headers=headers)
+
+    async def get_merged(self, queryset):
+        """Слитое представление: пересекающиеся отрезки одного типа по видео,
+        в том числе из стандартной обработки и собственных промтов.
+
+        Сливаются все отрезки видео сразу, поэтому страница содержит видео
+        целиком: видео, не поместившееся в limit, переходит на следующую.
+        """
+        ordering = ["video_id"]
+        if self.params.get("cursor"):
+            queryset = queryset.filter(keyset_filter(ordering, decode_cursor(self.params["cursor"], ordering, Highlight)))
+        queryset = queryset.order_by("video_id", "event_type", "start_time", "id")
+        page_size = self.get_page_size()
+        rows = [row async for row in queryset.values("id", *HIGHLIGHT_ROW_FIELDS)[:page_size + 1]]
+        headers = {}
+        if len(rows) > page_size:
+            last_video_id = rows[-1]["video_id"]
+            complete = [row for row in rows if row["video_id"] != last_video_id]
+            if complete:
+                rows = complete
+            else:
+                # Одно видео длиннее страницы: отдаём его целиком, иначе отрезки разорвутся.
+                rows = [row async for row in queryset.filter(video_id=last_video_id).values("id", *HIGHLIGHT_ROW_FIELDS)]
+            if complete or await queryset.filter(video_id__gt=last_video_id).aexists():
+                headers["Link"] = next_link(self.request, encode_cursor(ordering, [rows[-1]["video_id"]]))
+
+        merged = merge_items(
+            rows,
+            ("video_id", "event_type"),
+            gap=getattr(settings, "HIGHLIGHT_MERGE_GAP_SECONDS", 0),
+        )
+        return Response([
+            {
+                "video": item["video_id"],
+                "event_type": item["event_type"],
+                "start_time": item["start_time"],
+                "end_time": item["end_time"],
+                "confidence": item["confidence"],
+                "description": item["description"],
+                "is_custom": all(rows[m]["is_custom"] for m in item["members"]),
+                "highlight_ids": [rows[m]["id"] for m in item["members"]],
+            }
+            for item in merged
+        ], headers=headers)
+
+
+class HighlightSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class HighlightSearchView(ListAPIView):
+    """Полнотекстовый поиск по описаниям хайлайтов, по убыванию релевантности."""
+
+    serializer_class = HighlightSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = HighlightSearchPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get("q", "").strip()
+        if not query:
+            raise serializers.ValidationError({"q": "Параметр q обязателен"})
+        queryset = Highlight.objects.all()
+        video_id = self.request.query_params.get("video_id")
+        if video_id:
+            queryset = queryset.filter(video_id=video_id)
+        return search_highlights(query, queryset)
+
 
 class HighlightFileZipView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -102,14 +272,17 @@ class HighlightFileUploadView(APIView):
         video = task.video
 
         created = []
-        for path in paths:
-            if not path or not default_storage.exists(path):
-                continue
-            filename = os.path.basename(path)
-            with default_storage.open(path, "rb") as f:
-                content = ContentFile(f.read(), name=filename)
-                hf = HighlightFile.objects.create(video=video, file=content)
-                created.append(hf)
+        with tracing.span("ml.callback highlight_files", parent=task.traceparent, task_id=task.pk):
+            for path in paths:
+                if not path or not default_storage.exists(path):
+                    continue
+                filename = os.path.basename(path)
+                with default_storage.open(path, "rb") as f:
+                    content = ContentFile(f.read(), name=filename)
+                    hf = HighlightFile.objects.create(video=video, file=content)
+                    created.append(hf)
+                if getattr(settings, "HLS_HIGHLIGHT_FILES_ENABLED", False):
+                    package_highlight_file_task.delay(hf.pk)
 
         return Response(
             HighlightFileSerializer(created, many=True).data,
@@ -117,6 +290,17 @@ class HighlightFileUploadView(APIView):
         )
 
 
+HIGHLIGHT_ROW_FIELDS = (
+    "video_id",
+    "is_custom",
+    "event_type",
+    "start_time",
+    "end_time",
+    "description",
+    "confidence",
+)
+
+
 class HighlightBulkCreateView(APIView):
 
     permission_classes = [permissions.AllowAny]
@@ -130,26 +314,61 @@ class HighlightBulkCreateView(APIView):
             )
         serializer = HighlightBulkCreateItemSerializer(data=data, many=True)
         serializer.is_valid(raise_exception=True)
-        highlights = []
-        for item in serializer.validated_data:
-            task_id_int = int(item["task_id"])
-            task = get_object_or_404(ConfigTask, pk=task_id_int)
-            video = task.video
-            highlight = Highlight.objects.create(
-                video=video,
-                is_custom=bool(task.promt),
-                event_type=item["event_type"],
-                start_time=item["time_start"],
-                end_time=item["time_start"] + item["time_duration"],
-                description=item.get("description", "") or "",
-                confidence=item["confidence"],
-            )
-            highlights.append(highlight)
+        items = serializer.validated_data
+        task_ids = {int(item["task_id"]) for item in items}
+        tasks = ConfigTask.objects.select_related("video", "parent").in_bulk(task_ids)
+        if len(tasks) != len(task_ids):
+            raise Http404("Задание не найдено")
+        # Обратный вызов ML продолжает трассу задания (обычно оно в ответе одно).
+        parent = tasks[min(task_ids)].traceparent if task_ids else None
+        with tracing.span("ml.callback highlights", parent=parent, task_ids=sorted(task_ids)):
+            highlights = self._create(items, tasks)
         return Response(
             HighlightSerializer(highlights, many=True).data,
             status=201,
         )
 
+    def _create(self, items, tasks):
+        rows = []
+        for item in items:
+            task = tasks[int(item["task_id"])]
+            # Время хайлайтов окна приходит относительно начала окна.
+            start_time = item["time_start"] + (task.window_start or 0)
+            end_time = start_time + item["time_duration"]
+            if task.is_window and not owns(task, start_time, end_time):
+                continue
+            rows.append({
+                "video_id": task.video_id,
+                "is_custom": bool(task.promt),
+                "event_type": item["event_type"],
+                "start_time": start_time,
+                "end_time": end_time,
+                "description": item.get("description", "") or "",
+                "confidence": item["confidence"],
+            })
+        if getattr(settings, "HIGHLIGHT_MERGE_ON_INGEST", True):
+            # Пересекающиеся отрезки одного типа из одного ответа ML сохраняем одной строкой.
+            rows = merge_items(
+                rows,
+                ("video_id", "is_custom", "event_type"),
+                gap=getattr(settings, "HIGHLIGHT_MERGE_GAP_SECONDS", 0),
+            )
+
+        with transaction.atomic():
+            for task in tasks.values():
+                if task.replace_highlights:
+                    # Прежние результаты удаляются в той же транзакции, что и вставка новых.
+                    # Пики звука — результат этапа подготовки, их заменяет сам этап.
+                    Highlight.objects.filter(
+                        video_id=task.video_id,
+                        is_custom=False,
+                        created_at__lt=(task.parent or task).created_at,
+                    ).exclude(event_type=AUDIO_EVENT_TYPE).delete()
+            return Highlight.objects.bulk_create([
+                Highlight(**{field: row[field] for field in HIGHLIGHT_ROW_FIELDS})
+                for row in rows
+            ])
+
 
 class VideoViewSet(viewsets.ModelViewSet):
     queryset = Video.objects.annotate(highlights_count=Count("highlights"))
@@ -162,19 +381,20 @@ class VideoViewSet(viewsets.ModelViewSet):
             downloaded_path = uploader.upload()
             filename = os.path.basename(downloaded_path)
             with open(downloaded_path, "rb") as f:
-                return ContentFile(f.read(), name=filename)
+                return ContentFile(f.read(), name=filename), uploader.duration
         finally:
             uploader.cleanup()
 
     def perform_create(self, serializer):
+        ensure_ml_capacity()
         validated_data = serializer.validated_data
         source_url = validated_data.get("source_url")
         file_from_request = validated_data.get("file")
 
         if source_url and not file_from_request:
             try:
-                file_obj = self._download_video_from_url(source_url)
-                instance = serializer.save(file=file_obj)
+                file_obj, duration = self._download_video_from_url(source_url)
+                instance = serializer.save(file=file_obj, duration=duration)
             except ResourceNotFoundError as e:
                 raise serializers.ValidationError({"source_url": str(e)}) from e
             except NotAVideoError as e:
@@ -190,12 +410,13 @@ class VideoViewSet(viewsets.ModelViewSet):
 
         if source_url and not file_from_request and not instance.file:
             try:
-                file_obj = self._download_video_from_url(source_url)
-                instance = serializer.save(file=file_obj)
+                file_obj, duration = self._download_video_from_url(source_url)
+                instance = serializer.save(file=file_obj, duration=duration)
             except ResourceNotFoundError as e:
                 raise serializers.ValidationError({"source_url": str(e)}) from e
             except NotAVideoError as e:
                 raise serializers.ValidationError({"source_url": str(e)}) from e
+            dispatch_media_tasks(instance)
         else:
             instance = serializer.save()
 
@@ -225,6 +446,29 @@ class VideoViewSet(viewsets.ModelViewSet):
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
         return response
 
+    @action(detail=True, methods=["get"], url_path="keyframes")
+    def keyframes(self, request, pk=None):
+        """Интервал [start, end], выровненный по ключевым кадрам, и диапазон байт для Range."""
+        video = self.get_object()
+        query = KeyframeRangeQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        index = load_index(video)
+        if index is None:
+            return Response(
+                {"error": "Индекс ключевых кадров для этого видео ещё не построен"},
+                status=404,
+            )
+        start = query.validated_data["start"]
+        end = query.validated_data.get("end", index.duration)
+        return Response({
+            "id": video.pk,
+            "file": get_public_media_url(video.file.url),
+            "size": index.size,
+            "duration": index.duration,
+            **index.range_for(start, end).as_dict(),
+        })
+
     @action(detail=True, methods=["get", "post"], url_path="promt")
     def custom_promt(self, request, pk=None):
         video = self.get_object()
@@ -252,16 +496,26 @@ class VideoViewSet(viewsets.ModelViewSet):
                 {"error": "Поле promt обязательно"},
                 status=400,
             )
+        ensure_ml_capacity()
         task_id = video.create_task(promt)
         return Response({"status": "ok", "task_id": task_id})
 
 
-class VideoStatusView(APIView):
+class VideoStatusView(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
-    def get(self, request, pk, *args, **kwargs):
-        video = get_object_or_404(Video, pk=pk)
-        return Response({
-            "id": video.pk,
-            "status": video.status,
-        })
+    async def get(self, request, pk, *args, **kwargs):
+        # Клиенты опрашивают статус часто: короткий кэш снимает нагрузку с БД,
+        # обратный вызов ML сбрасывает его при смене статуса.
+        timeout = getattr(settings, "VIDEO_STATUS_CACHE_SECONDS", 0)
+        key = video_status_cache_key(pk)
+        data = await cache.aget(key) if timeout else None
+        if data is None:
+            video = await aget_object_or_404(Video.objects.only("id", "status"), pk=pk)
+            data = {
+                "id": video.pk,
+                "status": video.status,
+            }
+            if timeout:
+                await cache.aset(key, data, timeout)
+        return Response(data)